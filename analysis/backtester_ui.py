@@ -1,4 +1,3 @@
-import asyncio
 import json
 from datetime import date, timedelta
 
@@ -16,6 +15,7 @@ from streamlit.uploaded_file_manager import UploadedFile
 from liualgotrader.analytics.analysis import (calc_batch_revenue, count_trades,
                                               load_batch_list, load_trades,
                                               load_trades_by_batch_id)
+from liualgotrader.analytics.queries import session
 from liualgotrader.backtester import BackTestDay, backtest
 from liualgotrader.common import config, database
 
@@ -28,8 +28,8 @@ except pygit2.GitError:
 
     config.build_label = liualgotrader.__version__ if hasattr(liualgotrader, "__version__") else ""  # type: ignore
 
-loop = asyncio.new_event_loop()
-asyncio.set_event_loop(loop)
+# one loop across re-runs keeps the analytics session's prepared queries
+loop = session.event_loop()
 nest_asyncio.apply()
 
 loop.run_until_complete(database.create_db_connection())
@@ -93,9 +93,7 @@ if app == "back-test":
 
     if selection == "back-test against the whole day":
         with st.spinner(f"back-testing.. patience is a virtue "):
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(back_test())
+            session.event_loop().run_until_complete(back_test())
     else:
         try:
             with st.spinner("Loading list of trading sessions"):
@@ -147,7 +145,7 @@ if app == "back-test":
                 else:
                     st.stop()
                 with st.spinner(f"back-testing.."):
-                    asyncio.set_event_loop(asyncio.new_event_loop())
+                    session.event_loop()
                     try:
                         print(bid)
                         new_bid = backtest(bid, conf_dict=conf_dict, debug_symbols=[])  # type: ignore
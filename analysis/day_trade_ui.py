@@ -1,4 +1,3 @@
-import asyncio
 import json
 from datetime import date, datetime, timedelta
 from typing import Dict
@@ -13,6 +12,7 @@ import streamlit as st
 
 from liualgotrader.analytics.analysis import (calc_batch_revenue, count_trades,
                                               load_runs, load_trades)
+from liualgotrader.analytics.queries import session
 from liualgotrader.common import database
 
 st.title("Day-trade Session Analysis")
@@ -23,8 +23,8 @@ st.markdown(
 day_to_analyze = st.date_input("pick day to analyze", value=date.today())
 env = st.sidebar.selectbox("Select environment", ("PAPER", "BACKTEST", "PROD"))
 
-loop = asyncio.new_event_loop()
-asyncio.set_event_loop(loop)
+# one loop across re-runs keeps the analytics session's prepared queries
+loop = session.event_loop()
 nest_asyncio.apply()
 
 loop.run_until_complete(database.create_db_connection())
@@ -3,10 +3,12 @@ from datetime import datetime
 from typing import Dict, List, Tuple
 
 import alpaca_trade_api as tradeapi
+import numpy as np
 from pandas import DataFrame as df
 from talib import MAMA
 
 from liualgotrader.common import config
+from liualgotrader.common.bar_store import BarStore
 from liualgotrader.common.tlog import tlog
 from liualgotrader.common.trading_data import (
     buy_indicators,
@@ -47,6 +49,16 @@ class SwingMamaFama(Strategy):
         await super().create()
         tlog(f"strategy {self.name} created")
 
+    def vectorized_indicators(self, bars: BarStore) -> Dict[str, np.ndarray]:
+        mama, fama = MAMA(np.ascontiguousarray(bars.column("close")))
+        return {"mama": mama, "fama": fama}
+
+    def mama_fama(self, symbol: str, minute_history: df) -> Tuple:
+        signals = self.signals(symbol, len(minute_history))
+        if signals:
+            return signals["mama"], signals["fama"]
+        return MAMA(minute_history["close"])
+
     async def is_buy_time(self, now: datetime):
         return True
 
@@ -66,7 +78,7 @@ class SwingMamaFama(Strategy):
         backtesting: bool = False,
     ) -> Tuple[bool, Dict]:
         data = minute_history.iloc[-1]
-        mama, fama = MAMA(minute_history["close"])
+        mama, fama = self.mama_fama(symbol, minute_history)
 
         if mama[-1] > fama[-1]:
             buy_price = data.close
@@ -128,7 +140,7 @@ class SwingMamaFama(Strategy):
             and last_used_strategy[symbol].name == self.name
             and not open_orders.get(symbol)
         ):
-            mama, fama = MAMA(minute_history["close"])
+            mama, fama = self.mama_fama(symbol, minute_history)
 
             to_sell: bool = False
             if data.close < stop_prices[symbol]:
@@ -1,8 +1,9 @@
-import math
 from datetime import date, timedelta
 from typing import Dict, List, Optional
 
 import alpaca_trade_api as tradeapi
+import pandas as pd
+from pandas import DataFrame as df
 from talib import MAMA
 
 from liualgotrader.common import config
@@ -58,6 +59,27 @@ class DailyOHLC(Miner):
     def symbols(self, symbols: Optional[List[str]]) -> None:
         self._symbols = symbols
 
+    def calc_indicators(self, bars: df) -> Optional[df]:
+        """Indicators of all days at once, each day's value is computed
+        from the bars up to (and including) that day"""
+        if not self.indicators:
+            return None
+
+        indicators = df(index=bars.index)
+        close = bars["close"].dropna()
+        for indicator in self.indicators:
+            if indicator == "mama":
+                mama, fama = MAMA(close.to_numpy(dtype="float64"))
+                indicators["mama"] = pd.Series(mama, index=close.index)
+                indicators["fama"] = pd.Series(fama, index=close.index)
+
+        return indicators
+
+    async def save_symbol_data(self, symbol: str, bars: df) -> int:
+        return await StockOhlc.save_batch(
+            StockOhlc.from_dataframe(symbol, bars, self.calc_indicators(bars))
+        )
+
     @timeit
     async def load_symbol_data(
         self,
@@ -71,34 +93,8 @@ class DailyOHLC(Miner):
         )
 
         if symbol in _minute_data:
-            for index, row in _minute_data[symbol].iterrows():
-                indicators: Dict = {}
-                if self.indicators:
-                    for indicator in self.indicators:
-                        if indicator == "mama":
-                            mama, fama = MAMA(
-                                _minute_data[symbol]["close"][:index].dropna()
-                            )
-                            indicators["mama"] = (
-                                mama[-1] if not math.isnan(mama[-1]) else None
-                            )
-                            indicators["fama"] = (
-                                fama[-1] if not math.isnan(fama[-1]) else None
-                            )
-
-                daily_bar = StockOhlc(
-                    symbol=symbol,
-                    symbol_date=index,
-                    open=row["open"],
-                    high=row["high"],
-                    low=row["low"],
-                    close=row["close"],
-                    volume=int(row["volume"]),
-                    indicators=indicators,
-                )
-                await daily_bar.save()
-
-            tlog(f"saved {len(_minute_data[symbol].index)} days for {symbol}")
+            saved = await self.save_symbol_data(symbol, _minute_data[symbol])
+            tlog(f"saved {saved} days for {symbol}")
 
     @timeit
     async def run(self) -> bool:
@@ -109,23 +105,34 @@ class DailyOHLC(Miner):
         if not self.symbols:
             return False
 
-        # check last date
+        # check last date, and group symbols by the first date to load
+        latest_dates = await StockOhlc.get_latest_dates(self.symbols)
+        by_start_date: Dict[date, List[str]] = {}
         for symbol in self.symbols:
-            latest_date = await StockOhlc.get_latest_date(symbol)
+            latest_date = latest_dates.get(symbol)
 
             if self._debug:
                 tlog(f"{symbol} latest date: {latest_date}")
 
-            if not latest_date:
-                if self._debug:
-                    tlog(f"{symbol} loading {self.days} of OHLC data")
-                await self.load_symbol_data(symbol, self.days)
-            else:
-                latest_date += timedelta(days=1)
-                duration = min(self.days, (date.today() - latest_date).days)
-
-                if self._debug:
-                    tlog(f"{symbol} loading {duration} of OHLC data")
-                await self.load_symbol_data(symbol, duration)
+            duration = (
+                min(self.days, (date.today() - latest_date).days - 1)
+                if latest_date
+                else self.days
+            )
+            by_start_date.setdefault(
+                date.today() - timedelta(days=duration), []
+            ).append(symbol)
+
+        for start_date, symbols in by_start_date.items():
+            if self._debug:
+                tlog(f"loading OHLC data from {start_date} for {symbols}")
+
+            # symbols are loaded concurrently, and saved in bulk
+            _minute_data = get_historical_data_from_polygon_by_range(
+                self.data_api, symbols, start_date, "day"
+            )
+            for symbol, bars in _minute_data.items():
+                saved = await self.save_symbol_data(symbol, bars)
+                tlog(f"saved {saved} days for {symbol}")
 
         return True
@@ -1,12 +1,9 @@
 import asyncio
-import os
-import sys
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
 from typing import Dict, List, Tuple
 
 import alpaca_trade_api as tradeapi
 from pandas import DataFrame as df
-from stockstats import StockDataFrame
 
 from liualgotrader.common import config
 from liualgotrader.common.tlog import tlog
@@ -16,6 +13,7 @@ from liualgotrader.common.trading_data import (buy_indicators, buy_time,
                                                latest_scalp_basis, open_orders,
                                                sell_indicators, stop_prices,
                                                target_prices)
+from liualgotrader.fincalcs.incremental import MACD, RSI, IndicatorSet
 from liualgotrader.fincalcs.support_resistance import find_stop
 from liualgotrader.strategies.base import Strategy, StrategyType
 
@@ -50,6 +48,16 @@ class MomentumLongV3(Strategy):
         await super().create()
         tlog(f"strategy {self.name} created")
 
+    def incremental_indicators(self) -> IndicatorSet:
+        return IndicatorSet(
+            {
+                "macd": MACD(12, 26, 9),
+                "sell_macd": MACD(13, 21, 9),
+                "rsi": RSI(20),
+            },
+            hours=(time(9, 30), time(16, 0)),
+        )
+
     async def should_cool_down(self, symbol: str, now: datetime):
         if (
             symbol in cool_down
@@ -102,22 +110,10 @@ class MomentumLongV3(Strategy):
                 hasattr(config, "bypass_market_schedule")
                 and config.bypass_market_schedule
             ):
-                close = (
-                    minute_history["close"]
-                    .dropna()
-                    .between_time("9:30", "16:00")
-                )
-
-                old_stdout = sys.stdout  # backup current stdout
-                sys.stdout = open(os.devnull, "w")
-
-                stock = StockDataFrame(close)
-
-                macd = stock["macd"]
-                macd_signal = stock["macds"]
-                macd_hist = stock["macdh"]
-
-                sys.stdout = old_stdout  # reset old stdout
+                indicators = self.indicators(symbol, len(minute_history))
+                macd = indicators["macd"].macd
+                macd_signal = indicators["macd"].signal
+                macd_hist = indicators["macd"].hist
 
                 macd_trending = macd[-3] < macd[-2] < macd[-1]
                 macd_above_signal = macd[-1] > macd_signal[-1] * 1.1
@@ -142,7 +138,7 @@ class MomentumLongV3(Strategy):
                         tlog(f"[{self.name}][{now}] slow macd confirmed trend")
 
                     # check RSI does not indicate overbought
-                    rsi = stock["rsi_20"]
+                    rsi = indicators["rsi"]
 
                     if debug:
                         tlog(
@@ -218,8 +214,8 @@ class MomentumLongV3(Strategy):
                         )
 
                         buy_indicators[symbol] = {
-                            "macd": macd[-5:].tolist(),
-                            "macd_signal": macd_signal[-5:].tolist(),
+                            "macd": macd[-5:],
+                            "macd_signal": macd_signal[-5:],
                             "vwap": data.vwap,
                             "avg": data.average,
                         }
@@ -255,26 +251,18 @@ class MomentumLongV3(Strategy):
             ):
                 self.whipsawed[symbol] = True
 
-            serie = (
-                minute_history["close"].dropna().between_time("9:30", "16:00")
-            )
+            indicators = self.indicators(symbol, len(minute_history))
+            macd = indicators["sell_macd"].macd
+            macd_signal = indicators["sell_macd"].signal
+            rsi = list(indicators["rsi"].values)
 
             if data.vwap:
-                serie[-1] = data.vwap
-
-            old_stdout = sys.stdout  # backup current stdout
-            sys.stdout = open(os.devnull, "w")
-
-            stock = StockDataFrame(serie)
-            stock.MACD_EMA_SHORT = 13
-            stock.MACD_EMA_LONG = 21
-
-            macd = stock["macd"]
-            macd_signal = stock["macds"]
-
-            rsi = stock["rsi_20"]
-
-            sys.stdout = old_stdout  # reset old stdout
+                # evaluate the current minute at its vwap, rather than close
+                bar = {"close": data.vwap}
+                macd[-1], macd_signal[-1], _ = indicators["sell_macd"].preview(
+                    bar
+                )
+                rsi[-1] = indicators["rsi"].preview(bar)
 
             movement = (
                 data.close - latest_scalp_basis[symbol]
@@ -355,10 +343,10 @@ class MomentumLongV3(Strategy):
 
             if to_sell:
                 sell_indicators[symbol] = {
-                    "rsi": rsi[-3:].tolist(),
+                    "rsi": rsi[-3:],
                     "movement": movement,
-                    "sell_macd": macd[-5:].tolist(),
-                    "sell_macd_signal": macd_signal[-5:].tolist(),
+                    "sell_macd": macd[-5:],
+                    "sell_macd_signal": macd_signal[-5:],
                     "vwap": data.vwap,
                     "avg": data.average,
                     "reasons": " AND ".join(
@@ -8,7 +8,8 @@ from stockstats import StockDataFrame
 from tabulate import tabulate
 
 from liualgotrader.common import config
-from liualgotrader.common.market_data import daily_bars, index_data
+from liualgotrader.common.market_data import (daily_bars_for_symbols,
+                                                index_data)
 from liualgotrader.common.tlog import tlog
 from liualgotrader.miners.base import Miner
 from liualgotrader.models.portfolio import Portfolio as DBPortfolio
@@ -52,25 +53,15 @@ class Portfolio(Miner):
                 "load_data() received an empty list of symbols to load. aborting"
             )
 
-        i = 1
-        for symbol in symbols:
-            if self.debug:
-                tlog(
-                    f"loading 200 days for symbol {symbol} ({i}/{len(symbols)})"
-                )
-            self.data_bars[symbol] = daily_bars(
-                api=self.data_api,
-                symbol=symbol,
-                days=int(200 * 7 / 5),
-            )
-            if self.debug:
-                try:
-                    p_points = len(self.data_bars[symbol])
-                except TypeError:
-                    p_points = 0
-
-                tlog(f"loaded {p_points} data-points")
-            i += 1
+        if self.debug:
+            tlog(f"loading 200 days for {len(symbols)} symbols")
+        self.data_bars = daily_bars_for_symbols(
+            api=self.data_api,
+            symbols=symbols,
+            days=int(200 * 7 / 5),
+        )
+        if self.debug:
+            tlog(f"loaded data-points for {len(self.data_bars)} symbols")
 
     async def calc_momentum(self) -> None:
         if not len(self.data_bars):
@@ -1,11 +1,10 @@
-import asyncio
 from datetime import date, timedelta
-from typing import Dict, Tuple
+from typing import AsyncIterator, Dict, Tuple
 
 import pandas as pd
 from pytz import timezone
 
-from liualgotrader.common.database import fetch_as_dataframe
+from liualgotrader.analytics.queries import session, timestamp_param
 from liualgotrader.common.tlog import tlog
 
 est = timezone("America/New_York")
@@ -67,52 +66,28 @@ def portfolio_return(
 def load_trades_for_period(
     env: str, from_date: date, to_date: date
 ) -> pd.DataFrame:
-    query = f"""
-    SELECT client_time, symbol, operation, qty, price, algo_name
-    FROM 
-        new_trades as t, algo_run as a
-    WHERE 
-        t.algo_run_id = a.algo_run_id AND 
-        t.tstamp >= '{from_date}' AND 
-        t.tstamp < '{to_date}' AND
-        t.expire_tstamp is null AND
-        a.algo_env = '{env}'
-    ORDER BY symbol, tstamp
-    """
-    loop = asyncio.get_event_loop()
-    return loop.run_until_complete(fetch_as_dataframe(query))
+    return session.run(
+        session.fetch_chunked(
+            "trades_for_period",
+            env,
+            timestamp_param(from_date),
+            timestamp_param(to_date),
+        )
+    )
 
 
 def load_trades(day: date, env: str, end_date: date = None) -> pd.DataFrame:
-    query = f"""
-    SELECT t.*, a.batch_id, a.algo_name
-    FROM 
-    new_trades as t, algo_run as a
-    WHERE 
-        t.algo_run_id = a.algo_run_id AND 
-        t.tstamp >= '{day}' AND 
-        t.tstamp < '{day + timedelta(days=1) if not end_date else end_date}' AND
-        t.expire_tstamp is null AND
-        a.algo_env = '{env}'
-    ORDER BY symbol, tstamp
-    """
-    loop = asyncio.get_event_loop()
-    return loop.run_until_complete(fetch_as_dataframe(query))
+    return session.run(
+        session.fetch_chunked(
+            "trades",
+            env,
+            timestamp_param(day),
+            timestamp_param(end_date or day + timedelta(days=1)),
+        )
+    )
 
 
-async def aload_trades_by_batch_id(batch_id: str) -> pd.DataFrame:
-    query = f"""
-        SELECT 
-            t.*, a.batch_id, a.start_time, a.algo_name
-        FROM 
-            new_trades as t, algo_run as a
-        WHERE 
-            t.algo_run_id = a.algo_run_id AND 
-            a.batch_id = '{batch_id}' AND
-            t.expire_tstamp is null 
-        ORDER BY symbol, tstamp
-    """
-    df: pd.DataFrame = await fetch_as_dataframe(query)
+def _convert_client_time(df: pd.DataFrame, batch_id: str) -> pd.DataFrame:
     try:
         df["client_time"] = pd.to_datetime(df["client_time"])
     except Exception:
@@ -122,69 +97,57 @@ async def aload_trades_by_batch_id(batch_id: str) -> pd.DataFrame:
     return df
 
 
+async def aload_trades_by_batch_id(batch_id: str) -> pd.DataFrame:
+    df: pd.DataFrame = await session.fetch_chunked(
+        "trades_by_batch_id", batch_id
+    )
+    return _convert_client_time(df, batch_id)
+
+
+async def astream_trades_by_batch_id(
+    batch_id: str, chunk_size: int = None
+) -> AsyncIterator[pd.DataFrame]:
+    """aload_trades_by_batch_id() in chunks of up to chunk_size trades"""
+    async for df in session.stream(
+        "trades_by_batch_id", batch_id, chunk_size=chunk_size
+    ):
+        yield _convert_client_time(df, batch_id)
+
+
 def load_trades_by_batch_id(batch_id: str) -> pd.DataFrame:
-    loop = asyncio.get_event_loop()
-    return loop.run_until_complete(aload_trades_by_batch_id(batch_id))
+    return session.run(aload_trades_by_batch_id(batch_id))
 
 
 def load_runs(day: date, env: str, end_date: date = None) -> pd.DataFrame:
-    query = f"""
-     SELECT * 
-     FROM 
-     algo_run as t
-     WHERE 
-         start_time >= '{day}' AND 
-         start_time < '{day + timedelta(days=1) if not end_date else end_date}' AND
-         algo_env = '{env}'
-     ORDER BY start_time
-     """
-    loop = asyncio.get_event_loop()
-    df = loop.run_until_complete(fetch_as_dataframe(query))
+    df = session.run(
+        session.fetch(
+            "runs",
+            env,
+            timestamp_param(day),
+            timestamp_param(end_date or day + timedelta(days=1)),
+        )
+    )
     df.set_index("algo_run_id", inplace=True)
     return df
 
 
 def load_batch_list(day: date, env: str) -> pd.DataFrame:
-    query = f"""
-        SELECT DISTINCT a.batch_id, a.start_time
-        FROM 
-        new_trades as t, algo_run as a
-        WHERE 
-            t.algo_run_id = a.algo_run_id AND 
-            t.tstamp >= '{day}' AND 
-            t.tstamp < '{day + timedelta(days=1)}'AND
-            t.expire_tstamp is null AND
-            a.algo_env = '{env}'
-        """
-    loop = asyncio.get_event_loop()
-    return loop.run_until_complete(fetch_as_dataframe(query))
+    return session.run(
+        session.fetch(
+            "batch_list",
+            env,
+            timestamp_param(day),
+            timestamp_param(day + timedelta(days=1)),
+        )
+    )
 
 
 def load_traded_symbols(batch_id: str) -> pd.DataFrame:
-    query = f"""
-        SELECT 
-            DISTINCT t.symbol
-        FROM 
-            new_trades as t, algo_run as a
-        WHERE 
-            t.algo_run_id = a.algo_run_id AND 
-            a.batch_id = '{batch_id}'
-    """
-    loop = asyncio.get_event_loop()
-    return loop.run_until_complete(fetch_as_dataframe(query))
+    return session.run(session.fetch("traded_symbols", batch_id))
 
 
 def load_batch_symbols(batch_id: str) -> pd.DataFrame:
-    query = f"""
-        SELECT 
-            symbol
-        FROM 
-            trending_tickers
-        WHERE 
-            batch_id = '{batch_id}'
-    """
-    loop = asyncio.get_event_loop()
-    return loop.run_until_complete(fetch_as_dataframe(query))
+    return session.run(session.fetch("batch_symbols", batch_id))
 
 
 def calc_batch_revenue(
@@ -1,200 +1,177 @@
-import asyncio
+import math
+from typing import Dict, List, Tuple
 
 from pandas import DataFrame, Timestamp
 
-from liualgotrader.analytics.analysis import aload_trades_by_batch_id
+from liualgotrader.analytics.analysis import astream_trades_by_batch_id
+from liualgotrader.common import config
 from liualgotrader.common.database import create_db_connection
 from liualgotrader.common.decorators import timeit
 from liualgotrader.common.tlog import tlog
 from liualgotrader.models.gain_loss import GainLoss, TradeAnalysis
 
 
-@timeit
-async def trades(batch_id: str) -> None:
-    """Go over all trades in a batch, and populate gain_loss table"""
-
-    if not len(batch_id):
-        return
+class TradesConsolidator:
+    """Pair opening & closing trades per (symbol, algo_run_id) in a single
+    pass. Trades are added in chunks (ordered by symbol, tstamp), open
+    trades carry over from one chunk to the next"""
 
-    await create_db_connection()
-    await asyncio.sleep(1)
-    trades_data = await aload_trades_by_batch_id(batch_id=batch_id)
+    def __init__(self):
+        self.gain_loss: Dict[Tuple[str, int], Dict] = {}
+        self.open_trades: Dict[Tuple[str, int], Dict] = {}
+        self.analysis: List[Dict] = []
 
-    if trades_data.empty:
-        tlog(f"loaded empty data-set in {batch_id}. aborting.")
-        return
-
-    tlog(f"loaded {len(trades_data)} trades")
-
-    gain_loss = DataFrame(
-        columns=[
-            "symbol",
-            "algo_run_id",
-            "gain_percentage",
-            "gain_value",
-            "org_price",
-        ]
-    )
-
-    trade_analysis = DataFrame(
-        columns=[
-            "symbol",
-            "algo_run_id",
-            "gain_percentage",
-            "gain_value",
-            "r_units",
-            "initial_price",
-            "stop_price",
-            "org_price",
-            "qty",
-            "status",
-        ]
-    )
-    for index, row in trades_data.iterrows():
-        delta = float(
-            row["price"]
-            * row["qty"]
-            * (1 if row["operation"] == "sell" and row["qty"] > 0 else -1)
-        )
+    def add(self, trades_data: DataFrame) -> None:
+        for (
+            symbol,
+            algo_run_id,
+            operation,
+            qty,
+            price,
+            stop_price,
+            client_time,
+        ) in zip(
+            trades_data.symbol.tolist(),
+            trades_data.algo_run_id.tolist(),
+            trades_data.operation.tolist(),
+            trades_data.qty.tolist(),
+            trades_data.price.tolist(),
+            trades_data.stop_price.tolist(),
+            trades_data.client_time.tolist(),
+        ):
+            qty = float(qty)
+            price = float(price)
+            signed_qty = -qty if operation == "sell" and qty > 0 else qty
+            delta = -price * signed_qty
+            key = (symbol, algo_run_id)
+            if stop_price is not None and math.isnan(stop_price):
+                stop_price = None
 
-        if trade_analysis.loc[
-            (trade_analysis.symbol == row.symbol)
-            & (trade_analysis.algo_run_id == row.algo_run_id)
-            & (trade_analysis.status == "open")
-        ].empty:
-            trade_analysis = trade_analysis.append(
-                {
-                    "symbol": row.symbol,
-                    "algo_run_id": row.algo_run_id,
+            trade = self.open_trades.get(key)
+            if trade is None:
+                trade = {
+                    "symbol": symbol,
+                    "algo_run_id": algo_run_id,
                     "gain_value": delta,
-                    "org_price": float(row.price * row.qty),
-                    "start_time": Timestamp(row.client_time),
-                    "qty": float(row.qty),
-                    "r_units": float(row.price - row.stop_price)
-                    if row.stop_price is not None
+                    "org_price": price * qty,
+                    "start_time": Timestamp(client_time),
+                    "end_time": None,
+                    "qty": qty,
+                    "r_units": price - float(stop_price)
+                    if stop_price is not None
                     else 0,
-                    "initial_price": float(row.price),
-                    "stop_price": float(row.stop_price)
-                    if row.stop_price is not None
+                    "initial_price": price,
+                    "stop_price": float(stop_price)
+                    if stop_price is not None
                     else None,
                     "status": "open",
                     "sold_price": None,
-                },
-                ignore_index=True,
-            )
-        else:
-            trade_analysis.loc[
-                (trade_analysis.symbol == row.symbol)
-                & (trade_analysis.algo_run_id == row.algo_run_id)
-                & (trade_analysis.status == "open"),
-                "gain_value",
-            ] += delta
-            trade_analysis.loc[
-                (trade_analysis.symbol == row.symbol)
-                & (trade_analysis.algo_run_id == row.algo_run_id)
-                & (trade_analysis.status == "open"),
-                "qty",
-            ] += float(
-                row.qty
-                * (-1 if row.operation == "sell" and row.qty > 0 else 1)
-            )
-            if not trade_analysis.loc[
-                (trade_analysis.symbol == row.symbol)
-                & (trade_analysis.algo_run_id == row.algo_run_id)
-                & (trade_analysis.status == "open")
-                & (trade_analysis.qty == 0.0)
-            ].empty:
-                trade_analysis.loc[
-                    (trade_analysis.symbol == row.symbol)
-                    & (trade_analysis.algo_run_id == row.algo_run_id)
-                    & (trade_analysis.status == "open"),
-                    "sold_price",
-                ] = float(row.price)
-                trade_analysis.loc[
-                    (trade_analysis.symbol == row.symbol)
-                    & (trade_analysis.algo_run_id == row.algo_run_id)
-                    & (trade_analysis.status == "open"),
-                    "r_units",
-                ] = (
-                    round(
-                        (
-                            float(row.price)
-                            - trade_analysis.loc[
-                                (trade_analysis.symbol == row.symbol)
-                                & (
-                                    trade_analysis.algo_run_id
-                                    == row.algo_run_id
-                                )
-                                & (trade_analysis.status == "open"),
-                                "initial_price",
-                            ]
+                }
+                self.open_trades[key] = trade
+                self.analysis.append(trade)
+            else:
+                trade["gain_value"] += delta
+                trade["qty"] += signed_qty
+                if trade["qty"] == 0.0:
+                    trade["sold_price"] = price
+                    trade["r_units"] = (
+                        round(
+                            (price - trade["initial_price"])
+                            / trade["r_units"],
+                            2,
                         )
-                        / trade_analysis.loc[
-                            (trade_analysis.symbol == row.symbol)
-                            & (trade_analysis.algo_run_id == row.algo_run_id)
-                            & (trade_analysis.status == "open"),
-                            "r_units",
-                        ],
-                        2,
+                        if trade["r_units"] != 0.0
+                        else None
                     )
-                    if trade_analysis.loc[
-                        (trade_analysis.symbol == row.symbol)
-                        & (trade_analysis.algo_run_id == row.algo_run_id)
-                        & (trade_analysis.status == "open")
-                        & (trade_analysis.r_units == 0.0)
-                    ].empty
-                    else None
-                )
-                trade_analysis.loc[
-                    (trade_analysis.symbol == row.symbol)
-                    & (trade_analysis.algo_run_id == row.algo_run_id)
-                    & (trade_analysis.status == "open"),
-                    "end_time",
-                ] = Timestamp(row.client_time)
-                trade_analysis.loc[
-                    (trade_analysis.symbol == row.symbol)
-                    & (trade_analysis.algo_run_id == row.algo_run_id)
-                    & (trade_analysis.status == "open"),
-                    "status",
-                ] = "close"
-
-        if gain_loss.loc[
-            (gain_loss.symbol == row.symbol)
-            & (gain_loss.algo_run_id == row.algo_run_id),
-            "gain_value",
-        ].empty:
-            gain_loss = gain_loss.append(
-                {
-                    "symbol": row.symbol,
-                    "algo_run_id": row.algo_run_id,
+                    trade["end_time"] = Timestamp(client_time)
+                    trade["status"] = "close"
+                    del self.open_trades[key]
+
+            if key not in self.gain_loss:
+                self.gain_loss[key] = {
+                    "symbol": symbol,
+                    "algo_run_id": algo_run_id,
                     "gain_value": delta,
-                    "org_price": float(row.price * row.qty),
-                },
-                ignore_index=True,
-            )
-        else:
-            gain_loss.loc[
-                (gain_loss.symbol == row.symbol)
-                & (gain_loss.algo_run_id == row.algo_run_id),
-                "gain_value",
-            ] += delta
+                    "org_price": price * qty,
+                }
+            else:
+                self.gain_loss[key]["gain_value"] += delta
 
+    def results(self) -> Tuple[DataFrame, DataFrame]:
+        """gain_loss per (symbol, algo_run_id), and trade_analysis per trade
+        (w/ a status column, open or close)"""
+        gain_loss = DataFrame(
+            list(self.gain_loss.values()),
+            columns=["symbol", "algo_run_id", "gain_value", "org_price"],
+        )
         gain_loss["gain_percentage"] = round(
             100.0 * gain_loss["gain_value"] / gain_loss["org_price"], 2
         )
+
+        trade_analysis = DataFrame(
+            self.analysis,
+            columns=[
+                "symbol",
+                "algo_run_id",
+                "gain_value",
+                "r_units",
+                "initial_price",
+                "stop_price",
+                "org_price",
+                "qty",
+                "status",
+                "start_time",
+                "end_time",
+                "sold_price",
+            ],
+        )
         trade_analysis["gain_percentage"] = round(
             100.0 * trade_analysis["gain_value"] / trade_analysis["org_price"],
             2,
         )
 
+        return gain_loss, trade_analysis
+
+
+def consolidate(trades_data: DataFrame) -> Tuple[DataFrame, DataFrame]:
+    """gain_loss & trade_analysis of trades_data, see TradesConsolidator"""
+    consolidator = TradesConsolidator()
+    consolidator.add(trades_data)
+    return consolidator.results()
+
+
+@timeit
+async def trades(batch_id: str) -> None:
+    """Go over all trades in a batch, and populate gain_loss table"""
+
+    if not len(batch_id):
+        return
+
+    try:
+        if config.db_conn_pool:
+            pass
+    except AttributeError:
+        await create_db_connection()
+
+    consolidator = TradesConsolidator()
+    num_trades = 0
+    async for trades_data in astream_trades_by_batch_id(batch_id=batch_id):
+        consolidator.add(trades_data)
+        num_trades += len(trades_data)
+
+    if not num_trades:
+        tlog(f"loaded empty data-set in {batch_id}. aborting.")
+        return
+
+    tlog(f"loaded {num_trades} trades")
+
+    gain_loss, trade_analysis = consolidator.results()
+    closed_trades = trade_analysis.loc[trade_analysis.status == "close"]
+
     await GainLoss.save(gain_loss)
-    await TradeAnalysis.save(
-        trade_analysis.loc[trade_analysis.status == "close"]
-    )
+    await TradeAnalysis.save(closed_trades)
 
-    if len(trade_analysis) != len(
-        trade_analysis.loc[trade_analysis.status == "close"]
-    ):
+    if len(trade_analysis) != len(closed_trades):
         tlog(
-            f"{batch_id} has {len(trade_analysis) -  len(trade_analysis.loc[trade_analysis.status == 'close'])} skipped open trades."
+            f"{batch_id} has {len(trade_analysis) - len(closed_trades)} skipped open trades."
         )
@@ -2,7 +2,7 @@ import alpaca_trade_api as tradeapi
 from pandas import DataFrame
 
 from liualgotrader.common.decorators import timeit
-from liualgotrader.common.market_data import latest_stock_price
+from liualgotrader.common.market_data import latest_stock_prices
 from liualgotrader.models.portfolio import Portfolio
 
 
@@ -10,9 +10,9 @@ from liualgotrader.models.portfolio import Portfolio
 async def load(data_api: tradeapi, portfolio_id: str) -> DataFrame:
     df = await Portfolio.load(portfolio_id)
 
-    for i, row in df.iterrows():
-        df.loc[df.symbol == row.symbol, "price"] = latest_stock_price(
-            data_api=data_api, symbol=row.symbol
-        )
+    prices = latest_stock_prices(
+        data_api=data_api, symbols=df.symbol.unique().tolist()
+    )
+    df["price"] = df.symbol.map(prices)
 
     return df
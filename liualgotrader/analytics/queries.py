@@ -0,0 +1,195 @@
+"""Named, parameterized analytics queries, prepared once per session"""
+import asyncio
+from datetime import date, datetime, time
+from typing import AsyncIterator, Dict, Optional
+
+import asyncpg
+import pandas as pd
+from asyncpg.connection import Connection
+from asyncpg.prepared_stmt import PreparedStatement
+
+from liualgotrader.common import config
+from liualgotrader.common.database import (fetch_statement,
+                                           records_to_dataframe,
+                                           stream_statement)
+from liualgotrader.common.tlog import tlog
+
+QUERIES: Dict[str, str] = {
+    "trades_for_period": """
+        SELECT client_time, symbol, operation, qty, price, algo_name
+        FROM
+            new_trades as t, algo_run as a
+        WHERE
+            t.algo_run_id = a.algo_run_id AND
+            t.tstamp >= $2 AND
+            t.tstamp < $3 AND
+            t.expire_tstamp is null AND
+            a.algo_env = $1
+        ORDER BY symbol, tstamp
+    """,
+    "trades": """
+        SELECT t.*, a.batch_id, a.algo_name
+        FROM
+            new_trades as t, algo_run as a
+        WHERE
+            t.algo_run_id = a.algo_run_id AND
+            t.tstamp >= $2 AND
+            t.tstamp < $3 AND
+            t.expire_tstamp is null AND
+            a.algo_env = $1
+        ORDER BY symbol, tstamp
+    """,
+    "trades_by_batch_id": """
+        SELECT
+            t.*, a.batch_id, a.start_time, a.algo_name
+        FROM
+            new_trades as t, algo_run as a
+        WHERE
+            t.algo_run_id = a.algo_run_id AND
+            a.batch_id = $1 AND
+            t.expire_tstamp is null
+        ORDER BY symbol, tstamp
+    """,
+    "runs": """
+        SELECT *
+        FROM
+            algo_run as t
+        WHERE
+            start_time >= $2 AND
+            start_time < $3 AND
+            algo_env = $1
+        ORDER BY start_time
+    """,
+    "batch_list": """
+        SELECT DISTINCT a.batch_id, a.start_time
+        FROM
+            new_trades as t, algo_run as a
+        WHERE
+            t.algo_run_id = a.algo_run_id AND
+            t.tstamp >= $2 AND
+            t.tstamp < $3 AND
+            t.expire_tstamp is null AND
+            a.algo_env = $1
+    """,
+    "traded_symbols": """
+        SELECT
+            DISTINCT t.symbol
+        FROM
+            new_trades as t, algo_run as a
+        WHERE
+            t.algo_run_id = a.algo_run_id AND
+            a.batch_id = $1
+    """,
+    "batch_symbols": """
+        SELECT
+            symbol
+        FROM
+            trending_tickers
+        WHERE
+            batch_id = $1
+    """,
+}
+
+
+def timestamp_param(d: date) -> datetime:
+    """Query parameter for a timestamp column: dates are midnight, and
+    time-zones are dropped (as Postgres does for timestamp literals)"""
+    if isinstance(d, datetime):
+        return d.replace(tzinfo=None)
+
+    return datetime.combine(d, time())
+
+
+class AnalyticsSession:
+    """A database connection shared by the analytics loaders, w/ the
+    QUERIES prepared on it once and re-used by every call. Queries on the
+    session are serialized, the connection is re-opened if it was closed,
+    or when called from a different event loop"""
+
+    def __init__(self, dsn: str = None):
+        self.dsn = dsn
+        self.con: Optional[Connection] = None
+        self.con_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.lock: Optional[asyncio.Lock] = None
+        self.statements: Dict[str, PreparedStatement] = {}
+
+    def event_loop(self) -> asyncio.AbstractEventLoop:
+        """The session's event loop, set as the current thread's loop. UIs
+        re-running their script should use it, rather than a new loop per
+        run, to keep the connection and its prepared statements"""
+        if not self.loop or self.loop.is_closed():
+            self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        return self.loop
+
+    def run(self, coro):
+        """Run coro to completion, for the synchronous loaders"""
+        return asyncio.get_event_loop().run_until_complete(coro)
+
+    async def fetch(self, name: str, *args) -> pd.DataFrame:
+        async with await self._acquire():
+            stmt = await self._statement(name)
+            return records_to_dataframe(stmt, await stmt.fetch(*args))
+
+    async def fetch_chunked(
+        self, name: str, *args, chunk_size: int = None
+    ) -> pd.DataFrame:
+        """fetch() over a server-side cursor, see fetch_statement()"""
+        async with await self._acquire():
+            stmt = await self._statement(name)
+            async with self.con.transaction():  # type: ignore
+                return await fetch_statement(
+                    stmt, *args, chunk_size=chunk_size
+                )
+
+    async def stream(
+        self, name: str, *args, chunk_size: int = None
+    ) -> AsyncIterator[pd.DataFrame]:
+        """fetch() in DataFrames of up to chunk_size rows. The session is
+        held until the stream is exhausted (or closed)"""
+        async with await self._acquire():
+            stmt = await self._statement(name)
+            async with self.con.transaction():  # type: ignore
+                async for df in stream_statement(
+                    stmt, *args, chunk_size=chunk_size
+                ):
+                    yield df
+
+    async def close(self) -> None:
+        if self.con and not self.con.is_closed():
+            await self.con.close()
+        self.con = None
+        self.statements = {}
+
+    async def _acquire(self) -> asyncio.Lock:
+        loop = asyncio.get_event_loop()
+        if (
+            not self.con
+            or self.con.is_closed()
+            or self.con_loop is not loop
+        ):
+            if self.con and not self.con.is_closed():
+                # the connection is bound to the loop it was opened on
+                tlog("analytics session moved to another event loop")
+                try:
+                    self.con.terminate()
+                except Exception as e:
+                    tlog(f"[ERROR] abandoned analytics connection w/ {e}")
+            self.con = await asyncpg.connect(dsn=self.dsn or config.dsn)
+            self.con_loop = loop
+            self.lock = asyncio.Lock()
+            self.statements = {}
+            tlog("analytics session connected")
+
+        return self.lock  # type: ignore
+
+    async def _statement(self, name: str) -> PreparedStatement:
+        if name not in self.statements:
+            self.statements[name] = await self.con.prepare(  # type: ignore
+                QUERIES[name]
+            )
+        return self.statements[name]
+
+
+session = AnalyticsSession()
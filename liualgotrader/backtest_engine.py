@@ -0,0 +1,242 @@
+"""Event-driven back-testing: bars of all symbols are replayed in time
+order on a single clock, and only symbols w/ a new bar are dispatched to
+the strategies. Orders are filled by one simulated broker"""
+import heapq
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from liualgotrader.common import config, trading_data
+from liualgotrader.common.bar_store import BarCursor, BarStore
+from liualgotrader.common.tlog import tlog
+from liualgotrader.models.new_trades import NewTrade
+from liualgotrader.strategies.base import Strategy, StrategyType
+
+
+class BacktestBroker:
+    """Fills strategy orders in full, at the close of the current bar, and
+    keeps positions in `trading_data`. Messages describing the fills are
+    collected in `messages`"""
+
+    def __init__(self):
+        self.messages: List[str] = []
+
+    async def execute(
+        self,
+        strategy: Strategy,
+        symbol: str,
+        what: Dict,
+        price: float,
+        now: pd.Timestamp,
+    ) -> bool:
+        """Fill the order `what` of strategy, returns True if other
+        strategies should not run on symbol this minute"""
+        qty = int(float(what["qty"]))
+        if (
+            what["side"] == "buy"
+            and qty > 0
+            or what["side"] == "sell"
+            and qty < 0
+        ):
+            trading_data.positions[symbol] += qty
+            trading_data.buy_time[symbol] = now.replace(
+                second=0, microsecond=0
+            )
+        else:
+            trading_data.positions[symbol] -= qty
+
+        trading_data.last_used_strategy[symbol] = strategy
+
+        self.messages.append(
+            f"[{now}][{strategy.name}] {what['side']} {what['qty']} of {symbol} @ {price}"
+        )
+        db_trade = NewTrade(
+            algo_run_id=strategy.algo_run.run_id,
+            symbol=symbol,
+            qty=qty,
+            operation=what["side"],
+            price=price,
+            indicators=trading_data.buy_indicators[symbol]
+            if what["side"] == "buy"
+            else trading_data.sell_indicators[symbol],
+        )
+        await db_trade.save(
+            config.db_conn_pool,
+            str(now.to_pydatetime()),
+            trading_data.stop_prices[symbol],
+            trading_data.target_prices[symbol],
+        )
+
+        if what["side"] == "buy":
+            await strategy.buy_callback(symbol, price, qty)
+            return True
+        elif what["side"] == "sell":
+            await strategy.sell_callback(symbol, price, qty)
+            return True
+
+        return False
+
+    async def liquidate(
+        self, symbol: str, price: float, now: pd.Timestamp
+    ) -> None:
+        """Close symbol's day-trade position at price"""
+        position = int(trading_data.positions.get(symbol, 0))
+        strategy = trading_data.last_used_strategy.get(symbol)
+        if (
+            not position
+            or not strategy
+            or strategy.type != StrategyType.DAY_TRADE
+        ):
+            return
+
+        tlog(f"[{now}]{symbol} liquidate {position} at {price}")
+        db_trade = NewTrade(
+            algo_run_id=strategy.algo_run.run_id,
+            symbol=symbol,
+            qty=position if position > 0 else -position,
+            operation="sell" if position > 0 else "buy",
+            price=price,
+            indicators={"liquidate": 1},
+        )
+        await db_trade.save(config.db_conn_pool, str(now.to_pydatetime()))
+        trading_data.positions[symbol] = 0
+
+
+class BacktestEngine:
+    """Replays the bars of many symbols, in time order, to the strategies in
+    `trading_data.strategies`. A heap holds the next bar of each symbol,
+    so each step dispatches only the symbols that have a bar at that time,
+    and minutes w/o bars cost nothing. Strategies see a `BarCursor` of the
+    symbol's bars up to the current one, and their
+    `vectorized_indicators()` are computed once per symbol when added"""
+
+    def __init__(
+        self,
+        portfolio_value: float,
+        end: Any,
+        debug_symbols: List[str] = None,
+    ):
+        self.portfolio_value = portfolio_value
+        self.end_ns = pd.Timestamp(end).value
+        self.debug_symbols: Set[str] = set(debug_symbols or [])
+        self.broker = BacktestBroker()
+        # (epoch ns of the next bar, order symbol was added, symbol, row)
+        self.clock: List[Tuple[int, int, str, int]] = []
+        self.order: Dict[str, int] = {}
+        self.bars: Dict[str, BarStore] = {}
+        self.history: Dict[str, BarCursor] = {}
+        self.times: Dict[str, np.ndarray] = {}
+        # row of the last bar dispatched per symbol
+        self.last_rows: Dict[str, int] = {}
+        self.now: Optional[pd.Timestamp] = None
+
+    def add_symbol(self, symbol: str, bars: BarStore, start: Any) -> None:
+        """Replay symbol's bars from start (earlier bars are history)"""
+        if symbol in self.bars:
+            return
+
+        self.bars[symbol] = bars
+        self.order[symbol] = len(self.order)
+        self.history[symbol] = BarCursor(bars)
+        self.times[symbol] = bars.index.asi8
+        trading_data.positions.setdefault(symbol, 0)
+        self._vectorize(symbol, bars)
+        self._schedule(
+            symbol,
+            int(
+                np.searchsorted(self.times[symbol], pd.Timestamp(start).value)
+            ),
+        )
+
+    def _vectorize(self, symbol: str, bars: BarStore) -> None:
+        for strategy in trading_data.strategies:
+            try:
+                signals = strategy.vectorized_indicators(bars)
+            except Exception as e:
+                tlog(
+                    f"[ERROR] exception {e} vectorizing {symbol} @ {strategy.name}"
+                )
+                continue
+
+            for name, values in signals.items():
+                if len(values) != len(bars):
+                    tlog(
+                        f"[ERROR] {strategy.name} indicator {name} of {symbol} has {len(values)} values for {len(bars)} bars"
+                    )
+                    break
+            else:
+                if signals:
+                    bars.signals[strategy.name] = {
+                        name: np.asarray(values)
+                        for name, values in signals.items()
+                    }
+
+    def _schedule(self, symbol: str, row: int) -> None:
+        times = self.times[symbol]
+        if row < len(times) and times[row] < self.end_ns:
+            heapq.heappush(
+                self.clock, (int(times[row]), self.order[symbol], symbol, row)
+            )
+
+    async def run(self, until: Any = None) -> List[str]:
+        """Dispatch the bars up to (and including) until, by default till
+        the end. Returns messages of the fills"""
+        until_ns = pd.Timestamp(until).value if until is not None else None
+        self.broker.messages = []
+        while self.clock and (
+            until_ns is None or self.clock[0][0] <= until_ns
+        ):
+            _, _, symbol, row = heapq.heappop(self.clock)
+            await self._dispatch(symbol, row)
+            self._schedule(symbol, row + 1)
+
+        return self.broker.messages
+
+    async def _dispatch(self, symbol: str, row: int) -> None:
+        bars = self.bars[symbol]
+        self.now = bars.timestamp(row)
+        self.last_rows[symbol] = row
+        price = float(bars.column("close")[row])
+        history = self.history[symbol]
+        history.seek(row + 1)
+        debug = symbol in self.debug_symbols
+
+        for strategy in trading_data.strategies:
+            if debug:
+                print(
+                    f"Execute strategy {strategy.name} on {symbol} at {self.now}"
+                )
+
+            try:
+                do, what = await strategy.run(
+                    symbol,
+                    True,
+                    int(trading_data.positions[symbol]),
+                    history,
+                    self.now,
+                    self.portfolio_value,
+                    debug=debug,  # type: ignore
+                    backtesting=True,
+                )
+            except Exception as e:
+                tlog(
+                    f"[ERROR] exception {e} on symbol {symbol} @ {strategy.name}"
+                )
+                continue
+
+            if do and await self.broker.execute(
+                strategy, symbol, what, price, self.now
+            ):
+                break
+
+    async def liquidate(self, now: Any = None) -> None:
+        """Close open day-trade positions at the last dispatched price, at
+        now (by default, at the time of each symbol's last bar)"""
+        for symbol, row in self.last_rows.items():
+            bars = self.bars[symbol]
+            await self.broker.liquidate(
+                symbol,
+                float(bars.column("close")[row]),
+                pd.Timestamp(now) if now is not None else bars.timestamp(row),
+            )
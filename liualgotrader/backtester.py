@@ -2,9 +2,12 @@
 
 import asyncio
 import importlib.util
+import multiprocessing as mp
+import os
 import sys
 import traceback
 import uuid
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 
@@ -16,17 +19,20 @@ from requests.exceptions import HTTPError
 from tabulate import tabulate
 
 from liualgotrader.analytics.analysis import load_trades_by_batch_id
+from liualgotrader.backtest_engine import BacktestEngine
 from liualgotrader.common import config, market_data, trading_data
+from liualgotrader.common.bar_cache import get_bars
+from liualgotrader.common.bar_store import BarStore
 from liualgotrader.common.database import create_db_connection
 from liualgotrader.common.decorators import timeit
 from liualgotrader.common.tlog import tlog
+from liualgotrader.common.trade_journal import start_journal, stop_journal
 from liualgotrader.fincalcs.vwap import add_daily_vwap
 from liualgotrader.models.algo_run import AlgoRun
-from liualgotrader.models.new_trades import NewTrade
 from liualgotrader.models.trending_tickers import TrendingTickers
 from liualgotrader.scanners.base import Scanner
 from liualgotrader.scanners.momentum import Momentum
-from liualgotrader.strategies.base import Strategy, StrategyType
+from liualgotrader.strategies.base import Strategy
 
 
 def get_batch_list():
@@ -63,7 +69,7 @@ starting
 
 def show_usage():
     print(
-        f"usage: {sys.argv[0]} --batch-list OR [--strict] [--symbol=SYMBOL] [--debug=SYMBOL] [--duration=<minutes>] <batch-id>\n"
+        f"usage: {sys.argv[0]} --batch-list OR [--strict] [--symbol=SYMBOL] [--debug=SYMBOL] [--duration=<minutes>] [--workers=N] <batch-id>\n"
     )
     msg = """
     'backter' application re-runs a past trading session, with new or modified
@@ -87,6 +93,9 @@ def show_usage():
     print(
         "--strict\tRun back-test session only on same symbols traded in the original batch"
     )
+    print(
+        "--workers\tBack-test symbols in parallel across N worker processes (default 1)"
+    )
 
 
 def show_version(filename: str, version: str) -> None:
@@ -168,15 +177,17 @@ async def create_strategies(
 
 
 @timeit
-async def backtest_symbol(
+async def load_symbol(
     data_api: tradeapi,
-    portfolio_value: float,
     symbol: str,
     start: datetime,
     duration: timedelta,
     scanner_start_time: datetime,
     debug_symbol: bool = False,
-) -> None:
+) -> Optional[Tuple[BarStore, datetime]]:
+    """Load symbol's minute bars for back-testing, returns the bars and
+    the time to start back-testing from, or None if there's nothing to
+    back-test"""
     est = pytz.timezone("America/New_York")
     scanner_start_time = (
         pytz.utc.localize(scanner_start_time).astimezone(est)
@@ -189,7 +200,7 @@ async def backtest_symbol(
         print(
             f"{symbol} picked too late at {scanner_start_time} ({start_time}, {duration})"
         )
-        return
+        return None
 
     start_time = scanner_start_time
     if start_time.second > 0:
@@ -205,148 +216,194 @@ async def backtest_symbol(
     while re_try > 0:
         # load historical data
         try:
-            symbol_data = data_api.polygon.historic_agg_v2(
+            symbol_data = get_bars(
+                data_api,
                 symbol,
-                1,
                 "minute",
                 _from=str(start_time - timedelta(days=8)),
                 to=str(start_time + timedelta(days=1)),
                 limit=10000,
-            ).df
+            )
         except HTTPError as e:
             tlog(f"Received HTTP error {e} for {symbol}")
-            return
+            return None
 
         if len(symbol_data) < 100:
             tlog(f"not enough data-points  for {symbol}")
-            return
+            return None
 
         add_daily_vwap(
             symbol_data,
             debug=debug_symbol,
         )
-        market_data.minute_history[symbol] = symbol_data
-        print(
-            f"loaded {len(market_data.minute_history[symbol].index)} agg data points"
-        )
+        bars = BarStore.from_dataframe(symbol_data)
+        market_data.minute_history[symbol] = bars
+        print(f"loaded {len(bars)} agg data points")
         try:
-            minute_index = symbol_data["close"].index.get_loc(
-                start_time, method="nearest"
-            )
+            minute_index = bars.nearest(start_time)
             break
         except (Exception, ValueError) as e:
             print(f"[EXCEPTION] {e} - trying to reload-data. ")
             re_try -= 1
 
     if re_try <= 0:
-        return
-
-    position: int = 0
-    new_now = symbol_data.index[minute_index]
-    print(f"start time with data {new_now}")
-    price = 0.0
-    last_run_id = None
-    # start_time + duration
-    while (
-        new_now < config.market_close
-        and minute_index < symbol_data.index.size - 1
-    ):
-        if symbol_data.index[minute_index] != new_now:
-            print("mismatch!", symbol_data.index[minute_index], new_now)
-            print(symbol_data["close"][minute_index - 10 : minute_index + 1])
-            raise Exception()
-
-        price = symbol_data["close"][minute_index]
-        for strategy in trading_data.strategies:
-            if debug_symbol:
-                print(
-                    f"Execute strategy {strategy.name} on {symbol} at {new_now}"
-                )
+        return None
 
-            try:
-                do, what = await strategy.run(
-                    symbol,
-                    True,
-                    position,
-                    symbol_data[: minute_index + 1],
-                    new_now,
-                    portfolio_value,
-                    debug=debug_symbol,  # type: ignore
-                    backtesting=True,
-                )
-            except Exception as e:
-                tlog(
-                    f"[ERROR] exception {e} on symbol {symbol} @ {strategy.name}"
-                )
-                continue
-
-            if do:
-                if (
-                    what["side"] == "buy"
-                    and float(what["qty"]) > 0
-                    or what["side"] == "sell"
-                    and float(what["qty"]) < 0
-                ):
-                    position += int(float(what["qty"]))
-                    trading_data.buy_time[symbol] = new_now.replace(
-                        second=0, microsecond=0
-                    )
-                else:
-                    position -= int(float(what["qty"]))
-
-                trading_data.last_used_strategy[symbol] = strategy
-
-                db_trade = NewTrade(
-                    algo_run_id=strategy.algo_run.run_id,
-                    symbol=symbol,
-                    qty=int(float(what["qty"])),
-                    operation=what["side"],
-                    price=price,
-                    indicators=trading_data.buy_indicators[symbol]
-                    if what["side"] == "buy"
-                    else trading_data.sell_indicators[symbol],
-                )
+    print(f"start time with data {bars.index[minute_index]}")
+    return bars, bars.index[minute_index]
 
-                await db_trade.save(
-                    config.db_conn_pool,
-                    str(new_now),
-                    trading_data.stop_prices[symbol],
-                    trading_data.target_prices[symbol],
-                )
 
-                if what["side"] == "buy":
-                    await strategy.buy_callback(
-                        symbol, price, int(float(what["qty"]))
-                    )
-                    break
-                elif what["side"] == "sell":
-                    await strategy.sell_callback(
-                        symbol, price, int(float(what["qty"]))
-                    )
-                    break
-            last_run_id = strategy.algo_run.run_id
-
-        minute_index += 1
-        new_now = symbol_data.index[minute_index]
-
-    if position:
-        if (
-            trading_data.last_used_strategy[symbol].type
-            == StrategyType.DAY_TRADE
-        ):
-            tlog(f"[{new_now}]{symbol} liquidate {position} at {price}")
-            db_trade = NewTrade(
-                algo_run_id=last_run_id,  # type: ignore
-                symbol=symbol,
-                qty=int(position) if int(position) > 0 else -int(position),
-                operation="sell" if position > 0 else "buy",
-                price=price,
-                indicators={"liquidate": 1},
-            )
-            await db_trade.save(
-                config.db_conn_pool,
-                str(symbol_data.index[minute_index - 1]),
+async def backtest_symbols(
+    data_api: tradeapi,
+    portfolio_value: float,
+    conf_dict: Dict,
+    uid: str,
+    start: datetime,
+    duration: timedelta,
+    ref_run_id: Optional[int],
+    bypass_strategy_duration: bool,
+    symbols_and_start_time: List[Tuple[str, datetime]],
+    debug_symbols: List[str],
+) -> None:
+    """Create the strategies, load the symbols and replay them all together
+    on a `BacktestEngine` until the market closes"""
+    est = pytz.timezone("America/New_York")
+    start_time = pytz.utc.localize(start).astimezone(est)
+    config.market_open = start_time.replace(
+        hour=9, minute=30, second=0, microsecond=0
+    )
+    config.market_close = start_time.replace(
+        hour=16, minute=0, second=0, microsecond=0
+    )
+    print(f"market_open {config.market_open}")
+    await create_strategies(
+        conf_dict,
+        duration,
+        ref_run_id,
+        uid,
+        start,
+        bypass_strategy_duration,
+    )
+
+    engine = BacktestEngine(
+        portfolio_value, config.market_close, debug_symbols
+    )
+    for symbol, scanner_start_time in symbols_and_start_time:
+        loaded = await load_symbol(
+            data_api=data_api,
+            symbol=symbol,
+            start=start,
+            duration=duration,
+            scanner_start_time=scanner_start_time,
+            debug_symbol=True if symbol in debug_symbols else False,
+        )
+        if loaded:
+            engine.add_symbol(symbol, *loaded)
+
+    await engine.run()
+    await engine.liquidate()
+
+
+def backtest_shard(
+    worker_id: int,
+    build_label: str,
+    uid: str,
+    conf_dict: Dict,
+    start: datetime,
+    duration: timedelta,
+    ref_run_id: Optional[int],
+    bypass_strategy_duration: bool,
+    symbols_and_start_time: List[Tuple[str, datetime]],
+    debug_symbols: List[str],
+) -> int:
+    """Worker process entry-point: back-test a shard of the symbols w/ its
+    own strategies (and algo_run rows) and trading data, saving the trades
+    under the batch-id uid. Returns number of back-tested symbols"""
+    config.build_label = build_label
+    config.portfolio_value = conf_dict.get("portfolio_value", None)
+    if "risk" in conf_dict:
+        config.risk = conf_dict["risk"]
+    portfolio_value: float = (
+        100000.0 if not config.portfolio_value else config.portfolio_value
+    )
+    data_api: tradeapi = tradeapi.REST(
+        base_url=config.prod_base_url,
+        key_id=config.prod_api_key_id,
+        secret_key=config.prod_api_secret,
+    )
+
+    async def shard_main() -> None:
+        await create_db_connection()
+        await start_journal(config.db_conn_pool, f"backtest-{worker_id}")
+        try:
+            await backtest_symbols(
+                data_api,
+                portfolio_value,
+                conf_dict,
+                uid,
+                start,
+                duration,
+                ref_run_id,
+                bypass_strategy_duration,
+                symbols_and_start_time,
+                debug_symbols,
             )
+        finally:
+            await stop_journal()
+
+    tlog(
+        f"backtest_shard({worker_id}) starting w pid {os.getpid()} on {len(symbols_and_start_time)} symbols"
+    )
+    asyncio.run(shard_main())
+    return len(symbols_and_start_time)
+
+
+async def backtest_in_workers(
+    workers: int,
+    uid: str,
+    conf_dict: Dict,
+    start: datetime,
+    duration: timedelta,
+    ref_run_id: Optional[int],
+    bypass_strategy_duration: bool,
+    symbols_and_start_time: List[Tuple[str, datetime]],
+    debug_symbols: List[str],
+) -> None:
+    """Shard the symbols round-robin across worker processes (spawned, so
+    no state is inherited), and wait for all shards to complete"""
+    shards = [
+        symbols_and_start_time[i::workers]
+        for i in range(min(workers, len(symbols_and_start_time)))
+    ]
+    tlog(
+        f"back-testing {len(symbols_and_start_time)} symbols w/ {len(shards)} workers"
+    )
+
+    loop = asyncio.get_event_loop()
+    with ProcessPoolExecutor(
+        max_workers=len(shards), mp_context=mp.get_context("spawn")
+    ) as executor:
+        done = await asyncio.gather(
+            *[
+                loop.run_in_executor(
+                    executor,
+                    backtest_shard,
+                    worker_id,
+                    config.build_label,
+                    uid,
+                    conf_dict,
+                    start,
+                    duration,
+                    ref_run_id,
+                    bypass_strategy_duration,
+                    shard,
+                    debug_symbols,
+                )
+                for worker_id, shard in enumerate(shards)
+            ]
+        )
+
+    tlog(f"back-tested {sum(done)} symbols under batch-id {uid}")
 
 
 def backtest(
@@ -356,6 +413,7 @@ def backtest(
     strict: bool = False,
     specific_symbols: List[str] = None,
     bypass_duration: int = None,
+    workers: int = 1,
 ) -> str:
     data_api: tradeapi = tradeapi.REST(
         base_url=config.prod_base_url,
@@ -398,40 +456,44 @@ def backtest(
 
         print(f"loaded {len(symbols_and_start_time)} symbols")
 
-        if num_symbols > 0:
-            est = pytz.timezone("America/New_York")
-            start_time = pytz.utc.localize(start).astimezone(est)
-            config.market_open = start_time.replace(
-                hour=9, minute=30, second=0, microsecond=0
-            )
-            config.market_close = start_time.replace(
-                hour=16, minute=0, second=0, microsecond=0
-            )
-            print(f"market_open {config.market_open}")
-            await create_strategies(
+        if num_symbols == 0:
+            return
+        elif workers > 1:
+            await backtest_in_workers(
+                workers,
+                uid,
                 conf_dict,
+                start,
                 duration,
                 ref_run_id,
+                bypass_duration is not None,
+                symbols_and_start_time,
+                debug_symbols,
+            )
+        else:
+            await backtest_symbols(
+                data_api,
+                portfolio_value,
+                conf_dict,
                 uid,
                 start,
+                duration,
+                ref_run_id,
                 bypass_duration is not None,
+                symbols_and_start_time,
+                debug_symbols,
             )
 
-            for symbol_and_start_time in symbols_and_start_time:
-                symbol = symbol_and_start_time[0]
-                await backtest_symbol(
-                    data_api=data_api,
-                    portfolio_value=portfolio_value,
-                    symbol=symbol,
-                    start=start,
-                    duration=duration,
-                    scanner_start_time=symbol_and_start_time[1],
-                    debug_symbol=True if symbol in debug_symbols else False,
-                )
-
     @timeit
     async def backtest_worker() -> None:
         await create_db_connection()
+        await start_journal(config.db_conn_pool, "backtest")
+        try:
+            await backtest_batch()
+        finally:
+            await stop_journal()
+
+    async def backtest_batch() -> None:
         run_details = await AlgoRun.get_batch_details(batch_id)
         run_ids, starts, ends, _ = zip(*run_details)
 
@@ -462,10 +524,12 @@ def backtest(
             )
 
     try:
-        if not asyncio.get_event_loop().is_closed():
-            asyncio.get_event_loop().close()
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(asyncio.new_event_loop())
+        # run on the thread's loop, so callers like the back-testing UI
+        # keep it (and the analytics session connected on it)
+        loop = asyncio.get_event_loop()
+        if loop.is_closed():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
         loop.run_until_complete(backtest_worker())
     except KeyboardInterrupt:
         tlog("backtest() - Caught KeyboardInterrupt")
@@ -492,11 +556,12 @@ class BackTestDay:
 
         self.conf_dict = conf_dict
         config.portfolio_value = self.conf_dict.get("portfolio_value", None)
-        self.minute_history: Dict[str, pd.DataFrame] = {}
+        self.minute_history: Dict[str, BarStore] = {}
         self.scanners: List[Scanner] = []
 
     async def create(self, day: date) -> str:
         await create_db_connection()
+        await start_journal(config.db_conn_pool, "backtest")
         scanners_conf = self.conf_dict["scanners"]
 
         est = pytz.timezone("America/New_York")
@@ -597,6 +662,7 @@ class BackTestDay:
         self.portfolio_value: float = (
             100000.0 if not config.portfolio_value else config.portfolio_value
         )
+        self.engine = BacktestEngine(self.portfolio_value, self.end)
         if "risk" in self.conf_dict:
             config.risk = self.conf_dict["risk"]
         return self.uid
@@ -626,102 +692,31 @@ class BackTestDay:
                             )
                             self.minute_history = {
                                 **self.minute_history,
-                                **(
-                                    market_data.get_historical_data_from_poylgon_for_symbols(
+                                **{
+                                    symbol: BarStore.from_dataframe(bars)
+                                    for symbol, bars in market_data.get_historical_data_from_poylgon_for_symbols(
                                         self.data_api,
                                         really_new,
                                         self.start - timedelta(days=7),
                                         self.start + timedelta(days=1),
-                                    )
-                                ),
+                                    ).items()
+                                },
                             }
+                            market_data.minute_history.update(
+                                self.minute_history
+                            )
+                            for symbol in really_new:
+                                if symbol in self.minute_history:
+                                    self.engine.add_symbol(
+                                        symbol,
+                                        self.minute_history[symbol],
+                                        self.now,
+                                    )
                             self.symbols += really_new
                             print(f"loaded data for {len(really_new)} stocks")
 
-            for symbol in self.symbols:
-                try:
-                    for strategy in trading_data.strategies:
-
-                        try:
-                            minute_index = self.minute_history[symbol][
-                                "close"
-                            ].index.get_loc(self.now, method="nearest")
-                        except Exception as e:
-                            print(f"[Exception] {self.now} {symbol} {e}")
-                            print(self.minute_history[symbol]["close"][-100:])
-                            continue
-
-                        price = self.minute_history[symbol]["close"][
-                            minute_index
-                        ]
-
-                        if symbol not in trading_data.positions:
-                            trading_data.positions[symbol] = 0
-
-                        do, what = await strategy.run(
-                            symbol,
-                            True,
-                            int(trading_data.positions[symbol]),
-                            self.minute_history[symbol][: minute_index + 1],
-                            self.now,
-                            self.portfolio_value,
-                            debug=False,  # type: ignore
-                            backtesting=True,
-                        )
-                        if do:
-                            if (
-                                what["side"] == "buy"
-                                and float(what["qty"]) > 0
-                                or what["side"] == "sell"
-                                and float(what["qty"]) < 0
-                            ):
-                                trading_data.positions[symbol] += int(
-                                    float(what["qty"])
-                                )
-                                trading_data.buy_time[
-                                    symbol
-                                ] = self.now.replace(second=0, microsecond=0)
-                            else:
-                                trading_data.positions[symbol] -= int(
-                                    float(what["qty"])
-                                )
-
-                            trading_data.last_used_strategy[symbol] = strategy
-
-                            rc_msg.append(
-                                f"[{self.now}][{strategy.name}] {what['side']} {what['qty']} of {symbol} @ {price}"
-                            )
-                            db_trade = NewTrade(
-                                algo_run_id=strategy.algo_run.run_id,
-                                symbol=symbol,
-                                qty=int(float(what["qty"])),
-                                operation=what["side"],
-                                price=price,
-                                indicators=trading_data.buy_indicators[symbol]
-                                if what["side"] == "buy"
-                                else trading_data.sell_indicators[symbol],
-                            )
-
-                            await db_trade.save(
-                                config.db_conn_pool,
-                                str(self.now.to_pydatetime()),
-                                trading_data.stop_prices[symbol],
-                                trading_data.target_prices[symbol],
-                            )
-
-                            if what["side"] == "buy":
-                                await strategy.buy_callback(
-                                    symbol, price, int(float(what["qty"]))
-                                )
-                                break
-                            elif what["side"] == "sell":
-                                await strategy.sell_callback(
-                                    symbol, price, int(float(what["qty"]))
-                                )
-                                break
-                except Exception as e:
-                    print(f"[Exception] {self.now} {symbol} {e}")
-                    traceback.print_exc()
+            # only symbols w/ a bar at now are dispatched
+            rc_msg += await self.engine.run(until=self.now)
 
             self.now += timedelta(minutes=1)
 
@@ -730,26 +725,7 @@ class BackTestDay:
             return False, []
 
     async def liquidate(self):
-        for symbol in trading_data.positions:
-            if (
-                trading_data.positions[symbol] != 0
-                and trading_data.last_used_strategy[symbol].type
-                == StrategyType.DAY_TRADE
-            ):
-                position = trading_data.positions[symbol]
-                minute_index = self.minute_history[symbol][
-                    "close"
-                ].index.get_loc(self.now, method="nearest")
-                price = self.minute_history[symbol]["close"][minute_index]
-                tlog(f"[{self.end}]{symbol} liquidate {position} at {price}")
-                db_trade = NewTrade(
-                    algo_run_id=trading_data.last_used_strategy[symbol].algo_run.run_id,  # type: ignore
-                    symbol=symbol,
-                    qty=int(position) if int(position) > 0 else -int(position),
-                    operation="sell" if position > 0 else "buy",
-                    price=price,
-                    indicators={"liquidate": 1},
-                )
-                await db_trade.save(
-                    config.db_conn_pool, str(self.now.to_pydatetime())
-                )
+        await self.engine.liquidate(self.now)
+
+        # the day is over, save the journaled trades
+        await stop_journal()
@@ -0,0 +1,280 @@
+"""On-disk cache of Polygon aggregates, in front of `historic_agg_v2()`"""
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Any, Iterator, List, Optional, Tuple
+
+import alpaca_trade_api as tradeapi
+import numpy as np
+import pandas as pd
+from pandas import DataFrame as df
+
+from liualgotrader.common import config
+from liualgotrader.common.tlog import tlog
+
+NY = "America/New_York"
+COLUMNS = ["open", "high", "low", "close", "volume", "vwap"]
+DTYPE = np.dtype([("t", "<i8")] + [(c, "<f8") for c in COLUMNS])
+
+# Polygon's max. results per request, and days per request that fit it
+# (w/ extended hours, up to 960 minute bars a day)
+MAX_LIMIT = 50000
+MAX_DAYS = 30
+
+Interval = Tuple[date, date]
+
+
+def to_date(when: Any) -> date:
+    """Trading day of a date, datetime, timestamp or ISO formatted string"""
+    if isinstance(when, date) and not isinstance(when, datetime):
+        return when
+    ts = pd.Timestamp(when)
+    return (ts.tz_convert(NY) if ts.tzinfo else ts).date()
+
+
+def merge_intervals(intervals: List[Interval]) -> List[Interval]:
+    """Merge overlapping and adjacent day intervals"""
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(
+    interval: Interval, covered: List[Interval]
+) -> List[Interval]:
+    """Parts of `interval` not in the (merged) `covered` intervals"""
+    start, end = interval
+    missing: List[Interval] = []
+    for c_start, c_end in covered:
+        if c_end < start:
+            continue
+        if c_start > end:
+            break
+        if c_start > start:
+            missing.append((start, c_start - timedelta(days=1)))
+        start = max(start, c_end + timedelta(days=1))
+    if start <= end:
+        missing.append((start, end))
+    return missing
+
+
+class BarCache:
+    """Polygon aggregates (multiplier 1) kept on disk per symbol & timespan.
+
+    Bars are stored in monthly NumPy files, read back memory-mapped, and
+    `coverage.json` keeps the intervals of trading days already loaded, so
+    only the missing days are requested from Polygon. Days from today on
+    are never cached, as their bars are not final. Writes are serialized
+    w/ a lock file, so processes may share the cache.
+
+    Polygon returns split-adjusted prices, clear the symbol's directory
+    after a split.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.expanduser(root)
+
+    def _dir(self, symbol: str, timespan: str) -> str:
+        return os.path.join(self.root, timespan, symbol)
+
+    def _partition(self, symbol: str, timespan: str, month: str) -> str:
+        return os.path.join(self._dir(symbol, timespan), f"{month}.npy")
+
+    @contextmanager
+    def _locked(self, symbol: str, timespan: str) -> Iterator[None]:
+        os.makedirs(self._dir(symbol, timespan), exist_ok=True)
+        with open(
+            os.path.join(self._dir(symbol, timespan), ".lock"), "w"
+        ) as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _write(path: str, write) -> None:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+
+    def coverage(self, symbol: str, timespan: str) -> List[Interval]:
+        path = os.path.join(self._dir(symbol, timespan), "coverage.json")
+        try:
+            with open(path) as f:
+                return [
+                    (date.fromisoformat(start), date.fromisoformat(end))
+                    for start, end in json.load(f)
+                ]
+        except FileNotFoundError:
+            return []
+
+    def missing(
+        self, symbol: str, timespan: str, start: date, end: date
+    ) -> List[Interval]:
+        """Day intervals between `start` and `end` not in the cache"""
+        return subtract_intervals(
+            (start, end), self.coverage(symbol, timespan)
+        )
+
+    @staticmethod
+    def _day_bounds(start: date, end: date) -> Tuple[int, int]:
+        first = pd.Timestamp(start).tz_localize(NY)
+        last = pd.Timestamp(end + timedelta(days=1)).tz_localize(NY)
+        return first.value, last.value
+
+    @staticmethod
+    def _months(start: date, end: date) -> List[str]:
+        return list(pd.period_range(start, end, freq="M").strftime("%Y-%m"))
+
+    def store(
+        self, symbol: str, timespan: str, bars: df, start: date, end: date
+    ) -> None:
+        """Cache `bars`, the full Polygon response for days `start` to
+        `end`, days from today on are dropped"""
+        end = min(end, pd.Timestamp.now(tz=NY).date() - timedelta(days=1))
+        if end < start:
+            return
+
+        first, last = self._day_bounds(start, end)
+        records = np.empty(len(bars), dtype=DTYPE)
+        if len(bars):
+            index = pd.DatetimeIndex(bars.index)
+            records["t"] = (
+                index.tz_localize(NY) if index.tz is None else index
+            ).asi8
+            for column in COLUMNS:
+                records[column] = (
+                    bars[column].to_numpy(dtype="float64")
+                    if column in bars
+                    else np.nan
+                )
+        records = records[(records["t"] >= first) & (records["t"] < last)]
+        months = (
+            pd.to_datetime(records["t"], utc=True)
+            .tz_convert(NY)
+            .strftime("%Y-%m")
+        )
+
+        with self._locked(symbol, timespan):
+            for month in self._months(start, end):
+                path = self._partition(symbol, timespan, month)
+                new = records[months == month]
+                if os.path.exists(path):
+                    old = np.load(path)
+                    # bars of the stored days are replaced
+                    old = old[(old["t"] < first) | (old["t"] >= last)]
+                    new = np.concatenate([old, new])
+                    new = new[np.argsort(new["t"], kind="stable")]
+                elif not len(new):
+                    continue
+
+                self._write(path, lambda f: np.save(f, new))
+
+            coverage = merge_intervals(
+                self.coverage(symbol, timespan) + [(start, end)]
+            )
+            self._write(
+                os.path.join(self._dir(symbol, timespan), "coverage.json"),
+                lambda f: f.write(
+                    json.dumps(
+                        [[s.isoformat(), e.isoformat()] for s, e in coverage]
+                    ).encode()
+                ),
+            )
+
+    def read(self, symbol: str, timespan: str, start: date, end: date) -> df:
+        """Cached bars of days `start` to `end`"""
+        first, last = self._day_bounds(start, end)
+        parts = []
+        for month in self._months(start, end):
+            path = self._partition(symbol, timespan, month)
+            if not os.path.exists(path):
+                continue
+            records = np.load(path, mmap_mode="r")
+            lo, hi = np.searchsorted(records["t"], [first, last])
+            parts.append(np.array(records[lo:hi]))
+
+        records = np.concatenate(parts) if parts else np.empty(0, DTYPE)
+        return self.to_dataframe(records)
+
+    @staticmethod
+    def to_dataframe(records: np.ndarray) -> df:
+        index = pd.to_datetime(records["t"], utc=True).tz_convert(NY)
+        index.name = "timestamp"
+        return df({c: records[c] for c in COLUMNS}, index=index)
+
+    @staticmethod
+    def _chunks(intervals: List[Interval]) -> Iterator[Interval]:
+        """Split intervals, so each request fits Polygon's limit"""
+        for start, end in intervals:
+            while start <= end:
+                chunk_end = min(end, start + timedelta(days=MAX_DAYS - 1))
+                yield start, chunk_end
+                start = chunk_end + timedelta(days=1)
+
+    def get(
+        self, api: tradeapi, symbol: str, timespan: str, _from: Any, to: Any
+    ) -> df:
+        """Bars of days `_from` to `to`, loading missing days from Polygon"""
+        start, end = to_date(_from), to_date(to)
+        today = pd.Timestamp.now(tz=NY).date()
+        fresh: List[df] = []
+        for m_start, m_end in self._chunks(
+            self.missing(symbol, timespan, start, end)
+        ):
+            bars = api.polygon.historic_agg_v2(
+                symbol,
+                1,
+                timespan,
+                _from=str(m_start),
+                to=str(m_end),
+                limit=MAX_LIMIT,
+            ).df
+            if len(bars) >= MAX_LIMIT:
+                tlog(
+                    f"[WARNING] {symbol} {timespan} bars {m_start}:{m_end} may be truncated, not cached"
+                )
+                fresh.append(bars[COLUMNS])
+                continue
+
+            self.store(symbol, timespan, bars, m_start, m_end)
+            if m_end >= today:
+                first, _ = self._day_bounds(max(m_start, today), m_end)
+                fresh.append(bars[bars.index.asi8 >= first][COLUMNS])
+
+        bars = self.read(symbol, timespan, start, end)
+        if fresh:
+            bars = pd.concat([bars] + fresh)
+            bars = bars[~bars.index.duplicated(keep="last")].sort_index()
+        return bars
+
+
+_cache: Optional[BarCache] = None
+
+
+def get_bars(
+    api: tradeapi, symbol: str, timespan: str, _from: Any, to: Any, **kwargs
+) -> df:
+    """`historic_agg_v2(symbol, 1, timespan, _from, to).df`, served from the
+    bar cache when `LIU_BAR_CACHE_DIR` is set"""
+    global _cache
+    if not config.bar_cache_dir:
+        return api.polygon.historic_agg_v2(
+            symbol, 1, timespan, _from=_from, to=to, **kwargs
+        ).df
+
+    if _cache is None or _cache.root != os.path.expanduser(
+        config.bar_cache_dir
+    ):
+        _cache = BarCache(config.bar_cache_dir)
+        tlog(f"caching Polygon aggregates in {_cache.root}")
+
+    return _cache.get(api, symbol, timespan, _from, to)
@@ -0,0 +1,309 @@
+"""Append-optimized storage of a symbol's OHLC bars"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame as df
+
+BAR_COLUMNS = ["open", "high", "low", "close", "volume", "vwap", "average"]
+
+
+class BarStore:
+    """Time-ordered bars of a single symbol, kept in preallocated NumPy
+    arrays which double in capacity when full.
+
+    Appending a new bar and updating the current one are O(1), and `df`
+    returns a DataFrame sharing the store's memory, so handing the bars to
+    `Strategy.run()` does not copy them. For compatibility, attribute and
+    item access fall through to `df` (e.g. `bars["close"]`, `bars.index`).
+
+    `indicators` holds streaming indicator sets attached to the bars (see
+    `liualgotrader.fincalcs.incremental`), and `revision` is bumped when
+    bars are inserted out of order, so indicators know to start over.
+    `signals` holds, per strategy, indicator arrays computed over all the
+    bars at once by the back-testing engine (see
+    `Strategy.vectorized_indicators()`).
+    """
+
+    def __init__(
+        self,
+        columns: Sequence[str] = None,
+        capacity: int = 4096,
+        tz: str = "America/New_York",
+    ):
+        self.columns: List[str] = list(columns or BAR_COLUMNS)
+        self.tz = tz
+        self._positions = {c: i for i, c in enumerate(self.columns)}
+        self._column_index = pd.Index(self.columns)
+        self._data = np.full((max(capacity, 1), len(self.columns)), np.nan)
+        self._index = np.zeros(max(capacity, 1), dtype="int64")
+        self._size = 0
+        self._dt_index: Optional[pd.DatetimeIndex] = None
+        self.indicators: Dict[str, Any] = {}
+        self.signals: Dict[str, Dict[str, np.ndarray]] = {}
+        self.revision = 0
+
+    @classmethod
+    def from_dataframe(
+        cls, data: df, capacity: int = None, tz: str = "America/New_York"
+    ) -> "BarStore":
+        bars = cls(
+            columns=list(data.columns),
+            capacity=max(capacity or 0, 2 * len(data), 1),
+            tz=tz,
+        )
+        index = pd.DatetimeIndex(data.index)
+        if index.tz is None:
+            index = index.tz_localize(tz)
+        bars._data[: len(data)] = data.to_numpy(dtype="float64")
+        bars._index[: len(data)] = index.asi8
+        bars._size = len(data)
+        return bars
+
+    @classmethod
+    def from_arrays(
+        cls,
+        columns: Sequence[str],
+        index: np.ndarray,
+        data: np.ndarray,
+        tz: str = "America/New_York",
+    ) -> "BarStore":
+        """Wrap epoch (ns) index & values w/o copying. Read-only arrays
+        (e.g. views of shared memory) are copied on the first write."""
+        bars = cls(columns=columns, tz=tz)
+        if len(index):
+            bars._data, bars._index = data, index
+            bars._size = len(index)
+        return bars
+
+    def __reduce__(self):
+        return (
+            _restore,
+            (
+                self.columns,
+                self.tz,
+                self._data[: self._size].copy(),
+                self._index[: self._size].copy(),
+            ),
+        )
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return self._data.shape[0]
+
+    def _writable(self) -> None:
+        if not self._data.flags.writeable or not self._index.flags.writeable:
+            self._grow()
+
+    def _grow(self) -> None:
+        capacity = 2 * self.capacity
+        data = np.full((capacity, len(self.columns)), np.nan)
+        data[: self._size] = self._data[: self._size]
+        index = np.zeros(capacity, dtype="int64")
+        index[: self._size] = self._index[: self._size]
+        self._data, self._index = data, index
+
+    @staticmethod
+    def _ns(ts: Any) -> int:
+        return pd.Timestamp(ts).value
+
+    def _locate(self, ns: int) -> int:
+        return int(np.searchsorted(self._index[: self._size], ns))
+
+    def append(self, ts: Any, values: Sequence[float]) -> None:
+        ns = self._ns(ts)
+        if self._size and ns <= self._index[self._size - 1]:
+            raise ValueError(f"{ts} is not after the last bar")
+        self._writable()
+        if self._size == self.capacity:
+            self._grow()
+
+        self._data[self._size] = values
+        self._index[self._size] = ns
+        self._size += 1
+        self._dt_index = None
+
+    def update(self, values: Sequence[float], position: int = -1) -> None:
+        """Overwrite bar in place (the last bar by default)"""
+        if not self._size:
+            raise IndexError("no bars to update")
+        self._writable()
+        self._data[position % self._size] = values
+
+    def upsert(self, ts: Any, values: Sequence[float]) -> None:
+        """Update the bar at `ts` if exists, otherwise add it"""
+        ns = self._ns(ts)
+        if not self._size or ns > self._index[self._size - 1]:
+            self.append(ts, values)
+            return
+
+        self._writable()
+        position = self._locate(ns)
+        if self._index[position] == ns:
+            self._data[position] = values
+            return
+
+        # out of order bar, rare enough to pay for the shift
+        if self._size == self.capacity:
+            self._grow()
+        self._data[position + 1 : self._size + 1] = self._data[
+            position : self._size
+        ]
+        self._index[position + 1 : self._size + 1] = self._index[
+            position : self._size
+        ]
+        self._data[position] = values
+        self._index[position] = ns
+        self._size += 1
+        self._dt_index = None
+        self.revision += 1
+
+    def get(self, ts: Any) -> Optional[Dict[str, float]]:
+        """Return bar at `ts` as dict, or None"""
+        if not self._size:
+            return None
+
+        ns = self._ns(ts)
+        position = self._locate(ns)
+        if position == self._size or self._index[position] != ns:
+            return None
+
+        return dict(zip(self.columns, self._data[position].tolist()))
+
+    def row(self, position: int) -> Tuple[int, Dict[str, float]]:
+        """Epoch (ns) and values of the bar at `position`"""
+        ns = int(self._index[: self._size][position])
+        values = self._data[: self._size][position].tolist()
+        return ns, dict(zip(self.columns, values))
+
+    def nearest(self, ts: Any) -> int:
+        """Position of the bar closest in time to `ts`"""
+        if not self._size:
+            raise KeyError(ts)
+
+        ns = self._ns(ts)
+        right = min(self._locate(ns), self._size - 1)
+        left = max(right - 1, 0)
+        return (
+            left
+            if abs(ns - self._index[left]) < abs(self._index[right] - ns)
+            else right
+        )
+
+    def timestamp(self, position: int) -> pd.Timestamp:
+        return pd.Timestamp(
+            self._index[: self._size][position], tz="UTC"
+        ).tz_convert(self.tz)
+
+    def column(self, name: str) -> np.ndarray:
+        """Zero-copy view of a column"""
+        return self._data[: self._size, self._positions[name]]
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._data[: self._size]
+
+    @property
+    def index(self) -> pd.DatetimeIndex:
+        if self._dt_index is None:
+            self._dt_index = (
+                pd.DatetimeIndex(self._index[: self._size].view("M8[ns]"))
+                .tz_localize("UTC")
+                .tz_convert(self.tz)
+            )
+        return self._dt_index
+
+    def window(self, size: int) -> df:
+        """DataFrame view of the first `size` bars"""
+        size = min(max(size, 0), self._size)
+        return df(
+            self._data[:size],
+            index=self.index[:size],
+            columns=self._column_index,
+            copy=False,
+        )
+
+    @property
+    def df(self) -> df:
+        """DataFrame view of all bars"""
+        return self.window(self._size)
+
+    def __getitem__(self, key: Any) -> Any:
+        return self.df[key]
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.df, name)
+
+
+class BarCursor:
+    """Look-ahead free view of a `BarStore` for back-testing: only the
+    first `size` bars are visible, and the engine moves the cursor one bar
+    at a time.
+
+    Moving the cursor is O(1) and builds nothing. `column()`, `index` and
+    `len()` are views of the visible bars, while `df` (and, as w/
+    `BarStore`, attribute and item access falling through to it) builds a
+    DataFrame view on first use, shared by all strategies until the
+    cursor moves.
+    """
+
+    def __init__(self, bars: BarStore, size: int = 0):
+        self.bars = bars
+        self.size = 0
+        self._df: Optional[df] = None
+        self.seek(size)
+
+    def seek(self, size: int) -> None:
+        """Make the first `size` bars visible"""
+        size = min(max(size, 0), len(self.bars))
+        if size != self.size:
+            self.size = size
+            self._df = None
+
+    def advance(self, bars: int = 1) -> None:
+        self.seek(self.size + bars)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def column(self, name: str) -> np.ndarray:
+        """Zero-copy view of a column's visible bars"""
+        return self.bars.column(name)[: self.size]
+
+    @property
+    def values(self) -> np.ndarray:
+        return self.bars.values[: self.size]
+
+    @property
+    def index(self) -> pd.DatetimeIndex:
+        return self.bars.index[: self.size]
+
+    @property
+    def df(self) -> df:
+        """DataFrame view of the visible bars"""
+        if self._df is None:
+            self._df = self.bars.window(self.size)
+        return self._df
+
+    def __getitem__(self, key: Any) -> Any:
+        return self.df[key]
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.df, name)
+
+
+def _restore(
+    columns: List[str], tz: str, data: np.ndarray, index: np.ndarray
+) -> BarStore:
+    bars = BarStore(columns=columns, capacity=2 * len(data), tz=tz)
+    bars._data[: len(data)] = data
+    bars._index[: len(data)] = index
+    bars._size = len(data)
+    return bars
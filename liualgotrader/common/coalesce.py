@@ -0,0 +1,40 @@
+"""Collapse a backlog of market events before handing them to strategies"""
+from typing import Dict, List, Optional, Tuple
+
+# events that change the symbol's ownership, bars are never merged across them
+CONTROL_EVENTS = ("migrate_in", "migrate_out")
+
+
+def merge_bars(first: Dict, last: Dict) -> Dict:
+    """Merge two second-bars of the same symbol and minute"""
+    merged = dict(last)
+    merged["open"] = first["open"]
+    merged["high"] = max(first["high"], last["high"])
+    merged["low"] = min(first["low"], last["low"])
+    merged["volume"] = first["volume"] + last["volume"]
+    return merged
+
+
+def coalesce(events: List[Dict]) -> List[Dict]:
+    """Keep only the latest bar state per symbol and minute.
+
+    Second bars (`A`) of the same symbol & minute are merged into a single
+    bar, placed where the newest of them was, so minute history ends up the
+    same while strategies run once per symbol on the newest snapshot.
+    Any other event (trades, quotes, trade updates) is kept in order.
+    """
+    out: List[Optional[Dict]] = []
+    open_bars: Dict[Tuple[str, int], int] = {}
+    for event in events:
+        if event["EV"] == "A":
+            key = (event["symbol"], event["start"] // 60000)
+            if key in open_bars:
+                i = open_bars[key]
+                event = merge_bars(out[i], event)  # type: ignore
+                out[i] = None
+            open_bars[key] = len(out)
+        elif event["EV"] in CONTROL_EVENTS:
+            open_bars.clear()
+        out.append(event)
+
+    return [event for event in out if event is not None]
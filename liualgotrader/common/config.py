@@ -75,6 +75,54 @@ proc_factor: float = float(os.getenv("CPU_FACTOR", "2.0"))
 num_consumers: int = int(os.getenv("NUM_CONSUMERS", "0"))
 
 num_consumer_processes_ratio: int
+
+# producer -> consumer transport ("binary" or "json")
+transport: str = os.getenv("LIU_TRANSPORT", "binary")
+transport_flush_interval: float = (
+    float(os.getenv("LIU_TRANSPORT_FLUSH_MS", "20")) / 1000.0
+)
+transport_max_batch: int = int(os.getenv("LIU_TRANSPORT_MAX_BATCH", "256"))
+
+# consumer event queues ("shm" ring buffers or "mp" multiprocessing.Queue)
+event_queue: str = os.getenv("LIU_EVENT_QUEUE", "shm")
+event_queue_capacity: int = int(os.getenv("LIU_EVENT_QUEUE_CAPACITY", "1024"))
+event_queue_slot_size: int = int(
+    os.getenv("LIU_EVENT_QUEUE_SLOT_SIZE", str(32 * 1024))
+)
+# "block" or "drop_oldest"
+event_queue_policy: str = os.getenv("LIU_EVENT_QUEUE_POLICY", "block")
+# symbol to consumer sharding ("load" or "hash")
+sharding: str = os.getenv("LIU_SHARDING", "load")
+# seconds between consumer re-balancing, 0 disables moving symbols
+shard_rebalance_interval: float = float(
+    os.getenv("LIU_SHARD_REBALANCE_SEC", "60")
+)
+shard_rebalance_tolerance: float = float(
+    os.getenv("LIU_SHARD_REBALANCE_TOLERANCE", "0.25")
+)
+# seconds a consumer waits for a moved symbol's state
+shard_handoff_timeout: float = float(
+    os.getenv("LIU_SHARD_HANDOFF_TIMEOUT", "10")
+)
+# concurrent order requests (and keep-alive connections) per consumer
+order_gateway_workers: int = int(os.getenv("LIU_ORDER_GATEWAY_WORKERS", "4"))
+# latency histograms export, a file path or http(s) URL (tracing is off if empty)
+trace_export: str = os.getenv("LIU_TRACE_EXPORT", "")
+trace_interval: float = float(os.getenv("LIU_TRACE_INTERVAL_SEC", "60"))
+# concurrent Polygon requests when loading symbols history
+history_loader_workers: int = int(os.getenv("LIU_HISTORY_LOADER_WORKERS", "8"))
+# trades are saved in batches, every interval or when max. batch is queued
+journal_flush_interval: float = float(os.getenv("LIU_JOURNAL_FLUSH_SEC", "1"))
+journal_max_batch: int = int(os.getenv("LIU_JOURNAL_MAX_BATCH", "500"))
+# local file keeping trades until saved to the database (off if empty)
+journal_wal: str = os.getenv("LIU_JOURNAL_WAL", "")
+# on-disk cache of Polygon aggregates (no caching if empty)
+bar_cache_dir: str = os.getenv("LIU_BAR_CACHE_DIR", "")
+# rows per server-side cursor fetch, when streaming query results
+db_fetch_chunk_size: int = int(os.getenv("LIU_DB_FETCH_CHUNK_SIZE", "10000"))
+# seconds a loaded latest price is re-used for
+price_ttl: float = float(os.getenv("LIU_PRICE_TTL_SEC", "15"))
+
 # polygon parameters
 polygon_seconds_timeout = 60
 
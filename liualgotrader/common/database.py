@@ -1,7 +1,10 @@
-from typing import Dict
+from typing import AsyncIterator, List
 
 import asyncpg
+import numpy as np
 import pandas as pd
+from asyncpg import Record
+from asyncpg.prepared_stmt import PreparedStatement
 
 from liualgotrader.common import config
 from liualgotrader.common.tlog import tlog
@@ -29,3 +32,119 @@ async def fetch_as_dataframe(query: str, *args) -> pd.DataFrame:
         columns = [a.name for a in stmt.get_attributes()]
         data = await stmt.fetch(*args)
         return pd.DataFrame(data=data, columns=columns)
+
+
+async def fetch_as_dataframe_chunked(
+    query: str, *args, chunk_size: int = None
+) -> pd.DataFrame:
+    """fetch_as_dataframe() over a server-side cursor: rows are converted
+    to typed columns one chunk at a time, so the full result is never held
+    as asyncpg Records"""
+    return await _concat(
+        stream_as_dataframes(query, *args, chunk_size=chunk_size)
+    )
+
+
+async def stream_as_dataframes(
+    query: str, *args, chunk_size: int = None
+) -> AsyncIterator[pd.DataFrame]:
+    """Yield the query result as DataFrames of up to chunk_size rows each,
+    for consumers processing the result incrementally"""
+    try:
+        if config.db_conn_pool:
+            pass
+    except AttributeError:
+        await create_db_connection()
+
+    async with config.db_conn_pool.acquire() as con:
+        # cursors only live inside a transaction
+        async with con.transaction():
+            stmt = await con.prepare(query)
+            async for df in stream_statement(
+                stmt, *args, chunk_size=chunk_size
+            ):
+                yield df
+
+
+async def fetch_statement(
+    stmt: PreparedStatement, *args, chunk_size: int = None
+) -> pd.DataFrame:
+    """fetch_as_dataframe_chunked() of a prepared statement, must be
+    called inside a transaction"""
+    return await _concat(stream_statement(stmt, *args, chunk_size=chunk_size))
+
+
+async def stream_statement(
+    stmt: PreparedStatement, *args, chunk_size: int = None
+) -> AsyncIterator[pd.DataFrame]:
+    """stream_as_dataframes() of a prepared statement, must be called
+    inside a transaction. An empty result is a single, empty, chunk"""
+    chunk_size = chunk_size or config.db_fetch_chunk_size
+    cursor = await stmt.cursor(*args)
+    records = await cursor.fetch(chunk_size)
+    yield records_to_dataframe(stmt, records)
+    while len(records) == chunk_size:
+        records = await cursor.fetch(chunk_size)
+        if records:
+            yield records_to_dataframe(stmt, records)
+
+
+def records_to_dataframe(
+    stmt: PreparedStatement, records: List[Record]
+) -> pd.DataFrame:
+    """DataFrame of typed columns from records returned by stmt"""
+    attributes = stmt.get_attributes()
+    return _to_dataframe(
+        [a.name for a in attributes],
+        [a.type.name for a in attributes],
+        records,
+    )
+
+
+async def _concat(frames: AsyncIterator[pd.DataFrame]) -> pd.DataFrame:
+    chunks = [df async for df in frames]
+    if len(chunks) == 1:
+        return chunks[0]
+
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _to_dataframe(
+    names: List[str], types: List[str], records: List[Record]
+) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            name: _to_column([record[i] for record in records], types[i])
+            for i, name in enumerate(names)
+        },
+        columns=names,
+    )
+
+
+def _to_column(values: List, type_name: str):
+    """Typed column array for the Postgres type type_name. Floats &
+    numerics are float64 (NULL is NaN), integers int64 (float64 if there
+    are NULLs), timestamps datetime64 (NULL is NaT). Other types are kept
+    as objects"""
+    if type_name in ("float4", "float8", "numeric"):
+        return np.fromiter(
+            (np.nan if v is None else float(v) for v in values),
+            dtype=np.float64,
+            count=len(values),
+        )
+    elif type_name in ("int2", "int4", "int8"):
+        if any(v is None for v in values):
+            return np.fromiter(
+                (np.nan if v is None else v for v in values),
+                dtype=np.float64,
+                count=len(values),
+            )
+        return np.fromiter(values, dtype=np.int64, count=len(values))
+    elif type_name == "timestamp":
+        return pd.to_datetime(values)
+    elif type_name == "timestamptz":
+        return pd.to_datetime(values, utc=True)
+
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
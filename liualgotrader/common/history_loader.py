@@ -0,0 +1,158 @@
+"""Concurrent loading of historical bars, w/ rate-limit aware back-off"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from liualgotrader.common import config
+from liualgotrader.common.tlog import tlog
+
+
+def retry_after(e: Exception) -> Optional[float]:
+    """Seconds to pause if `e` is a rate-limit (HTTP 429) error, else None"""
+    response = getattr(e, "response", None)
+    if (
+        not isinstance(e, requests.exceptions.HTTPError)
+        or response is None
+        or response.status_code != 429
+    ):
+        return None
+
+    try:
+        return float(response.headers.get("Retry-After", 0))
+    except ValueError:
+        return 0.0
+
+
+class HistoryLoader:
+    """Loads the history of many symbols on a pool of threads.
+
+    At most `max_workers` requests are in flight at once. Failed requests
+    are retried w/ exponential back-off, up to `retries` times. A
+    rate-limit response pauses all the workers, for the duration the
+    server asked for (or the back-off), rather than having each worker
+    hit the limit on its own.
+
+    If the data API's `requests.Session` is given, it's mounted w/ a
+    keep-alive connection pool as large as the thread pool.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = None,
+        retries: int = 5,
+        backoff: float = 1.0,
+        max_backoff: float = 30.0,
+        session: requests.Session = None,
+    ):
+        self.max_workers = max_workers or config.history_loader_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failed: Dict[str, Exception] = {}
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+        self.session = session
+        if session is not None:
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=self.max_workers
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+
+    def _pause(self, seconds: float) -> None:
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def _wait(self) -> None:
+        while True:
+            with self._lock:
+                delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def fetch(self, symbol: str, func: Callable[[str], Any]) -> Any:
+        """Call `func(symbol)`, retrying on failure"""
+        attempt = 0
+        while True:
+            self._wait()
+            try:
+                return func(symbol)
+            except Exception as e:
+                attempt += 1
+                if attempt > self.retries:
+                    raise
+
+                backoff = min(
+                    self.backoff * 2 ** (attempt - 1), self.max_backoff
+                )
+                pause = retry_after(e)
+                if pause is not None:
+                    pause = pause or backoff
+                    tlog(
+                        f"rate limited loading {symbol}, pausing requests for {pause} seconds"
+                    )
+                    self._pause(pause)
+                else:
+                    time.sleep(backoff)
+
+    def load(
+        self,
+        symbols: List[str],
+        func: Callable[[str], Any],
+        description: str = "data points",
+    ) -> Dict[str, Any]:
+        """Load symbols concurrently, return results by symbol, in the order
+        of `symbols`. Symbols `func` returns None for have no data, symbols
+        failing all retries are kept in `failed`."""
+        self.failed = {}
+        results: Dict[str, Any] = {}
+        if not symbols:
+            return results
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="history_loader"
+        ) as executor:
+            futures = {
+                executor.submit(self.fetch, symbol, func): symbol
+                for symbol in symbols
+            }
+            done = 0
+            try:
+                for future in as_completed(futures):
+                    symbol = futures[future]
+                    done += 1
+                    try:
+                        data = future.result()
+                    except Exception as e:
+                        self.failed[symbol] = e
+                        tlog(
+                            f"[ERROR] failed to load {description} for {symbol} w/ {e} ({done}/{len(symbols)})"
+                        )
+                        continue
+
+                    if data is None:
+                        tlog(f"no {description} for {symbol}")
+                        continue
+
+                    results[symbol] = data
+                    tlog(
+                        f"loaded {len(data)} {description} for {symbol} ({done}/{len(symbols)})"
+                    )
+            except KeyboardInterrupt:
+                tlog("KeyboardInterrupt")
+                for future in futures:
+                    future.cancel()
+
+        tlog(
+            f"loaded {description} for {len(results)}/{len(symbols)} symbols in {time.monotonic() - start:.1f} seconds, {len(self.failed)} failed"
+        )
+        return {
+            symbol: results[symbol] for symbol in symbols if symbol in results
+        }
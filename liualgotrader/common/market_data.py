@@ -1,7 +1,8 @@
 import io
+import threading
 import time
 from datetime import date, datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
 import alpaca_trade_api as tradeapi
 import pandas as pd
@@ -13,14 +14,22 @@ from pandas import Timestamp
 from pytz import timezone
 
 from liualgotrader.common import config, trading_data
+from liualgotrader.common.bar_cache import get_bars
+from liualgotrader.common.bar_store import BarStore
 from liualgotrader.common.decorators import timeit
+from liualgotrader.common.history_loader import HistoryLoader
 from liualgotrader.common.tlog import tlog
 from liualgotrader.fincalcs.vwap import add_daily_vwap
 from liualgotrader.models.ticker_snapshot import TickerSnapshot
 
 volume_today: Dict[str, int] = {}
-minute_history: Dict[str, df] = {}
+minute_history: Dict[str, BarStore] = {}
 quotes: Dict[str, df] = {}
+# symbol -> (price, time.monotonic() it was loaded at)
+latest_prices: Dict[str, Tuple[float, float]] = {}
+# history loader per data API session, so its connection pool is mounted once
+_loaders: Dict[int, HistoryLoader] = {}
+_loaders_lock = threading.Lock()
 
 
 def get_historical_data_from_finnhub(symbols: List[str]) -> Dict[str, df]:
@@ -84,22 +93,31 @@ def get_historical_data_from_finnhub(symbols: List[str]) -> Dict[str, df]:
     return minute_history
 
 
+def _loader(api: tradeapi) -> HistoryLoader:
+    session = getattr(api.polygon, "_session", None)
+    with _loaders_lock:
+        # the loader keeps a reference to its session, so ids aren't reused
+        loader = _loaders.get(id(session))
+        if loader is None:
+            loader = _loaders[id(session)] = HistoryLoader(session=session)
+    return loader
+
+
 def get_historical_data_from_poylgon_for_symbols(
     api: tradeapi, symbols: List[str], start_date: date, end_date: date
 ) -> Dict[str, df]:
-    minute_history = {}
-    for symbol in symbols:
-        if symbol not in minute_history:
-            minute_history[symbol] = api.polygon.historic_agg_v2(
-                symbol,
-                1,
-                "minute",
-                _from=start_date,
-                to=end_date,
-            ).df.tz_convert("US/Eastern")
-            add_daily_vwap(minute_history[symbol])
+    def _load(symbol: str) -> df:
+        _df = get_bars(
+            api,
+            symbol,
+            "minute",
+            _from=start_date,
+            to=end_date,
+        ).tz_convert("US/Eastern")
+        add_daily_vwap(_df)
+        return _df
 
-    return minute_history
+    return _loader(api).load(list(dict.fromkeys(symbols)), _load)
 
 
 def get_historical_data_from_polygon_by_range(
@@ -107,54 +125,35 @@ def get_historical_data_from_polygon_by_range(
 ) -> Dict[str, df]:
     """get ticker history"""
 
-    _minute_history: Dict[str, df] = {}
-    try:
-        for symbol in symbols:
-            from_date = start_date
-            while from_date < date.today():
-                retry = 5
-                _df = None
-                while retry > 0:
-                    try:
-                        _df = api.polygon.historic_agg_v2(
-                            symbol,
-                            1,
-                            timespan,
-                            _from=str(from_date),
-                            to=str(
-                                from_date
-                                + timedelta(
-                                    days=1 + config.polygon.MAX_DAYS_TO_LOAD
-                                )
-                            ),
-                        ).df
-                        break
-
-                    except Exception as e:
-
-                        retry -= 1
-
-                if _df is None or not len(_df):
-                    break
-
-                _df["vwap"] = 0.0
-                _df["average"] = 0.0
-
-                _minute_history[symbol] = (
-                    pd.concat([_minute_history[symbol], _df])
-                    if symbol in _minute_history
-                    else _df
-                )
-
-                from_date = _df.index[-1] + timedelta(days=1)
-
-                tlog(
-                    f"get_historical_data_from_polygon_by_range() - total loaded {len(_minute_history[symbol].index)} agg data points for {symbol}"
-                )
-    except KeyboardInterrupt:
-        tlog("KeyboardInterrupt")
-
-    return _minute_history
+    def _load(symbol: str) -> Optional[df]:
+        _minute_history: Optional[df] = None
+        from_date = start_date
+        while from_date < date.today():
+            _df = get_bars(
+                api,
+                symbol,
+                timespan,
+                _from=str(from_date),
+                to=str(
+                    from_date
+                    + timedelta(days=1 + config.polygon.MAX_DAYS_TO_LOAD)
+                ),
+            )
+            if not len(_df):
+                break
+
+            _df["vwap"] = 0.0
+            _df["average"] = 0.0
+            _minute_history = (
+                pd.concat([_minute_history, _df])
+                if _minute_history is not None
+                else _df
+            )
+            from_date = _df.index[-1] + timedelta(days=1)
+
+        return _minute_history
+
+    return _loader(api).load(symbols, _load)
 
 
 def get_symbol_data(
@@ -165,13 +164,13 @@ def get_symbol_data(
     df = None
     while retry > 0:
         try:
-            df = api.polygon.historic_agg_v2(
+            df = get_bars(
+                api,
                 symbol,
-                1,
                 "minute",
                 _from=str(start_date),
                 to=str(end_date),
-            ).df
+            )
 
             df["vwap"] = 0.0
             df["average"] = 0.0
@@ -184,40 +183,38 @@ def get_symbol_data(
     return df
 
 
-def daily_bars(api: tradeapi, symbol: str, days: int) -> df:
-    retry = 10
+def _daily_bars_loader(api: tradeapi, days: int) -> Callable[[str], df]:
+    def _load(symbol: str) -> df:
+        _df = get_bars(
+            api,
+            symbol,
+            "day",
+            _from=str(date.today() - timedelta(days=days)),
+            to=str(date.today()),
+        )
 
-    while retry:
-        try:
-            _df = api.polygon.historic_agg_v2(
-                symbol,
-                1,
-                "day",
-                _from=str(date.today() - timedelta(days=days)),
-                to=str(date.today()),
-            ).df
-
-            if _df.empty:
-                tlog(
-                    f"empty dataset received for {symbol} daily bars, resting and retrying."
-                )
-                time.sleep(30)
-                retry -= 1
-                continue
+        if _df.empty:
+            raise ValueError(f"empty dataset received for {symbol} daily bars")
+
+        return _df
+
+    return _load
+
+
+def daily_bars(api: tradeapi, symbol: str, days: int) -> df:
+    try:
+        return _loader(api).fetch(symbol, _daily_bars_loader(api, days))
+    except Exception as e:
+        raise Exception(f"Failed to load data for {symbol}") from e
 
-        except Exception as e:
-            if retry:
-                tlog(
-                    f"[EXCEPTION] {e} during loading {symbol} daily bars, resting and retrying."
-                )
-                time.sleep(30)
-                retry -= 1
-            else:
-                raise
-        else:
-            return _df
 
-    raise Exception(f"Failed to load data for {symbol}")
+def daily_bars_for_symbols(
+    api: tradeapi, symbols: List[str], days: int
+) -> Dict[str, df]:
+    """load daily bars of symbols concurrently, skipping failed symbols"""
+    return _loader(api).load(
+        symbols, _daily_bars_loader(api, days), "daily bars"
+    )
 
 
 def get_historical_daily_from_polygon_by_range(
@@ -225,38 +222,19 @@ def get_historical_daily_from_polygon_by_range(
 ) -> Dict[str, df]:
     """get ticker history"""
 
-    _minute_history: Dict[str, df] = {}
-    try:
-        for symbol in symbols:
-            retry = 5
-            _df = None
-            while retry > 0:
-                try:
-                    _df = api.polygon.historic_agg_v2(
-                        symbol,
-                        1,
-                        "day",
-                        _from=str(start_date),
-                        to=str(end_date),
-                    ).df
-
-                    _df["vwap"] = 0.0
-                    _df["average"] = 0.0
-
-                    _minute_history[symbol] = (
-                        pd.concat([_minute_history[symbol], _df])
-                        if symbol in _minute_history
-                        else _df
-                    )
-                    break
-                except Exception as e:
-                    retry -= 1
-                    continue
-
-    except KeyboardInterrupt:
-        tlog("KeyboardInterrupt")
+    def _load(symbol: str) -> df:
+        _df = get_bars(
+            api,
+            symbol,
+            "day",
+            _from=str(start_date),
+            to=str(end_date),
+        )
+        _df["vwap"] = 0.0
+        _df["average"] = 0.0
+        return _df
 
-    return _minute_history
+    return _loader(api).load(symbols, _load, "daily bars")
 
 
 def get_historical_data_from_polygon(
@@ -265,50 +243,32 @@ def get_historical_data_from_polygon(
     """get ticker history"""
 
     tlog(f"Loading max {max_tickers} tickers w/ highest volume from Polygon")
-    minute_history: Dict[str, df] = {}
-    c = 0
-    exclude_symbols = []
-    try:
-        for symbol in symbols:
-            if symbol not in minute_history:
-                retry_counter = 5
-                while retry_counter > 0:
-                    try:
-                        if c < max_tickers:
-                            _df = api.polygon.historic_agg_v2(
-                                symbol,
-                                1,
-                                "minute",
-                                _from=str(date.today() - timedelta(days=10)),
-                                to=str(date.today() + timedelta(days=1)),
-                            ).df
-                            _df["vwap"] = 0.0
-                            _df["average"] = 0.0
 
-                            minute_history[symbol] = _df
-                            tlog(
-                                f"loaded {len(minute_history[symbol].index)} agg data points for {symbol} {c+1}/{max_tickers}"
-                            )
-                            c += 1
-                            break
-
-                        exclude_symbols.append(symbol)
-                        break
-                    except (
-                        requests.exceptions.HTTPError,
-                        requests.exceptions.ConnectionError,
-                    ):
-                        retry_counter -= 1
-                        if retry_counter == 0:
-                            exclude_symbols.append(symbol)
-    except KeyboardInterrupt:
-        tlog("KeyboardInterrupt")
-
-    for x in exclude_symbols:
-        symbols.remove(x)
+    def _load(symbol: str) -> df:
+        _df = get_bars(
+            api,
+            symbol,
+            "minute",
+            _from=str(date.today() - timedelta(days=10)),
+            to=str(date.today() + timedelta(days=1)),
+        )
+        _df["vwap"] = 0.0
+        _df["average"] = 0.0
+        return _df
+
+    # symbols are ordered by priority, load the first `max_tickers` and
+    # replace those failing w/ the next ones in line
+    loader = _loader(api)
+    minute_history: Dict[str, df] = {}
+    candidates = list(dict.fromkeys(symbols))
+    while candidates and len(minute_history) < max_tickers:
+        batch = candidates[: max_tickers - len(minute_history)]
+        candidates = candidates[len(batch) :]
+        minute_history.update(loader.load(batch, _load))
 
+    symbols[:] = [symbol for symbol in symbols if symbol in minute_history]
     tlog(f"Total number of symbols for trading {len(symbols)}")
-    return minute_history
+    return {symbol: minute_history[symbol] for symbol in symbols}
 
 
 @timeit
@@ -468,13 +428,13 @@ async def index_history(index: str, days: int) -> df:
 def latest_stock_price(data_api: tradeapi, symbol: str) -> float:
     """Load latest stock price for symbol"""
 
-    vals = data_api.polygon.historic_agg_v2(
+    vals = get_bars(
+        data_api,
         symbol,
-        1,
         "minute",
         _from=str(date.today() - timedelta(days=5)),
         to=str(date.today()),
-    ).df.close.tolist()
+    ).close.tolist()
 
     if not len(vals):
         raise Exception(
@@ -482,3 +442,63 @@ def latest_stock_price(data_api: tradeapi, symbol: str) -> float:
         )
 
     return vals[-1]
+
+
+def latest_stock_prices(
+    data_api: tradeapi, symbols: List[str]
+) -> Dict[str, float]:
+    """Latest prices of symbols, w/ a single Polygon snapshot request.
+    Prices are re-used for config.price_ttl seconds, symbols missing from
+    the snapshot are priced by latest_stock_price()"""
+    now = time.monotonic()
+    prices = {
+        symbol: latest_prices[symbol][0]
+        for symbol in symbols
+        if symbol in latest_prices
+        and now - latest_prices[symbol][1] < config.price_ttl
+    }
+
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing:
+        prices.update(_snapshot_prices(missing))
+        for symbol in missing:
+            if symbol not in prices:
+                prices[symbol] = latest_stock_price(data_api, symbol)
+            latest_prices[symbol] = (prices[symbol], now)
+
+    return prices
+
+
+def _snapshot_prices(symbols: List[str]) -> Dict[str, float]:
+    """Last trade (or latest close) of symbols from the Polygon snapshot"""
+    try:
+        response = requests.get(
+            "https://api.polygon.io/"
+            + "v2/snapshot/locale/us/markets/stocks/tickers",
+            params={
+                "tickers": ",".join(symbols),
+                "apiKey": get_polygon_credentials(config.prod_api_key_id),
+            },
+            timeout=config.polygon_seconds_timeout,
+        )
+        if response.status_code != 200 or response.json()["status"] != "OK":
+            tlog(
+                f"_snapshot_prices() got {response.status_code} {response.text}"
+            )
+            return {}
+    except Exception as e:
+        tlog(f"_snapshot_prices() failed w/ exception {e}")
+        return {}
+
+    prices: Dict[str, float] = {}
+    for ticker in response.json().get("tickers") or []:
+        for price in (
+            (ticker.get("lastTrade") or {}).get("p"),
+            (ticker.get("day") or {}).get("c"),
+            (ticker.get("prevDay") or {}).get("c"),
+        ):
+            if price:
+                prices[ticker["ticker"]] = float(price)
+                break
+
+    return prices
@@ -0,0 +1,140 @@
+"""Non-blocking access to the broker's order API"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import alpaca_trade_api as tradeapi
+from requests.adapters import HTTPAdapter
+
+from liualgotrader.common.tlog import tlog
+
+# trade update events after which an order does not change anymore
+FINAL_EVENTS = ("fill", "canceled", "rejected", "expired", "done_for_day")
+
+
+class OrderGateway:
+    """Runs order requests of an `alpaca_trade_api.REST` client on a pool
+    of threads, so the event loop never waits for an HTTP round-trip.
+
+    The client's `requests.Session` is given a keep-alive connection pool
+    as large as the thread pool, so up to `max_workers` requests are in
+    flight at once, each over a warm connection. Requests return
+    `asyncio.Future` objects. A request identical to one still in flight
+    (the same order for the same symbol, a status query or cancellation
+    of the same order) returns the in-flight future instead of a new
+    request. Submitting a different order for a symbol w/ an order in
+    flight raises `ValueError`.
+
+    `on_trade_update()` should be fed the trade update stream, it
+    resolves the futures returned by `order_status()`, which are kept
+    until `forget()`.
+    """
+
+    def __init__(self, trading_api: tradeapi.REST, max_workers: int = 4):
+        self.trading_api = trading_api
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="order_gateway"
+        )
+        session = getattr(trading_api, "_session", None)
+        if session is not None:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        # the order in flight for each symbol
+        self._submissions: Dict[str, Dict] = {}
+        self._status: Dict[str, asyncio.Future] = {}
+
+    def _call(
+        self, key: Hashable, func: Callable, *args, **kwargs
+    ) -> asyncio.Future:
+        future = self._inflight.get(key)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+        self._inflight[key] = future
+        future.add_done_callback(functools.partial(self._done, key))
+        return future
+
+    def _done(self, key: Hashable, future: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        if key[0] == "submit":  # type: ignore
+            self._submissions.pop(key[1], None)  # type: ignore
+        if not future.cancelled() and future.exception():
+            tlog(f"order gateway {key} failed w/ {future.exception()}")
+
+    def pending(self, symbol: str) -> bool:
+        """Is an order submission for `symbol` in flight"""
+        return ("submit", symbol) in self._inflight
+
+    def submit_order(
+        self,
+        symbol: str,
+        qty: Any,
+        side: str,
+        type: str,
+        time_in_force: str = "day",
+        limit_price: Any = None,
+    ) -> asyncio.Future:
+        """Submit an order, at most one order per symbol is in flight"""
+        kwargs = dict(
+            symbol=symbol,
+            qty=str(qty),
+            side=side,
+            type=type,
+            time_in_force=time_in_force,
+        )
+        if limit_price is not None:
+            kwargs["limit_price"] = str(limit_price)
+
+        inflight = self._submissions.get(symbol)
+        if inflight is not None and inflight != kwargs:
+            raise ValueError(
+                f"order {kwargs} while order {inflight} for {symbol} is in flight"
+            )
+
+        future = self._call(
+            ("submit", symbol), self.trading_api.submit_order, **kwargs
+        )
+        self._submissions[symbol] = kwargs
+        return future
+
+    def get_order(self, order_id: str) -> asyncio.Future:
+        return self._call(
+            ("get", order_id), self.trading_api.get_order, order_id
+        )
+
+    def cancel_order(self, order_id: str) -> asyncio.Future:
+        return self._call(
+            ("cancel", order_id), self.trading_api.cancel_order, order_id
+        )
+
+    def order_status(self, order_id: str) -> asyncio.Future:
+        """Future resolved w/ the order's final trade update event"""
+        future = self._status.get(order_id)
+        if future is None:
+            future = self._status[order_id] = (
+                asyncio.get_running_loop().create_future()
+            )
+        return future
+
+    def forget(self, order_id: str) -> None:
+        self._status.pop(order_id, None)
+
+    def on_trade_update(self, data: Dict) -> None:
+        order: Optional[Dict] = data.get("order")
+        if not order or data.get("event") not in FINAL_EVENTS:
+            return
+
+        future = self._status.get(order["id"])
+        if future is not None and not future.done():
+            future.set_result(data["event"])
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,89 @@
+"""Consume inter-process queues without blocking the event loop"""
+import asyncio
+import concurrent.futures
+import threading
+from queue import Empty
+from typing import Any, List, Optional
+
+
+class AsyncQueueReader:
+    """Reads a `multiprocessing.Queue` (or `RingBuffer`) on a dedicated
+    thread, and feeds an `asyncio.Queue` on the running event loop.
+
+    The reader thread blocks when the asyncio queue is full, so a slow
+    consumer applies back-pressure on the inter-process queue.
+    """
+
+    def __init__(
+        self, queue: Any, maxsize: int = 256, poll_timeout: float = 0.5
+    ):
+        self.queue = queue
+        self.poll_timeout = poll_timeout
+        self.items: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._thread = threading.Thread(
+            target=self._run, name="queue_reader", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                item = self.queue.get(timeout=self.poll_timeout)
+            except Empty:
+                continue
+            except (EOFError, OSError, ValueError):
+                # queue closed under our feet
+                break
+
+            future = asyncio.run_coroutine_threadsafe(
+                self.items.put(item), self._loop  # type: ignore
+            )
+            while not self._stop.is_set():
+                try:
+                    future.result(timeout=self.poll_timeout)
+                    break
+                except concurrent.futures.TimeoutError:
+                    continue
+            else:
+                future.cancel()
+
+    async def get_batch(
+        self, max_items: int = 64, timeout: float = None
+    ) -> List[Any]:
+        """Wait for at least one item, and return all ready items up to
+        `max_items`. Raises `queue.Empty` on timeout."""
+        try:
+            batch = [await asyncio.wait_for(self.items.get(), timeout)]
+        except asyncio.TimeoutError:
+            raise Empty
+
+        while len(batch) < max_items:
+            try:
+                batch.append(self.items.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+
+        return batch
+
+    def drain(self) -> int:
+        """Discard items already read, return number of items dropped"""
+        dropped = 0
+        while True:
+            try:
+                self.items.get_nowait()
+                dropped += 1
+            except asyncio.QueueEmpty:
+                return dropped
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._thread.join
+            )
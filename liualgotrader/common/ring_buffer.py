@@ -0,0 +1,207 @@
+"""Single-producer / single-consumer ring buffer over shared memory"""
+import pickle
+import struct
+import time
+from enum import Enum
+from multiprocessing import shared_memory
+from queue import Empty, Full
+from typing import Any, Dict, Optional, Tuple
+
+
+class OverflowPolicy(Enum):
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+
+
+# header: write sequence, read sequence, dropped count, capacity, slot size
+_header = struct.Struct("<qqqqq")
+_WRITE_OFFSET = 0
+_READ_OFFSET = 8
+_DROPPED_OFFSET = 16
+
+# slot: sequence tag, payload length, payload type
+_slot_header = struct.Struct("<qII")
+_seq = struct.Struct("<q")
+
+_BYTES = 0
+_STR = 1
+_PICKLE = 2
+
+_MIN_WAIT = 0.0001
+_MAX_WAIT = 0.005
+
+
+class RingBuffer:
+    """Lock-free SPSC queue of variable length messages in fixed size slots.
+
+    The producer publishes a slot by stamping it with its sequence number
+    after writing the payload (seqlock), so the consumer never needs a lock.
+    With the `drop_oldest` policy the producer overwrites unread slots, the
+    consumer detects being lapped, skips ahead and counts the drops.
+
+    Exposes the `multiprocessing.Queue` calls used by the trader, and can be
+    passed to a spawned process, which attaches to the same shared memory.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        slot_size: int,
+        policy: OverflowPolicy = OverflowPolicy.BLOCK,
+        name: str = None,
+    ):
+        if capacity <= 0 or slot_size <= 0:
+            raise ValueError("capacity and slot_size must be positive")
+
+        self.capacity = capacity
+        self.slot_size = slot_size
+        self.policy = OverflowPolicy(policy)
+        self._stride = _slot_header.size + slot_size
+        self._owner = name is None
+        self._shm = shared_memory.SharedMemory(
+            name=name,
+            create=self._owner,
+            size=_header.size + capacity * self._stride,
+        )
+        if self._owner:
+            _header.pack_into(self._shm.buf, 0, 0, 0, 0, capacity, slot_size)
+            for i in range(capacity):
+                _seq.pack_into(self._shm.buf, self._slot_offset(i), -1)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def __getstate__(self) -> Tuple:
+        return self.name, self.capacity, self.slot_size, self.policy.value
+
+    def __setstate__(self, state: Tuple) -> None:
+        name, capacity, slot_size, policy = state
+        self.__init__(capacity, slot_size, OverflowPolicy(policy), name)  # type: ignore
+
+    def _slot_offset(self, seq: int) -> int:
+        return _header.size + (seq % self.capacity) * self._stride
+
+    def _load(self, offset: int) -> int:
+        return _seq.unpack_from(self._shm.buf, offset)[0]
+
+    def _store(self, offset: int, value: int) -> None:
+        _seq.pack_into(self._shm.buf, offset, value)
+
+    @property
+    def dropped(self) -> int:
+        return self._load(_DROPPED_OFFSET)
+
+    def qsize(self) -> int:
+        return min(
+            self._load(_WRITE_OFFSET) - self._load(_READ_OFFSET),
+            self.capacity,
+        )
+
+    def empty(self) -> bool:
+        return self._load(_WRITE_OFFSET) == self._load(_READ_OFFSET)
+
+    def full(self) -> bool:
+        return self.qsize() >= self.capacity
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "occupancy": self.qsize(),
+            "capacity": self.capacity,
+            "dropped": self.dropped,
+        }
+
+    def put(
+        self, obj: Any, block: bool = True, timeout: Optional[float] = None
+    ) -> None:
+        if isinstance(obj, bytes):
+            payload, payload_type = obj, _BYTES
+        elif isinstance(obj, str):
+            payload, payload_type = obj.encode("utf-8"), _STR
+        else:
+            payload, payload_type = pickle.dumps(obj), _PICKLE
+
+        if len(payload) > self.slot_size:
+            raise ValueError(
+                f"message of {len(payload)} bytes exceeds slot size {self.slot_size}"
+            )
+
+        write_seq = self._load(_WRITE_OFFSET)
+        if self.policy == OverflowPolicy.BLOCK:
+            deadline = None if timeout is None else time.time() + timeout
+            wait = _MIN_WAIT
+            while write_seq - self._load(_READ_OFFSET) >= self.capacity:
+                if not block or (deadline and time.time() >= deadline):
+                    raise Full
+                time.sleep(wait)
+                wait = min(wait * 2, _MAX_WAIT)
+
+        offset = self._slot_offset(write_seq)
+        _slot_header.pack_into(
+            self._shm.buf, offset, -1, len(payload), payload_type
+        )
+        data_offset = offset + _slot_header.size
+        self._shm.buf[data_offset : data_offset + len(payload)] = payload
+        self._store(offset, write_seq)
+        self._store(_WRITE_OFFSET, write_seq + 1)
+
+    def put_nowait(self, obj: Any) -> None:
+        self.put(obj, block=False)
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Any:
+        deadline = None if timeout is None else time.time() + timeout
+        wait = _MIN_WAIT
+        while True:
+            read_seq = self._load(_READ_OFFSET)
+            write_seq = self._load(_WRITE_OFFSET)
+
+            if write_seq == read_seq:
+                if not block or (deadline and time.time() >= deadline):
+                    raise Empty
+                time.sleep(wait)
+                wait = min(wait * 2, _MAX_WAIT)
+                continue
+
+            if write_seq - read_seq > self.capacity:
+                self._skip(read_seq, write_seq - self.capacity)
+                continue
+
+            offset = self._slot_offset(read_seq)
+            tag, length, payload_type = _slot_header.unpack_from(
+                self._shm.buf, offset
+            )
+            if tag != read_seq:
+                # slot overwritten, or being overwritten, by the producer
+                self._skip(
+                    read_seq,
+                    max(
+                        read_seq + 1, self._load(_WRITE_OFFSET) - self.capacity
+                    ),
+                )
+                continue
+
+            data_offset = offset + _slot_header.size
+            payload = bytes(self._shm.buf[data_offset : data_offset + length])
+            if self._load(offset) != read_seq:
+                continue
+
+            self._store(_READ_OFFSET, read_seq + 1)
+            if payload_type == _STR:
+                return payload.decode("utf-8")
+            elif payload_type == _PICKLE:
+                return pickle.loads(payload)  # nosec
+            return payload
+
+    def get_nowait(self) -> Any:
+        return self.get(block=False)
+
+    def _skip(self, read_seq: int, new_read_seq: int) -> None:
+        self._store(_DROPPED_OFFSET, self.dropped + new_read_seq - read_seq)
+        self._store(_READ_OFFSET, new_read_seq)
+
+    def close(self) -> None:
+        self._shm.close()
+
+    def unlink(self) -> None:
+        if self._owner:
+            self._shm.unlink()
@@ -0,0 +1,160 @@
+"""Assign symbols to consumer processes, based on observed load"""
+import bisect
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+
+def _hash(key: str) -> int:
+    return zlib.crc32(key.encode("utf-8"))
+
+
+class SymbolSharder:
+    """Maps symbols to consumer shards.
+
+    The load of a shard is the sum of the message rates of its symbols,
+    tracked as an exponentially weighted moving average. With the `load`
+    policy a new symbol goes to the least loaded shard, ties are broken by
+    a consistent-hash ring so placement is stable across runs. With the
+    `hash` policy the ring alone decides, and symbols are never moved.
+
+    Until rates are observed, placement uses the weights given on
+    `assign()` (e.g. recent volume) as a relative prior.
+    """
+
+    def __init__(
+        self,
+        num_shards: int,
+        policy: str = "load",
+        virtual_nodes: int = 64,
+        half_life: float = 60.0,
+    ):
+        if num_shards <= 0:
+            raise ValueError("num_shards must be positive")
+        if policy not in ("load", "hash"):
+            raise NotImplementedError(f"sharding policy {policy}")
+
+        self.num_shards = num_shards
+        self.policy = policy
+        self.half_life = half_life
+        self.assignments: Dict[str, int] = {}
+        self.rates: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self._observed = False
+        self._last_update = time.monotonic()
+
+        ring = sorted(
+            (_hash(f"{shard}:{node}"), shard)
+            for shard in range(num_shards)
+            for node in range(virtual_nodes)
+        )
+        self._ring_keys = [key for key, _ in ring]
+        self._ring_shards = [shard for _, shard in ring]
+
+    def ring_order(self, symbol: str) -> List[int]:
+        """Return all shards, in ring order starting at the symbol's hash"""
+        start = bisect.bisect(self._ring_keys, _hash(symbol))
+        order: List[int] = []
+        for i in range(len(self._ring_shards)):
+            shard = self._ring_shards[(start + i) % len(self._ring_shards)]
+            if shard not in order:
+                order.append(shard)
+                if len(order) == self.num_shards:
+                    break
+
+        return order
+
+    def loads(self) -> List[float]:
+        loads = [0.0] * self.num_shards
+        for symbol, shard in self.assignments.items():
+            loads[shard] += self.rates.get(symbol, 0.0)
+
+        return loads
+
+    def assign(self, symbol: str, weight: Optional[float] = None) -> int:
+        """Return the shard of a symbol, placing it if it's new"""
+        if symbol in self.assignments:
+            return self.assignments[symbol]
+
+        if weight is not None:
+            self.rates[symbol] = float(weight)
+        elif symbol not in self.rates:
+            self.rates[symbol] = (
+                sum(self.rates.values()) / len(self.rates)
+                if self.rates
+                else 0.0
+            )
+
+        order = self.ring_order(symbol)
+        if self.policy == "hash":
+            shard = order[0]
+        else:
+            loads = self.loads()
+            shard = min(order, key=lambda s: loads[s])
+
+        self.assignments[symbol] = shard
+        return shard
+
+    def record(self, symbol: str, count: int = 1) -> None:
+        """Count messages routed for a symbol"""
+        self.counts[symbol] = self.counts.get(symbol, 0) + count
+
+    def update(self, now: float = None) -> None:
+        """Fold messages counted since the last update into the rates"""
+        now = time.monotonic() if now is None else now
+        elapsed = now - self._last_update
+        if elapsed <= 0:
+            return
+
+        decay = 0.5 ** (elapsed / self.half_life)
+        for symbol in self.assignments:
+            rate = self.counts.pop(symbol, 0) / elapsed
+            self.rates[symbol] = (
+                decay * self.rates.get(symbol, rate) + (1.0 - decay) * rate
+                if self._observed
+                else rate
+            )
+
+        self.counts.clear()
+        self._observed = True
+        self._last_update = now
+
+    def rebalance(
+        self, tolerance: float = 0.25, max_moves: int = 4
+    ) -> List[Tuple[str, int, int]]:
+        """Move symbols from the hottest to the coldest shards, until no
+        shard is loaded more than `tolerance` above the mean.
+
+        Returns list of (symbol, from shard, to shard).
+        """
+        if self.policy != "load" or self.num_shards < 2:
+            return []
+
+        loads = self.loads()
+        mean = sum(loads) / self.num_shards
+        moves: List[Tuple[str, int, int]] = []
+        while mean > 0 and len(moves) < max_moves:
+            hot = max(range(self.num_shards), key=lambda s: loads[s])
+            cold = min(range(self.num_shards), key=lambda s: loads[s])
+            if loads[hot] <= mean * (1.0 + tolerance):
+                break
+
+            # moving a symbol w/ rate in (0, gap) narrows the gap, best at gap/2
+            gap = loads[hot] - loads[cold]
+            candidates = [
+                symbol
+                for symbol, shard in self.assignments.items()
+                if shard == hot and 0 < self.rates.get(symbol, 0.0) < gap
+            ]
+            if not candidates:
+                break
+
+            symbol = min(
+                candidates, key=lambda s: abs(self.rates[s] - gap / 2)
+            )
+            self.assignments[symbol] = cold
+            loads[hot] -= self.rates[symbol]
+            loads[cold] += self.rates[symbol]
+            moves.append((symbol, hot, cold))
+
+        return moves
@@ -0,0 +1,119 @@
+"""Minute history published once in shared memory, for all consumers"""
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame as df
+
+from liualgotrader.common.bar_store import BarStore
+
+# symbol -> columns, offset of the epoch (ns) index, number of bars
+Directory = Dict[str, Tuple[List[str], int, int]]
+
+
+class SharedHistory:
+    """Bars of many symbols in a single shared memory segment.
+
+    The trader publishes the startup history once, and passes the
+    `SharedHistory` to consumer processes, which pickles to the segment's
+    name & directory only. `attach()` returns `BarStore` objects wrapping
+    read-only views of the segment, so consumers share the pages instead
+    of each holding a copy, and a store is copied to private memory only
+    once its bars are written to.
+
+    Each symbol's epoch (ns) index is followed by its row-major values.
+    """
+
+    def __init__(
+        self,
+        directory: Directory,
+        size: int,
+        tz: str = "America/New_York",
+        name: str = None,
+    ):
+        self.directory = directory
+        self.tz = tz
+        self._owner = name is None
+        self._shm = shared_memory.SharedMemory(
+            name=name, create=self._owner, size=max(size, 1)
+        )
+
+    @classmethod
+    def publish(
+        cls, minute_history: Dict[str, df], tz: str = "America/New_York"
+    ) -> "SharedHistory":
+        directory: Directory = {}
+        offset = 0
+        for symbol, bars in minute_history.items():
+            directory[symbol] = (list(bars.columns), offset, len(bars))
+            offset += len(bars) * 8 * (1 + len(bars.columns))
+
+        shared = cls(directory, offset, tz)
+        for symbol, bars in minute_history.items():
+            index, data = shared._arrays(symbol)
+            dt_index = pd.DatetimeIndex(bars.index)
+            if dt_index.tz is None:
+                dt_index = dt_index.tz_localize(tz)
+            index[:] = dt_index.asi8
+            data[:] = bars.to_numpy(dtype="float64")
+
+        return shared
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def size(self) -> int:
+        return self._shm.size
+
+    def __getstate__(self) -> Tuple:
+        return self.directory, self._shm.size, self.tz, self.name
+
+    def __setstate__(self, state: Tuple) -> None:
+        self.__init__(*state)  # type: ignore
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.directory
+
+    def __len__(self) -> int:
+        return len(self.directory)
+
+    def _arrays(self, symbol: str) -> Tuple[np.ndarray, np.ndarray]:
+        columns, offset, length = self.directory[symbol]
+        index = np.ndarray(
+            (length,), dtype="int64", buffer=self._shm.buf, offset=offset
+        )
+        data = np.ndarray(
+            (length, len(columns)),
+            dtype="float64",
+            buffer=self._shm.buf,
+            offset=offset + 8 * length,
+        )
+        return index, data
+
+    def attach(
+        self, symbols: Optional[Iterable[str]] = None
+    ) -> Dict[str, BarStore]:
+        """Zero-copy stores of `symbols` (all symbols by default)"""
+        bars: Dict[str, BarStore] = {}
+        for symbol in self.directory if symbols is None else symbols:
+            if symbol not in self.directory:
+                continue
+
+            index, data = self._arrays(symbol)
+            index.flags.writeable = False
+            data.flags.writeable = False
+            bars[symbol] = BarStore.from_arrays(
+                self.directory[symbol][0], index, data, self.tz
+            )
+
+        return bars
+
+    def close(self) -> None:
+        self._shm.close()
+
+    def unlink(self) -> None:
+        if self._owner:
+            self._shm.unlink()
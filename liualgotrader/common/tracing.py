@@ -0,0 +1,200 @@
+"""Latency tracing of market events, from Polygon to order submission.
+
+Events are stamped at every hop, and the latency of each stage is kept
+in a histogram per stage & strategy, exported periodically per process:
+
+* feed: Polygon event time -> received by the producer,
+* batch: received by the producer -> pushed to the consumer queue,
+* queue: pushed by the producer -> read by the consumer,
+* dispatch: Polygon event time -> handed to strategies,
+* strategy: `Strategy.run()` duration,
+* submit: order submission -> accepted by the broker,
+* tick_to_order: Polygon event time -> order accepted by the broker.
+"""
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from liualgotrader.common import config
+from liualgotrader.common.tlog import tlog
+
+
+class LatencyHistogram:
+    """HDR style histogram of latencies in micro-seconds.
+
+    Buckets are linear up to 2^`precision_bits`, and logarithmic above it
+    with 2^(`precision_bits` - 1) sub-buckets per power of two, so values
+    are kept within 1 / 2^(`precision_bits` - 1) relative error, in O(1)
+    per sample and little memory regardless of the range.
+    """
+
+    def __init__(self, precision_bits: int = 7):
+        self.precision_bits = precision_bits
+        self._linear = 1 << precision_bits
+        self._half = self._linear >> 1
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+
+    def _bucket(self, value: int) -> int:
+        if value < self._linear:
+            return value
+        shift = value.bit_length() - self.precision_bits
+        return shift * self._half + (value >> shift)
+
+    def _highest_value(self, bucket: int) -> int:
+        if bucket < self._linear:
+            return bucket
+        shift = bucket // self._half - 1
+        mantissa = bucket - shift * self._half
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value: int) -> None:
+        value = max(int(value), 0)
+        bucket = self._bucket(value)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        if other.precision_bits != self.precision_bits:
+            raise ValueError("can't merge histograms of different precision")
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, percent: float) -> int:
+        if not self.count:
+            return 0
+
+        rank = max(percent / 100.0 * self.count, 1)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self._highest_value(bucket), self.max)  # type: ignore
+
+        return self.max  # type: ignore
+
+    def summary(self) -> Dict:
+        """Statistics in milli-seconds"""
+        return {
+            "count": self.count,
+            "min_ms": (self.min or 0) / 1000.0,
+            "mean_ms": self.total / self.count / 1000.0 if self.count else 0,
+            "p50_ms": self.percentile(50) / 1000.0,
+            "p90_ms": self.percentile(90) / 1000.0,
+            "p99_ms": self.percentile(99) / 1000.0,
+            "p999_ms": self.percentile(99.9) / 1000.0,
+            "max_ms": (self.max or 0) / 1000.0,
+        }
+
+
+class Tracer:
+    """Per process latency histograms, exported every `interval` seconds
+    as JSON lines appended to a file, or POSTed to an http(s) endpoint.
+    Histograms are reset after each export."""
+
+    def __init__(self, process: str, export_to: str, interval: float = 60.0):
+        self.process = process
+        self.export_to = export_to
+        self.interval = interval
+        self.histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+
+    def record(self, stage: str, latency_ns: int, strategy: str = "") -> None:
+        key = (stage, strategy)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram()
+        histogram.record(latency_ns // 1000)
+
+    def snapshot(self) -> List[Dict]:
+        now = datetime.now().isoformat()
+        return [
+            dict(
+                time=now,
+                process=self.process,
+                stage=stage,
+                strategy=strategy,
+                **histogram.summary(),
+            )
+            for (stage, strategy), histogram in self.histograms.items()
+        ]
+
+    def reset(self) -> List[Dict]:
+        """Return the current statistics, and start new histograms"""
+        rows = self.snapshot()
+        self.histograms = {}
+        return rows
+
+    def write(self, rows: List[Dict]) -> None:
+        if not rows:
+            return
+
+        if self.export_to.startswith(("http://", "https://")):
+            requests.post(self.export_to, json=rows, timeout=5)
+        else:
+            with open(self.export_to, "a") as f:
+                f.write("".join(json.dumps(row) + "\n" for row in rows))
+
+    def export(self) -> None:
+        self.write(self.reset())
+
+    async def run(self) -> None:
+        tlog(
+            f"tracer {self.process} exporting to {self.export_to} every {self.interval} seconds"
+        )
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                try:
+                    # write off the event loop, e.g. a slow endpoint
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, self.write, self.reset()
+                    )
+                except Exception as e:
+                    tlog(f"[ERROR] failed to export latencies w/ {e}")
+        except asyncio.CancelledError:
+            self.export()
+            tlog(f"tracer {self.process} stopped")
+
+
+tracer: Optional[Tracer] = None
+
+
+def start_tracing(process: str) -> Optional[Tracer]:
+    """Create the process tracer, if tracing is configured"""
+    global tracer
+    if config.trace_export:
+        tracer = Tracer(process, config.trace_export, config.trace_interval)
+    return tracer
+
+
+def record(stage: str, latency_ns: int, strategy: str = "") -> None:
+    if tracer:
+        tracer.record(stage, latency_ns, strategy)
+
+
+def event_time_ns(event: Dict) -> Optional[int]:
+    """Polygon event time (ns), for bars the end of the bar"""
+    ms = event.get("end") or event.get("start") or event.get("timestamp")
+    # trade updates carry ISO formatted timestamps, not traced
+    return int(ms) * 1_000_000 if isinstance(ms, (int, float)) else None
+
+
+def record_event_age(stage: str, event: Dict, strategy: str = "") -> None:
+    if tracer and (event_ns := event_time_ns(event)):
+        tracer.record(stage, time.time_ns() - event_ns, strategy)
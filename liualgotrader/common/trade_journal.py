@@ -0,0 +1,197 @@
+"""Write-behind journal of trades, saved to `new_trades` in batches"""
+import asyncio
+import json
+import os
+from typing import IO, List, Optional, Tuple
+
+from asyncpg.pool import Pool
+
+from liualgotrader.common import config
+from liualgotrader.common.tlog import tlog
+
+COLUMNS = [
+    "algo_run_id",
+    "symbol",
+    "operation",
+    "qty",
+    "price",
+    "indicators",
+    "client_time",
+    "stop_price",
+    "target_price",
+]
+
+
+class TradeJournal:
+    """Queues `new_trades` rows in memory, and writes them w/ a single
+    COPY every `flush_interval` seconds, or once `max_batch` rows are
+    queued, so trades don't wait for a database round-trip each.
+
+    With a `wal_path`, rows are also appended to a local file as they are
+    queued (and fsync-ed before each database write), and acknowledged in
+    it once written to the database. Rows not acknowledged, e.g. after a
+    crash or while the database is unreachable, are queued again when the
+    journal is re-opened. Rows are written at least once: a crash between
+    the database write and the acknowledgement writes them again.
+    """
+
+    def __init__(
+        self,
+        pool: Pool,
+        flush_interval: float = None,
+        max_batch: int = None,
+        wal_path: str = None,
+    ):
+        self.pool = pool
+        self.flush_interval = (
+            flush_interval
+            if flush_interval is not None
+            else config.journal_flush_interval
+        )
+        self.max_batch = max_batch or config.journal_max_batch
+        self.pending: List[Tuple[int, Tuple]] = []
+        self.saved = 0
+        self._seq = 0
+        self._lock = asyncio.Lock()
+        self._flushing: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wal: Optional[IO] = None
+        if wal_path:
+            self._open_wal(wal_path)
+
+    def _open_wal(self, path: str) -> None:
+        acked, rows = 0, []
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # partial line, written while crashing
+                        continue
+                    if "ack" in entry:
+                        acked = max(acked, entry["ack"])
+                    else:
+                        rows.append((entry["seq"], tuple(entry["row"])))
+
+        # rewrite w/ the unacknowledged rows only, then append to it
+        for seq, row in rows:
+            if seq > acked:
+                self._seq += 1
+                self.pending.append((self._seq, row))
+        with open(f"{path}.tmp", "w") as f:
+            f.write("".join(self._wal_entry(s, r) for s, r in self.pending))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{path}.tmp", path)
+        self._wal = open(path, "a")
+        if self.pending:
+            tlog(f"journal {path} recovered {len(self.pending)} trades")
+
+    @staticmethod
+    def _wal_entry(seq: int, row: Tuple) -> str:
+        return json.dumps({"seq": seq, "row": list(row)}, default=float) + "\n"
+
+    def add(self, row: Tuple) -> None:
+        """Queue a row, w/ values ordered as `COLUMNS`"""
+        self._seq += 1
+        self.pending.append((self._seq, row))
+        if self._wal:
+            self._wal.write(self._wal_entry(self._seq, row))
+            self._wal.flush()
+
+        if len(self.pending) >= self.max_batch:
+            self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flushing is None or self._flushing.done():
+            self._flushing = asyncio.get_event_loop().create_task(self.flush())
+
+    def _ack(self, seq: int) -> None:
+        if not self._wal:
+            return
+        if self.pending:
+            self._wal.write(json.dumps({"ack": seq}) + "\n")
+            self._wal.flush()
+        else:
+            # everything is acknowledged, start over
+            self._wal.seek(0)
+            self._wal.truncate()
+
+    async def flush(self) -> int:
+        """Write queued rows, return the number of rows written"""
+        async with self._lock:
+            batch, self.pending = self.pending, []
+            if not batch:
+                return 0
+
+            if self._wal:
+                os.fsync(self._wal.fileno())
+            try:
+                async with self.pool.acquire() as con:
+                    await con.copy_records_to_table(
+                        "new_trades",
+                        records=[row for _, row in batch],
+                        columns=COLUMNS,
+                    )
+            except Exception as e:
+                self.pending = batch + self.pending
+                tlog(
+                    f"[ERROR] journal failed to save {len(batch)} trades w/ {type(e).__name__}:{e}, will re-try"
+                )
+                return 0
+
+            self.saved += len(batch)
+            self._ack(batch[-1][0])
+            return len(batch)
+
+    async def run(self) -> None:
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+        except asyncio.CancelledError:
+            pass
+
+    def start(self) -> "TradeJournal":
+        self._task = asyncio.get_event_loop().create_task(self.run())
+        return self
+
+    async def close(self) -> None:
+        """Stop the timer, and write whatever is queued"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        await self.flush()
+        if self.pending:
+            tlog(
+                f"[ERROR] journal closed w/ {len(self.pending)} unsaved trades"
+            )
+        if self._wal:
+            self._wal.close()
+        tlog(f"journal closed after saving {self.saved} trades")
+
+
+journal: Optional[TradeJournal] = None
+
+
+async def start_journal(pool: Pool, process: str) -> TradeJournal:
+    """Journal trades of the process, w/ a local file per process if
+    `LIU_JOURNAL_WAL` is set. Trades recovered from the file are saved
+    before returning, so the database is up-to-date"""
+    global journal
+    journal = TradeJournal(
+        pool,
+        wal_path=f"{config.journal_wal}.{process}"
+        if config.journal_wal
+        else None,
+    )
+    await journal.flush()
+    return journal.start()
+
+
+async def stop_journal() -> None:
+    global journal
+    if journal:
+        await journal.close()
+        journal = None
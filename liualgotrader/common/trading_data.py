@@ -36,3 +36,26 @@ queues: Dict[str, Queue] = {}
 down_cross: Dict[str, datetime] = {}
 
 buy_time: Dict[str, datetime] = {}
+
+# per-symbol state, moved w/ the symbol when it's re-assigned to another consumer
+symbol_state: Tuple[str, ...] = (
+    "open_orders",
+    "open_order_strategy",
+    "last_used_strategy",
+    "latest_cost_basis",
+    "latest_scalp_basis",
+    "sell_indicators",
+    "buy_indicators",
+    "positions",
+    "target_prices",
+    "stop_prices",
+    "partial_fills",
+    "symbol_resistance",
+    "voi",
+    "voi_ask",
+    "voi_bid",
+    "snapshot",
+    "cool_down",
+    "down_cross",
+    "buy_time",
+)
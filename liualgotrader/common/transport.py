@@ -0,0 +1,424 @@
+"""Serialize & micro-batch market events between producer and consumers"""
+import asyncio
+import json
+import struct
+import time
+from multiprocessing import Queue
+from queue import Full
+from typing import Dict, List, Optional, Tuple, Union
+
+from liualgotrader.common import config, tracing
+from liualgotrader.common.tlog import tlog
+
+MAGIC = b"LB"
+VERSION = 1
+
+# batch header: magic, version, number of strings, number of records, enqueue time (ns)
+_header = struct.Struct("<2sBHIq")
+_str_len = struct.Struct("<B")
+_rec_type = struct.Struct("<B")
+_json_len = struct.Struct("<I")
+
+# fixed record layouts, symbol & strategy names are indices into the batch string table
+_trade = struct.Struct("<HBdIqB4B")
+_quote = struct.Struct("<HBdIBdIiq")
+_agg = struct.Struct("<HHddddQQddqq")
+
+REC_JSON = 0
+REC_TRADE = 1
+REC_QUOTE = 2
+REC_SECOND_AGG = 3
+REC_MINUTE_AGG = 4
+
+NO_STRING = 0xFFFF
+MAX_CONDITIONS = 4
+
+_agg_event_type = {"A": REC_SECOND_AGG, "AM": REC_MINUTE_AGG}
+_agg_type_event = {REC_SECOND_AGG: "A", REC_MINUTE_AGG: "AM"}
+
+# events which may be dropped when a consumer falls behind, anything else
+# (e.g. trade updates) must be delivered
+MARKET_DATA_EVENTS = {"T", "Q", "A", "AM"}
+
+
+def is_market_data(event: Dict) -> bool:
+    return event.get("EV") in MARKET_DATA_EVENTS
+
+
+class _StringTable:
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.strings: List[bytes] = []
+
+    def add(self, s: Optional[str]) -> int:
+        if s is None:
+            return NO_STRING
+        if s not in self.index:
+            encoded = s.encode("utf-8")
+            if len(encoded) > 255 or len(self.strings) >= NO_STRING:
+                raise ValueError(f"can't intern {s}")
+            self.index[s] = len(self.strings)
+            self.strings.append(encoded)
+
+        return self.index[s]
+
+
+def _encode_record(event: Dict, strings: _StringTable) -> bytes:
+    ev = event["EV"]
+    if ev == "T":
+        conditions = event.get("conditions") or []
+        if len(conditions) > MAX_CONDITIONS:
+            raise ValueError("too many conditions")
+        padded = list(conditions) + [0] * (MAX_CONDITIONS - len(conditions))
+        return _rec_type.pack(REC_TRADE) + _trade.pack(
+            strings.add(event["symbol"]),
+            event.get("exchange") or 0,
+            event["price"],
+            event["size"],
+            event["timestamp"],
+            len(conditions),
+            *padded,
+        )
+    elif ev == "Q":
+        return _rec_type.pack(REC_QUOTE) + _quote.pack(
+            strings.add(event["symbol"]),
+            event.get("askexchange") or 0,
+            event["askprice"],
+            event["asksize"],
+            event.get("bidexchange") or 0,
+            event["bidprice"],
+            event["bidsize"],
+            event.get("condition") or 0,
+            event["timestamp"],
+        )
+    elif ev in _agg_event_type:
+        return _rec_type.pack(_agg_event_type[ev]) + _agg.pack(
+            strings.add(event["symbol"]),
+            strings.add(event.get("symbol_strategy")),
+            event["open"],
+            event["high"],
+            event["low"],
+            event["close"],
+            int(event["volume"]),
+            int(event.get("totalvolume") or 0),
+            event.get("vwap") or 0.0,
+            event.get("average") or 0.0,
+            event["start"],
+            event.get("end") or 0,
+        )
+
+    raise ValueError(f"no binary layout for event {ev}")
+
+
+def encode_batch(events: List[Dict]) -> bytes:
+    """Encode list of events into a single binary payload.
+
+    Trade, quote and aggregate events are packed into fixed-layout records
+    holding only the fields used by the consumers, anything else
+    (e.g. trade updates) is carried as an embedded JSON record.
+    """
+    strings = _StringTable()
+    records: List[bytes] = []
+    for event in events:
+        try:
+            records.append(_encode_record(event, strings))
+        except (KeyError, TypeError, ValueError, struct.error):
+            raw = json.dumps(event).encode("utf-8")
+            records.append(
+                _rec_type.pack(REC_JSON) + _json_len.pack(len(raw)) + raw
+            )
+
+    string_table = b"".join(_str_len.pack(len(s)) + s for s in strings.strings)
+    return (
+        _header.pack(
+            MAGIC,
+            VERSION,
+            len(strings.strings),
+            len(records),
+            time.time_ns(),
+        )
+        + string_table
+        + b"".join(records)
+    )
+
+
+def decode_batch(payload: bytes) -> Tuple[List[Dict], int]:
+    """Decode binary payload, return list of events and enqueue time (ns)"""
+    magic, version, num_strings, num_records, enqueue_ns = _header.unpack_from(
+        payload, 0
+    )
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"unsupported payload {magic}:{version}")
+
+    offset = _header.size
+    strings: List[Optional[str]] = []
+    for _ in range(num_strings):
+        (length,) = _str_len.unpack_from(payload, offset)
+        offset += _str_len.size
+        strings.append(payload[offset : offset + length].decode("utf-8"))
+        offset += length
+
+    events: List[Dict] = []
+    for _ in range(num_records):
+        (rec_type,) = _rec_type.unpack_from(payload, offset)
+        offset += _rec_type.size
+        if rec_type == REC_TRADE:
+            (
+                symbol,
+                exchange,
+                price,
+                size,
+                timestamp,
+                num_conditions,
+                *conditions,
+            ) = _trade.unpack_from(payload, offset)
+            offset += _trade.size
+            events.append(
+                {
+                    "EV": "T",
+                    "symbol": strings[symbol],
+                    "exchange": exchange,
+                    "price": price,
+                    "size": size,
+                    "timestamp": timestamp,
+                    "conditions": conditions[:num_conditions],
+                }
+            )
+        elif rec_type == REC_QUOTE:
+            (
+                symbol,
+                askexchange,
+                askprice,
+                asksize,
+                bidexchange,
+                bidprice,
+                bidsize,
+                condition,
+                timestamp,
+            ) = _quote.unpack_from(payload, offset)
+            offset += _quote.size
+            events.append(
+                {
+                    "EV": "Q",
+                    "symbol": strings[symbol],
+                    "askexchange": askexchange,
+                    "askprice": askprice,
+                    "asksize": asksize,
+                    "bidexchange": bidexchange,
+                    "bidprice": bidprice,
+                    "bidsize": bidsize,
+                    "condition": condition,
+                    "timestamp": timestamp,
+                }
+            )
+        elif rec_type in _agg_type_event:
+            (
+                symbol,
+                strategy,
+                _open,
+                high,
+                low,
+                close,
+                volume,
+                totalvolume,
+                vwap,
+                average,
+                start,
+                end,
+            ) = _agg.unpack_from(payload, offset)
+            offset += _agg.size
+            event = {
+                "EV": _agg_type_event[rec_type],
+                "symbol": strings[symbol],
+                "open": _open,
+                "high": high,
+                "low": low,
+                "close": close,
+                "volume": volume,
+                "totalvolume": totalvolume,
+                "vwap": vwap,
+                "average": average,
+                "start": start,
+                "end": end,
+            }
+            if strategy != NO_STRING:
+                event["symbol_strategy"] = strings[strategy]
+            events.append(event)
+        elif rec_type == REC_JSON:
+            (length,) = _json_len.unpack_from(payload, offset)
+            offset += _json_len.size
+            events.append(json.loads(payload[offset : offset + length]))
+            offset += length
+        else:
+            raise ValueError(f"unknown record type {rec_type}")
+
+    return events, enqueue_ns
+
+
+def enqueue_time(payload: Union[bytes, str]) -> Optional[int]:
+    """Enqueue time (ns) of a binary payload, None for JSON messages"""
+    if isinstance(payload, bytes) and payload[:2] == MAGIC:
+        return _header.unpack_from(payload, 0)[4]
+    return None
+
+
+def decode(payload: Union[bytes, str]) -> List[Dict]:
+    """Decode a queue payload, regardless of the transport that produced it"""
+    if isinstance(payload, bytes) and payload[:2] == MAGIC:
+        return decode_batch(payload)[0]
+
+    data = json.loads(payload)
+    return data if isinstance(data, list) else [data]
+
+
+class Transport:
+    """Pushes events to consumer queues, one JSON message per event"""
+
+    name = "json"
+
+    def __init__(self, queues: List[Queue]):
+        self.queues = queues
+
+    def send(self, queue_id: int, event: Dict, urgent: bool = False) -> None:
+        tracing.record_event_age("feed", event)
+        if urgent or not is_market_data(event):
+            # never dropped, wait for the consumer to catch up
+            self.queues[queue_id].put(json.dumps(event))
+            return
+
+        try:
+            self.queues[queue_id].put(json.dumps(event), timeout=1)
+        except Full:
+            tlog(f"[ERROR] queue {queue_id} is FULL, dropping {event['EV']}")
+
+    def flush(self) -> None:
+        pass
+
+    async def run(self) -> None:
+        pass
+
+    def close(self) -> None:
+        for q in self.queues:
+            q.close()
+
+
+class BinaryTransport(Transport):
+    """Micro-batches events per consumer queue, and pushes a single
+    binary payload per queue every flush interval"""
+
+    name = "binary"
+
+    def __init__(
+        self,
+        queues: List[Queue],
+        flush_interval: float = None,
+        max_batch: int = None,
+        max_pending: int = 10000,
+    ):
+        self.flush_interval = (
+            flush_interval
+            if flush_interval is not None
+            else config.transport_flush_interval
+        )
+        self.max_batch = max_batch or config.transport_max_batch
+        self.max_pending = max_pending
+        self.pending: List[List[Dict]] = [[] for _ in queues]
+        # time (ns) the oldest pending event of each queue was received
+        self.pending_since: List[int] = [0 for _ in queues]
+        self.dropped = 0
+        super().__init__(queues)
+
+    def send(self, queue_id: int, event: Dict, urgent: bool = False) -> None:
+        tracing.record_event_age("feed", event)
+        if not self.pending[queue_id]:
+            self.pending_since[queue_id] = time.time_ns()
+        self.pending[queue_id].append(event)
+        if urgent or len(self.pending[queue_id]) >= self.max_batch:
+            self._flush_queue(queue_id)
+
+    def _put(self, queue_id: int, events: List[Dict]) -> List[Dict]:
+        """Push events to queue without blocking, return events not sent"""
+        try:
+            self.queues[queue_id].put(encode_batch(events), block=False)
+        except Full:
+            return events
+        except ValueError:
+            # payload larger than what the queue can hold, split it
+            if len(events) == 1:
+                tlog(f"[ERROR] can't send {events[0]} to queue {queue_id}")
+                return []
+            half = len(events) // 2
+            not_sent = self._put(queue_id, events[:half])
+            if not_sent:
+                return not_sent + events[half:]
+            return self._put(queue_id, events[half:])
+
+        return []
+
+    def _flush_queue(self, queue_id: int) -> None:
+        events = self.pending[queue_id]
+        if not events:
+            return
+
+        self.pending[queue_id] = []
+        sent = len(events)
+        events = self._put(queue_id, events)
+        if len(events) < sent:
+            tracing.record(
+                "batch", time.time_ns() - self.pending_since[queue_id]
+            )
+        if events:
+            self.pending[queue_id] = (
+                self._drop_oldest(queue_id, events) + self.pending[queue_id]
+            )
+
+    def _drop_oldest(self, queue_id: int, events: List[Dict]) -> List[Dict]:
+        """Keep the newest `max_pending` market data events, and all other
+        events (e.g. trade updates), which are re-tried on the next flush"""
+        to_drop = sum(map(is_market_data, events)) - self.max_pending
+        if to_drop <= 0:
+            return events
+
+        self.dropped += to_drop
+        tlog(
+            f"[ERROR] queue {queue_id} is FULL, dropped {to_drop} oldest market data events ({self.dropped} total)"
+        )
+        kept: List[Dict] = []
+        for event in events:
+            if to_drop and is_market_data(event):
+                to_drop -= 1
+            else:
+                kept.append(event)
+        return kept
+
+    def flush(self) -> None:
+        for queue_id in range(len(self.queues)):
+            self._flush_queue(queue_id)
+
+    async def run(self) -> None:
+        tlog(
+            f"transport {self.name} flushing every {self.flush_interval} seconds"
+        )
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                self.flush()
+        except asyncio.CancelledError:
+            tlog("transport flush task cancelled")
+
+    def close(self) -> None:
+        self.flush()
+        for queue_id, q in enumerate(self.queues):
+            if hasattr(q, "stats"):
+                tlog(f"queue {queue_id} stats {q.stats()}")
+        super().close()
+
+
+def get_transport(queues: List[Queue], name: str = None) -> Transport:
+    name = name or config.transport
+    if name == BinaryTransport.name:
+        return BinaryTransport(queues)
+    elif name == Transport.name:
+        return Transport(queues)
+
+    raise NotImplementedError(f"transport {name} is not supported")
@@ -1,26 +1,32 @@
 import asyncio
 import importlib.util
-import json
 import os
 import sys
+import time
 import traceback
 from datetime import date, datetime, timedelta
 from multiprocessing import Queue
 from queue import Empty
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import alpaca_trade_api as tradeapi
 import pandas as pd
 import pygit2
 from alpaca_trade_api.entity import Order
-from alpaca_trade_api.rest import APIError
-from pandas import DataFrame as df
 from pytz import timezone
 from pytz.tzinfo import DstTzInfo
 
-from liualgotrader.common import config, market_data, trading_data
+from liualgotrader.common import config, market_data, tracing, trading_data
+from liualgotrader.common.bar_cache import get_bars
+from liualgotrader.common.bar_store import BarStore
+from liualgotrader.common.coalesce import CONTROL_EVENTS, coalesce
 from liualgotrader.common.database import create_db_connection
+from liualgotrader.common.order_gateway import OrderGateway
+from liualgotrader.common.queue_reader import AsyncQueueReader
+from liualgotrader.common.shared_history import SharedHistory
 from liualgotrader.common.tlog import tlog
+from liualgotrader.common.trade_journal import start_journal, stop_journal
+from liualgotrader.common.transport import decode, enqueue_time
 from liualgotrader.fincalcs.data_conditions import (QUOTE_SKIP_CONDITIONS,
                                                     TRADE_CONDITIONS)
 from liualgotrader.models.new_trades import NewTrade
@@ -30,6 +36,14 @@ from liualgotrader.strategies.base import Strategy, StrategyType
 shortable: Dict = {}
 symbol_data_error: Dict = {}
 rejects: Dict[str, List[str]] = {}
+# symbols moved to this consumer, waiting for their state: (since, events)
+migrating: Dict[str, Tuple[float, List[Dict]]] = {}
+handed_off: Set[str] = set()
+order_gateway: Optional[OrderGateway] = None
+# symbols w/ an order submission in flight: trade updates received meanwhile
+submitting: Dict[str, List[Dict]] = {}
+# symbols to hand off once their submission returns: (consumer, queue)
+deferred_handoffs: Dict[str, Tuple[int, Queue]] = {}
 
 
 async def end_time(reason: str):
@@ -154,42 +168,119 @@ async def liquidate(
     trading_api: tradeapi,
 ) -> None:
 
-    if symbol_position and symbol not in trading_data.open_orders:
+    if (
+        symbol_position
+        and symbol not in trading_data.open_orders
+        and symbol not in submitting
+    ):
         tlog(
             f"Trading over, trying to liquidate remaining position {symbol_position} in {symbol}"
         )
         try:
             if symbol_position < 0:
-                o = trading_api.submit_order(
-                    symbol=symbol,
-                    qty=str(-symbol_position),
-                    side="buy",
-                    type="market",
-                    time_in_force="day",
-                )
-                op = "buy"
                 trading_data.buy_indicators[symbol] = {"liquidation": 1}
-
-            else:
-                o = trading_api.submit_order(
-                    symbol=symbol,
-                    qty=str(symbol_position),
-                    side="sell",
-                    type="market",
-                    time_in_force="day",
+                submit_order(
+                    trading_data.last_used_strategy[symbol],
+                    symbol,
+                    -symbol_position,
+                    "buy",
+                    "market",
                 )
-                op = "sell"
+            else:
                 trading_data.sell_indicators[symbol] = {"liquidation": 1}
-
-            trading_data.open_orders[symbol] = (o, op)
-            trading_data.open_order_strategy[
-                symbol
-            ] = trading_data.last_used_strategy[symbol]
-
+                submit_order(
+                    trading_data.last_used_strategy[symbol],
+                    symbol,
+                    symbol_position,
+                    "sell",
+                    "market",
+                )
         except Exception as e:
             tlog(f"failed to liquidate {symbol} w exception {e}")
 
 
+def submit_order(
+    strategy: Strategy,
+    symbol: str,
+    qty: Any,
+    side: str,
+    type: str,
+    limit_price: Any = None,
+    event: Dict = None,
+) -> asyncio.Task:
+    """Send order through the order gateway without waiting for the
+    broker, the order is added to `open_orders` once accepted. Trade
+    updates of the symbol are held till then. `event` is the market event
+    that triggered the order, for latency tracing"""
+    submitted_ns = time.time_ns()
+    submission = order_gateway.submit_order(  # type: ignore
+        symbol=symbol,
+        qty=qty,
+        side=side,
+        type=type,
+        limit_price=limit_price,
+    )
+    submitting.setdefault(symbol, [])
+    previous_strategy = trading_data.last_used_strategy.get(symbol)
+    trading_data.open_order_strategy[symbol] = strategy
+    trading_data.last_used_strategy[symbol] = strategy
+    return asyncio.create_task(
+        track_order(
+            symbol,
+            side,
+            submission,
+            previous_strategy,
+            strategy.name,
+            submitted_ns,
+            tracing.event_time_ns(event) if event else None,
+        )
+    )
+
+
+async def track_order(
+    symbol: str,
+    side: str,
+    submission: asyncio.Future,
+    previous_strategy: Optional[Strategy],
+    strategy_name: str,
+    submitted_ns: int,
+    event_ns: Optional[int],
+) -> None:
+    order: Optional[Order] = None
+    try:
+        order = await submission
+    except Exception as e:
+        tlog(f"order submission for {symbol} failed w/ {e}")
+        trading_data.open_order_strategy.pop(symbol, None)
+        if previous_strategy:
+            trading_data.last_used_strategy[symbol] = previous_strategy
+        else:
+            trading_data.last_used_strategy.pop(symbol, None)
+    else:
+        tracing.record("submit", time.time_ns() - submitted_ns, strategy_name)
+        if event_ns:
+            tracing.record(
+                "tick_to_order", time.time_ns() - event_ns, strategy_name
+            )
+        trading_data.open_orders[symbol] = (order, side)
+
+    # apply the trade updates that raced the broker's response, including
+    # those arriving while applying
+    updates = submitting.get(symbol, [])
+    try:
+        while updates:
+            data = updates.pop(0)
+            if order and data.get("order", {}).get("id") == order.id:
+                await apply_trade_update(data)
+            else:
+                await handle_trade_update_wo_order(data)
+    finally:
+        submitting.pop(symbol, None)
+
+    if symbol in deferred_handoffs:
+        hand_off(symbol, *deferred_handoffs.pop(symbol))
+
+
 async def should_cancel_order(order: Order, market_clock: datetime) -> bool:
     # Make sure the order's not too old
     submitted_at = order.submitted_at.astimezone(timezone("America/New_York"))
@@ -225,10 +316,6 @@ async def save(
     )
 
 
-async def get_order(api: tradeapi, order_id: str) -> Order:
-    return api.get_order(order_id)
-
-
 async def update_partially_filled_order(
     strategy: Strategy, order: Order
 ) -> None:
@@ -369,6 +456,18 @@ async def handle_trade_update_wo_order(data: Dict) -> bool:
 
 
 async def handle_trade_update(data: Dict) -> bool:
+    symbol = data["symbol"]
+    if order_gateway:
+        order_gateway.on_trade_update(data)
+    if symbol in submitting:
+        tlog(f"holding {data['event']} trade update for {symbol}")
+        submitting[symbol].append(data)
+        return True
+
+    return await apply_trade_update(data)
+
+
+async def apply_trade_update(data: Dict) -> bool:
     symbol = data["symbol"]
     if trading_data.open_orders.get(symbol):
         return await handle_trade_update_for_order(data)
@@ -385,18 +484,18 @@ async def handle_data_queue_msg(
 
     symbol = data["symbol"]
     if symbol not in market_data.minute_history:
-        _df = data_api.polygon.historic_agg_v2(
+        _df = get_bars(
+            data_api,
             symbol,
-            1,
             "minute",
             _from=str(date.today() - timedelta(days=10)),
             to=str(date.today() + timedelta(days=1)),
-        ).df
+        )
         _df["vwap"] = 0.0
         _df["average"] = 0.0
-        market_data.minute_history[symbol] = _df
+        market_data.minute_history[symbol] = BarStore.from_dataframe(_df)
         tlog(
-            f"consumer task loaded {len(market_data.minute_history[symbol].index)} 1-min candles for {symbol}"
+            f"consumer task loaded {len(market_data.minute_history[symbol])} 1-min candles for {symbol}"
         )
         shortable[symbol] = True  # await is_shortable(data_api, symbol)
     elif not shortable.get(symbol):
@@ -469,11 +568,7 @@ async def handle_data_queue_msg(
         )
         ts = ts.replace(second=0, microsecond=0)
 
-        try:
-            current = market_data.minute_history[symbol].loc[ts]
-        except KeyError:
-            current = None
-
+        current = market_data.minute_history[symbol].get(ts)
         if current is None:
             new_data = [
                 data["open"],
@@ -486,21 +581,21 @@ async def handle_data_queue_msg(
             ]
         else:
             new_data = [
-                current.open,
-                max(data["high"], current.high),
-                min(data["low"], current.low),
+                current["open"],
+                max(data["high"], current["high"]),
+                min(data["low"], current["low"]),
                 data["close"],
-                current.volume + data["volume"],
+                current["volume"] + data["volume"],
                 data["vwap"],
                 data["average"],
             ]
-        market_data.minute_history[symbol].loc[ts] = new_data
+        market_data.minute_history[symbol].upsert(ts, new_data)
         market_data.volume_today[symbol] = data["totalvolume"]
 
         if data["EV"] == "A":
             if (time_diff := datetime.now(tz=timezone("America/New_York")) - original_ts) > timedelta(seconds=10):  # type: ignore
                 tlog(f"A$ {symbol} too out of sync w {time_diff}")
-                return False
+                return True
             elif (
                 curr_min := datetime.now(
                     tz=timezone("America/New_York")
@@ -517,8 +612,8 @@ async def handle_data_queue_msg(
             existing_order = existing_order[0]
             try:
                 if await should_cancel_order(existing_order, original_ts):
-                    inflight_order = await get_order(
-                        trading_api, existing_order.id  # type: ignore
+                    inflight_order = await order_gateway.get_order(  # type: ignore
+                        existing_order.id  # type: ignore
                     )
                     if inflight_order and inflight_order.status == "filled":
                         tlog(
@@ -544,12 +639,14 @@ async def handle_data_queue_msg(
                         tlog(
                             f"Cancel order id {existing_order.id} for {symbol} ts={original_ts} submission_ts={existing_order.submitted_at.astimezone(timezone('America/New_York'))}"  # type: ignore
                         )
-                        trading_api.cancel_order(existing_order.id)  # type: ignore
+                        order_gateway.cancel_order(existing_order.id)  # type: ignore
                         trading_data.open_orders.pop(symbol, None)
 
                 return True
             except AttributeError:
                 tlog(f"Attribute Error in symbol {symbol} w/ {existing_order}")
+        elif symbol in submitting:
+            return True
 
         # do we have a position?
         symbol_position = trading_data.positions.get(symbol, 0)
@@ -565,6 +662,7 @@ async def handle_data_queue_msg(
         ):
             await liquidate(symbol, int(symbol_position), trading_api)
         else:
+            tracing.record_event_age("dispatch", data)
             # run strategies
             for s in trading_data.strategies:
                 if (
@@ -578,15 +676,19 @@ async def handle_data_queue_msg(
                     continue
 
                 try:
+                    started_ns = time.time_ns()
                     do, what = await s.run(
                         symbol,
                         shortable[symbol],
                         int(symbol_position),
-                        market_data.minute_history[symbol],
+                        market_data.minute_history[symbol].df,
                         ts,
                         trading_api=trading_api,
                         portfolio_value=config.portfolio_value,
                     )
+                    tracing.record(
+                        "strategy", time.time_ns() - started_ns, s.name
+                    )
                 except Exception as e:
                     # exc_info = sys.exc_info()
                     # lines = traceback.format_exception(*exc_info)
@@ -605,57 +707,46 @@ async def handle_data_queue_msg(
                     if symbol_data_error[symbol] < 5:
                         tlog(f"attempting reload of data for symbol {symbol}")
 
-                        _df = data_api.polygon.historic_agg_v2(
+                        _df = get_bars(
+                            data_api,
                             symbol,
-                            1,
                             "minute",
                             _from=str(date.today() - timedelta(days=10)),
                             to=str(date.today() + timedelta(days=1)),
-                        ).df
+                        )
                         _df["vwap"] = 0.0
                         _df["average"] = 0.0
-                        market_data.minute_history[symbol] = _df
+                        market_data.minute_history[
+                            symbol
+                        ] = BarStore.from_dataframe(_df)
                         tlog(
-                            f"consumer task re-loaded {len(market_data.minute_history[symbol].index)} 1-min candles for {symbol}"
+                            f"consumer task re-loaded {len(market_data.minute_history[symbol])} 1-min candles for {symbol}"
                         )
                     continue
 
                 if do:
-                    try:
-                        if what["type"] == "limit":
-                            o = trading_api.submit_order(
-                                symbol=symbol,
-                                qty=what["qty"],
-                                side=what["side"],
-                                type="limit",
-                                time_in_force="day",
-                                limit_price=what["limit_price"],
-                            )
-                        else:
-                            o = trading_api.submit_order(
-                                symbol=symbol,
-                                qty=what["qty"],
-                                side=what["side"],
-                                type=what["type"],
-                                time_in_force="day",
-                            )
+                    if symbol in submitting:
+                        break
 
-                        trading_data.open_orders[symbol] = (o, what["side"])
-                        trading_data.open_order_strategy[symbol] = s
-
-                        tlog(
-                            f"executed strategy {s.name} on {symbol} w data {market_data.minute_history[symbol][-10:]}"
-                        )
-                        trading_data.last_used_strategy[symbol] = s
-                        if what["side"] == "buy":
-                            trading_data.buy_time[symbol] = datetime.now(
-                                tz=timezone("America/New_York")
-                            ).replace(second=0, microsecond=0)
-                            break
-                    except APIError as e:
-                        tlog(
-                            f"Exception APIError with {e} from {what}, checking if order filled"
-                        )
+                    submit_order(
+                        s,
+                        symbol,
+                        what["qty"],
+                        what["side"],
+                        what["type"],
+                        what.get("limit_price")
+                        if what["type"] == "limit"
+                        else None,
+                        event=data,
+                    )
+                    tlog(
+                        f"executed strategy {s.name} on {symbol} w data {market_data.minute_history[symbol][-10:]}"
+                    )
+                    if what["side"] == "buy":
+                        trading_data.buy_time[symbol] = datetime.now(
+                            tz=timezone("America/New_York")
+                        ).replace(second=0, microsecond=0)
+                        break
                 else:
                     if what.get("reject", False):
                         if s.name not in rejects:
@@ -665,32 +756,186 @@ async def handle_data_queue_msg(
     return True
 
 
+def export_symbol_state(symbol: str) -> Dict:
+    """Remove the symbol's state from this consumer, in a picklable form"""
+    state: Dict = {
+        "symbol": symbol,
+        "minute_history": market_data.minute_history.pop(symbol, None),
+        "volume_today": market_data.volume_today.pop(symbol, None),
+        "shortable": shortable.pop(symbol, None),
+        "trading_data": {},
+    }
+    for name in trading_data.symbol_state:
+        values = getattr(trading_data, name)
+        if symbol not in values:
+            continue
+
+        value = values.pop(symbol)
+        if isinstance(value, Strategy):
+            value = value.name
+        elif name == "open_orders":
+            value = (value[0]._raw, value[1])
+        state["trading_data"][name] = value
+
+    return state
+
+
+def import_symbol_state(state: Dict) -> None:
+    """Install the state of a symbol moved from another consumer"""
+    symbol = state["symbol"]
+    if state["minute_history"] is not None:
+        market_data.minute_history[symbol] = state["minute_history"]
+    if state["volume_today"] is not None:
+        market_data.volume_today[symbol] = state["volume_today"]
+    if state["shortable"] is not None:
+        shortable[symbol] = state["shortable"]
+
+    strategies = {s.name: s for s in trading_data.strategies}
+    for name, value in state["trading_data"].items():
+        if name in ("open_order_strategy", "last_used_strategy"):
+            if value not in strategies:
+                tlog(f"[ERROR] strategy {value} of {symbol} is not loaded")
+                continue
+            value = strategies[value]
+        elif name == "open_orders":
+            value = (Order(value[0]), value[1])
+        getattr(trading_data, name)[symbol] = value
+
+
+def hand_off(symbol: str, to: int, handoff_queue: Queue) -> None:
+    handoff_queue.put(export_symbol_state(symbol))
+    tlog(f"handed {symbol} off to consumer {to}")
+
+
+async def handle_control_msg(
+    data: Dict, handoff_queues: Optional[List[Queue]]
+) -> None:
+    symbol = data["symbol"]
+    if data["EV"] == "migrate_out":
+        if not handoff_queues:
+            return
+        if symbol in submitting:
+            # the order is known only once accepted, hand off w/ it
+            tlog(f"{symbol} hand-off waits for its order submission")
+            deferred_handoffs[symbol] = (
+                data["to"],
+                handoff_queues[data["to"]],
+            )
+        else:
+            hand_off(symbol, data["to"], handoff_queues[data["to"]])
+    elif symbol in handed_off:
+        handed_off.discard(symbol)
+    else:
+        migrating[symbol] = (time.time(), [])
+
+
+async def replay_symbol_events(
+    symbol: str, trading_api: tradeapi, data_api: tradeapi
+) -> None:
+    _, events = migrating.pop(symbol)
+    tlog(f"replaying {len(events)} events of {symbol}")
+    for data in coalesce(events):
+        if data["EV"] == "trade_update":
+            await handle_trade_update(data)
+        else:
+            await handle_data_queue_msg(data, trading_api, data_api)
+
+
+async def receive_handoffs(
+    handoff_queue: Queue, trading_api: tradeapi, data_api: tradeapi
+) -> None:
+    """Install state of symbols moved to this consumer, and replay the
+    events received while waiting for it"""
+    while True:
+        try:
+            state = handoff_queue.get_nowait()
+        except Empty:
+            break
+
+        symbol = state["symbol"]
+        import_symbol_state(state)
+        tlog(f"received {symbol} state from another consumer")
+        if symbol in migrating:
+            await replay_symbol_events(symbol, trading_api, data_api)
+        else:
+            handed_off.add(symbol)
+
+    for symbol in [
+        symbol
+        for symbol, (since, _) in migrating.items()
+        if time.time() - since > config.shard_handoff_timeout
+    ]:
+        tlog(f"[ERROR] timed-out waiting for {symbol} state")
+        await replay_symbol_events(symbol, trading_api, data_api)
+
+
+async def handle_queue_events(
+    events: List[Dict],
+    trading_api: tradeapi,
+    data_api: tradeapi,
+    handoff_queues: Optional[List[Queue]],
+    consumer_id: int,
+) -> None:
+    for data in coalesce(events):
+        if data["EV"] in CONTROL_EVENTS:
+            await handle_control_msg(data, handoff_queues)
+            if data["EV"] == "migrate_in" and handoff_queues:
+                await receive_handoffs(
+                    handoff_queues[consumer_id],
+                    trading_api,
+                    data_api,
+                )
+        elif data["symbol"] in migrating:
+            migrating[data["symbol"]][1].append(data)
+        elif data["EV"] == "trade_update":
+            tlog(f"received trade_update: {data}")
+            await handle_trade_update(data)
+        else:
+            await handle_data_queue_msg(data, trading_api, data_api)
+
+        # let order handling & other tasks run between events
+        await asyncio.sleep(0)
+
+
 async def queue_consumer(
     queue: Queue,
     trading_api: tradeapi,
     data_api: tradeapi,
+    handoff_queues: List[Queue] = None,
+    consumer_id: int = 0,
 ) -> None:
     tlog("queue_consumer() starting")
 
+    reader = AsyncQueueReader(queue)
+    reader.start()
     try:
         while True:
             try:
-                raw_data = queue.get(timeout=2)
-                data = json.loads(raw_data)
+                if migrating:
+                    await receive_handoffs(
+                        handoff_queues[consumer_id],  # type: ignore
+                        trading_api,
+                        data_api,
+                    )
+                batch = await reader.get_batch(
+                    timeout=0.1 if migrating else 2
+                )
 
-                if data["EV"] == "trade_update":
-                    tlog(f"received trade_update: {data}")
-                    await handle_trade_update(data)
-                else:
-                    if not await handle_data_queue_msg(
-                        data, trading_api, data_api
-                    ):
-                        while not queue.empty():
-                            _ = queue.get()
-                        tlog("cleaned queue")
+                events: List[Dict] = []
+                for raw_data in batch:
+                    if enqueue_ns := enqueue_time(raw_data):
+                        tracing.record("queue", time.time_ns() - enqueue_ns)
+                    events += decode(raw_data)
+
+                await handle_queue_events(
+                    events,
+                    trading_api,
+                    data_api,
+                    handoff_queues,
+                    consumer_id,
+                )
 
             except Empty:
-                await asyncio.sleep(0)
                 continue
             except Exception as e:
                 tlog(
@@ -716,6 +961,7 @@ async def queue_consumer(
         traceback.print_exception(*exc_info)
         del exc_info
     finally:
+        await reader.stop()
         tlog("queue_consumer() task done.")
 
 
@@ -752,8 +998,13 @@ async def consumer_async_main(
     symbols: List[str],
     unique_id: str,
     strategies_conf: Dict,
+    handoff_queues: List[Queue] = None,
+    consumer_id: int = 0,
 ):
+    global order_gateway
+
     await create_db_connection(str(config.dsn))
+    await start_journal(config.db_conn_pool, f"consumer-{consumer_id}")
 
     if symbols:
         try:
@@ -791,6 +1042,7 @@ async def consumer_async_main(
         key_id=config.prod_api_key_id,
         secret_key=config.prod_api_secret,
     )
+    order_gateway = OrderGateway(trading_api, config.order_gateway_workers)
     nyc = timezone("America/New_York")
     config.market_open, config.market_close = get_trading_windows(
         nyc, trading_api
@@ -849,8 +1101,13 @@ async def consumer_async_main(
             f"[ERROR] Consumer process loaded only {loaded} out of {len(symbols)} open positions. HINT: make sure that your tradeplan.toml file includes all strategues in previous trading session."
         )
 
+    tracer = tracing.start_tracing(f"consumer-{consumer_id}")
+    trace_task = asyncio.create_task(tracer.run()) if tracer else None
+
     queue_consumer_task = asyncio.create_task(
-        queue_consumer(queue, trading_api, data_api)
+        queue_consumer(
+            queue, trading_api, data_api, handoff_queues, consumer_id
+        )
     )
 
     liquidate_task = asyncio.create_task(liquidator(trading_api))
@@ -864,6 +1121,11 @@ async def consumer_async_main(
         queue_consumer_task,
         return_exceptions=True,
     )
+    order_gateway.close()
+    await stop_journal()
+    if trace_task:
+        trace_task.cancel()
+        await asyncio.gather(trace_task, return_exceptions=True)
 
     tlog("consumer_async_main() completed")
 
@@ -937,9 +1199,11 @@ async def load_current_positions(
 def consumer_main(
     queue: Queue,
     symbols: List[str],
-    minute_history: Dict[str, df],
+    minute_history: SharedHistory,
     unique_id: str,
     conf: Dict,
+    handoff_queues: List[Queue] = None,
+    consumer_id: int = 0,
 ) -> None:
     tlog(f"*** consumer_main() starting w pid {os.getpid()} ***")
 
@@ -961,12 +1225,23 @@ def consumer_main(
             "market_liquidation_end_time_minutes"
         ]
 
-    market_data.minute_history = minute_history
+    # zero-copy views of the owned symbols, others are loaded on demand
+    market_data.minute_history = minute_history.attach(symbols or [])
+    tlog(
+        f"attached {len(market_data.minute_history)} symbols history from {minute_history.name}"
+    )
     try:
         if not asyncio.get_event_loop().is_closed():
             asyncio.get_event_loop().close()
         asyncio.run(
-            consumer_async_main(queue, symbols, unique_id, conf["strategies"])
+            consumer_async_main(
+                queue,
+                symbols,
+                unique_id,
+                conf["strategies"],
+                handoff_queues,
+                consumer_id,
+            )
         )
     except KeyboardInterrupt:
         tlog("consumer_main() - Caught KeyboardInterrupt")
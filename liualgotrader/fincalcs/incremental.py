@@ -0,0 +1,396 @@
+"""Streaming technical indicators, updated in O(1) per bar"""
+import math
+from collections import deque
+from datetime import date, time
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from liualgotrader.common.bar_store import BarStore
+
+Bar = Dict[str, float]
+Source = Union[str, Callable[[Bar], float]]
+
+
+def _value_of(source: Source, bar: Bar) -> float:
+    return source(bar) if callable(source) else bar[source]
+
+
+class Indicator:
+    """Base class for streaming indicators.
+
+    Bars are fed in time order with `update()`. Passing `new_bar=False`
+    revises the current bar (e.g. a second-bar updating the running
+    minute): its value is recomputed from the state committed at the
+    previous bar, so revisions are O(1) as well.
+
+    Sub-classes implement `_compute()`, the value for the current bar given
+    the committed state, `_commit()`, which folds a final bar into the
+    state, and `_reset()`. The most recent values are kept in `values`.
+    """
+
+    def __init__(self, keep: int = 64):
+        self.values: Deque = deque(maxlen=keep)
+        self._pending: Optional[Tuple[int, Bar]] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        raise NotImplementedError
+
+    def _compute(self, ts: int, bar: Bar) -> Any:
+        raise NotImplementedError
+
+    def _commit(self, ts: int, bar: Bar) -> None:
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        self.values.clear()
+        self._pending = None
+        self._reset()
+
+    def update(self, ts: int, bar: Bar, new_bar: bool = True) -> Any:
+        if self._pending is not None:
+            if new_bar:
+                self._commit(*self._pending)
+            else:
+                self.values.pop()
+
+        self._pending = (ts, bar)
+        value = self._compute(ts, bar)
+        self.values.append(value)
+        return value
+
+    def preview(self, bar: Bar) -> Any:
+        """Value the current bar would have if it was `bar`, without
+        updating the indicator"""
+        return self._compute(self._pending[0] if self._pending else 0, bar)
+
+    @property
+    def value(self) -> Any:
+        return self.values[-1] if self.values else math.nan
+
+    def __getitem__(self, i: int) -> Any:
+        return self.values[i]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class EMA(Indicator):
+    def __init__(self, period: int, source: Source = "close", keep: int = 64):
+        self.period = period
+        self.source = source
+        self.alpha = 2.0 / (period + 1)
+        super().__init__(keep)
+
+    def _reset(self) -> None:
+        self.ema: Optional[float] = None
+
+    def next(self, x: float) -> float:
+        if math.isnan(x):
+            return self.ema if self.ema is not None else math.nan
+        if self.ema is None:
+            return x
+        return self.alpha * x + (1.0 - self.alpha) * self.ema
+
+    def _compute(self, ts: int, bar: Bar) -> float:
+        return self.next(_value_of(self.source, bar))
+
+    def _commit(self, ts: int, bar: Bar) -> None:
+        value = self._compute(ts, bar)
+        if not math.isnan(value):
+            self.ema = value
+
+
+class MACD(Indicator):
+    """Values are (macd, signal, histogram) tuples"""
+
+    def __init__(
+        self,
+        fast: int = 12,
+        slow: int = 26,
+        signal: int = 9,
+        source: Source = "close",
+        keep: int = 64,
+    ):
+        self.fast = EMA(fast, source)
+        self.slow = EMA(slow, source)
+        self.signal_ema = EMA(signal, "macd")
+        super().__init__(keep)
+
+    def _reset(self) -> None:
+        self.fast.reset()
+        self.slow.reset()
+        self.signal_ema.reset()
+
+    def _macd(self, ts: int, bar: Bar) -> float:
+        return self.fast._compute(ts, bar) - self.slow._compute(ts, bar)
+
+    def _compute(self, ts: int, bar: Bar) -> Tuple[float, float, float]:
+        macd = self._macd(ts, bar)
+        signal = self.signal_ema.next(macd)
+        return macd, signal, macd - signal
+
+    def _commit(self, ts: int, bar: Bar) -> None:
+        macd = self._macd(ts, bar)
+        self.fast._commit(ts, bar)
+        self.slow._commit(ts, bar)
+        self.signal_ema._commit(ts, {"macd": macd})
+
+    @property
+    def macd(self) -> List[float]:
+        return [value[0] for value in self.values]
+
+    @property
+    def signal(self) -> List[float]:
+        return [value[1] for value in self.values]
+
+    @property
+    def hist(self) -> List[float]:
+        return [value[2] for value in self.values]
+
+
+class RSI(Indicator):
+    """Wilder's RSI, seeded w/ the simple average of the first `period`
+    changes. NaN until seeded"""
+
+    def __init__(self, period: int = 14, source: Source = "close", keep=64):
+        self.period = period
+        self.source = source
+        super().__init__(keep)
+
+    def _reset(self) -> None:
+        self.prev: Optional[float] = None
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.count = 0
+
+    def _averages(self, x: float) -> Optional[Tuple[float, float, int]]:
+        if self.prev is None or math.isnan(x):
+            return None
+
+        change = x - self.prev
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+        count = self.count + 1
+        if count <= self.period:
+            return (
+                (self.avg_gain * self.count + gain) / count,
+                (self.avg_loss * self.count + loss) / count,
+                count,
+            )
+        return (
+            (self.avg_gain * (self.period - 1) + gain) / self.period,
+            (self.avg_loss * (self.period - 1) + loss) / self.period,
+            count,
+        )
+
+    def _compute(self, ts: int, bar: Bar) -> float:
+        averages = self._averages(_value_of(self.source, bar))
+        if averages is None or averages[2] < self.period:
+            return math.nan
+
+        avg_gain, avg_loss, _ = averages
+        if not avg_loss:
+            return 100.0 if avg_gain else 50.0
+        return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+    def _commit(self, ts: int, bar: Bar) -> None:
+        x = _value_of(self.source, bar)
+        if math.isnan(x):
+            return
+
+        averages = self._averages(x)
+        if averages:
+            self.avg_gain, self.avg_loss, self.count = averages
+        self.prev = x
+
+
+class ATR(Indicator):
+    """Wilder's average true range. NaN until `period` bars are seen"""
+
+    def __init__(self, period: int = 14, keep: int = 64):
+        self.period = period
+        super().__init__(keep)
+
+    def _reset(self) -> None:
+        self.prev_close: Optional[float] = None
+        self.atr = 0.0
+        self.count = 0
+
+    def _next(self, bar: Bar) -> Tuple[float, int]:
+        high, low = bar["high"], bar["low"]
+        true_range = (
+            high - low
+            if self.prev_close is None
+            else max(
+                high - low,
+                abs(high - self.prev_close),
+                abs(low - self.prev_close),
+            )
+        )
+        count = self.count + 1
+        if count <= self.period:
+            return (self.atr * self.count + true_range) / count, count
+        return (self.atr * (self.period - 1) + true_range) / self.period, count
+
+    def _compute(self, ts: int, bar: Bar) -> float:
+        atr, count = self._next(bar)
+        return atr if count >= self.period else math.nan
+
+    def _commit(self, ts: int, bar: Bar) -> None:
+        if math.isnan(bar["high"]) or math.isnan(bar["low"]):
+            return
+        self.atr, self.count = self._next(bar)
+        self.prev_close = bar["close"]
+
+
+class VWAP(Indicator):
+    """Volume weighted average (typical) price, anchored daily at `anchor`.
+    NaN before the anchor"""
+
+    def __init__(
+        self,
+        anchor: time = time(9, 30),
+        tz: str = "America/New_York",
+        keep: int = 64,
+    ):
+        self.anchor = anchor
+        self.tz = tz
+        self._session_of: Tuple[Optional[int], Optional[date]] = (None, None)
+        super().__init__(keep)
+
+    def _reset(self) -> None:
+        self.session: Optional[date] = None
+        self.cum_pv = 0.0
+        self.cum_volume = 0.0
+
+    def _session(self, ts: int) -> Optional[date]:
+        if self._session_of[0] != ts:
+            t = pd.Timestamp(ts, tz="UTC").tz_convert(self.tz)
+            self._session_of = (
+                ts,
+                t.date() if t.time() >= self.anchor else None,
+            )
+        return self._session_of[1]
+
+    def _next(self, ts: int, bar: Bar) -> Tuple[Optional[date], float, float]:
+        session = self._session(ts)
+        if session is None:
+            return None, 0.0, 0.0
+
+        cum_pv, cum_volume = (
+            (self.cum_pv, self.cum_volume)
+            if session == self.session
+            else (0.0, 0.0)
+        )
+        volume = bar["volume"]
+        if not math.isnan(volume):
+            typical = (bar["high"] + bar["low"] + bar["close"]) / 3.0
+            cum_pv += typical * volume
+            cum_volume += volume
+        return session, cum_pv, cum_volume
+
+    def _compute(self, ts: int, bar: Bar) -> float:
+        _, cum_pv, cum_volume = self._next(ts, bar)
+        return cum_pv / cum_volume if cum_volume else math.nan
+
+    def _commit(self, ts: int, bar: Bar) -> None:
+        self.session, self.cum_pv, self.cum_volume = self._next(ts, bar)
+
+
+class RollingMax(Indicator):
+    """Maximum over the last `period` bars, w/ a monotonic queue of the
+    committed bars"""
+
+    def __init__(self, period: int, source: Source = "high", keep=64):
+        self.period = period
+        self.source = source
+        super().__init__(keep)
+
+    def _reset(self) -> None:
+        self.window: Deque[Tuple[int, float]] = deque()
+        self.count = 0
+
+    @staticmethod
+    def _better(a: float, b: float) -> bool:
+        return a >= b
+
+    def _compute(self, ts: int, bar: Bar) -> float:
+        x = _value_of(self.source, bar)
+        best = self.window[0][1] if self.window else math.nan
+        if math.isnan(best) or (not math.isnan(x) and self._better(x, best)):
+            return x
+        return best
+
+    def _commit(self, ts: int, bar: Bar) -> None:
+        x = _value_of(self.source, bar)
+        if not math.isnan(x):
+            while self.window and self._better(x, self.window[-1][1]):
+                self.window.pop()
+            self.window.append((self.count, x))
+
+        self.count += 1
+        while self.window and self.window[0][0] <= self.count - self.period:
+            self.window.popleft()
+
+
+class RollingMin(RollingMax):
+    def __init__(self, period: int, source: Source = "low", keep=64):
+        super().__init__(period, source, keep)
+
+    @staticmethod
+    def _better(a: float, b: float) -> bool:
+        return a <= b
+
+
+class IndicatorSet:
+    """Named indicators fed from a `BarStore`.
+
+    `sync()` revises the bar that was current on the previous call, and
+    feeds the bars appended since, so keeping indicators current costs
+    O(1) per bar regardless of history length. When `hours` is set,
+    bars outside of it (inclusive, e.g. pre-market) are skipped.
+    """
+
+    def __init__(
+        self,
+        indicators: Dict[str, Indicator],
+        hours: Optional[Tuple[time, time]] = None,
+    ):
+        self.indicators = indicators
+        self.hours = hours
+        self.position = 0
+        self.revision = 0
+
+    def reset(self) -> None:
+        for indicator in self.indicators.values():
+            indicator.reset()
+        self.position = 0
+
+    def sync(
+        self, bars: BarStore, size: Optional[int] = None
+    ) -> Dict[str, Indicator]:
+        """Bring indicators up to date w/ the first `size` bars (all bars
+        by default)"""
+        size = len(bars) if size is None else min(size, len(bars))
+        if size < self.position or bars.revision != self.revision:
+            self.reset()
+            self.revision = bars.revision
+
+        index = bars.index if self.hours else None
+        for position in range(max(self.position - 1, 0), size):
+            if index is not None and not (
+                self.hours[0] <= index[position].time() <= self.hours[1]  # type: ignore
+            ):
+                continue
+
+            ts, bar = bars.row(position)
+            new_bar = position >= self.position
+            for indicator in self.indicators.values():
+                indicator.update(ts, bar, new_bar)
+
+        self.position = size
+        return self.indicators
+
+    def __getitem__(self, name: str) -> Indicator:
+        return self.indicators[name]
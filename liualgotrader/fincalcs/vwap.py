@@ -9,13 +9,22 @@ from liualgotrader.common import config
 from liualgotrader.common.tlog import tlog
 
 
+def typical_price(ohlc_data: df) -> pd.Series:
+    return (ohlc_data["close"] + ohlc_data["high"] + ohlc_data["low"]) / 3
+
+
+def _nearest(index: pd.Index, when: datetime) -> int:
+    position = index.get_indexer([when], method="nearest")[0]
+    if position < 0:
+        raise KeyError(when)
+    return position
+
+
 def add_daily_vwap(minute_data: df, debug=False) -> bool:
     back_time = ts(config.market_open)
 
     try:
-        back_time_index = minute_data["close"].index.get_loc(
-            back_time, method="nearest"
-        )
+        back_time_index = _nearest(minute_data.index, back_time)
     except Exception as e:
         if debug:
             tlog(
@@ -23,16 +32,13 @@ def add_daily_vwap(minute_data: df, debug=False) -> bool:
             )
         return False
 
-    minute_data["pv"] = minute_data.apply(
-        lambda x: (x["close"] + x["high"] + x["low"]) / 3 * x["volume"], axis=1
-    )
+    typical = typical_price(minute_data)
+    minute_data["pv"] = typical * minute_data["volume"]
     minute_data["apv"] = minute_data["pv"][back_time_index:].cumsum()
     minute_data["av"] = minute_data["volume"][back_time_index:].cumsum()
 
     minute_data["average"] = minute_data["apv"] / minute_data["av"]
-    minute_data["vwap"] = minute_data.apply(
-        lambda x: (x["close"] + x["high"] + x["low"]) / 3, axis=1
-    )
+    minute_data["vwap"] = typical
 
     # print(f"\n{tabulate(minute_data, headers='keys', tablefmt='psql')}")
     if debug:
@@ -50,29 +56,24 @@ def anchored_vwap(
     ohlc_data: df, start_time: datetime, debug=False
 ) -> pd.Series:
     try:
-        start_time_index = ohlc_data["close"].index.get_loc(
-            start_time, method="nearest"
-        )
+        start_time_index = _nearest(ohlc_data.index, start_time)
     except Exception as e:
         if debug:
             tlog(f"IndexError exception {e} in anchored_vwap for {ohlc_data}")
         return pd.Series()
 
-    df = ohlc_data.copy()
-    df["pv"] = df.apply(
-        lambda x: (x["close"] + x["high"] + x["low"]) / 3 * x["volume"], axis=1
-    )
-    df["apv"] = df["pv"][start_time_index:].cumsum()
-    df["av"] = df["volume"][start_time_index:].cumsum()
-
-    df["average"] = df["apv"] / df["av"]
+    ohlc_data = ohlc_data[start_time_index:]
+    average = (
+        (typical_price(ohlc_data) * ohlc_data["volume"]).cumsum()
+        / ohlc_data["volume"].cumsum()
+    ).rename("average")
 
     if debug:
         tlog(
-            f"\n{tabulate(df.average[start_time_index:][-15:], headers='keys', tablefmt='psql')}"
+            f"\n{tabulate(average.to_frame()[-15:], headers='keys', tablefmt='psql')}"
         )
         tlog(
-            f"\n{tabulate(df.average[start_time_index:][:15], headers='keys', tablefmt='psql')}"
+            f"\n{tabulate(average.to_frame()[:15], headers='keys', tablefmt='psql')}"
         )
 
-    return df.average[start_time_index:]
+    return average
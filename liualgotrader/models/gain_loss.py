@@ -1,5 +1,8 @@
+import math
 from datetime import date
+from typing import List, Tuple
 
+from asyncpg.connection import Connection
 from pandas import DataFrame
 
 from liualgotrader.common import config
@@ -10,9 +13,35 @@ from liualgotrader.common.tlog import tlog
 class GainLoss:
     @classmethod
     async def save(cls, df: DataFrame):
-        pool = config.db_conn_pool
+        """Bulk insert gain_loss rows, falling back to row-by-row inserts
+        (skipping failed rows) if the bulk insert fails"""
+        records = list(
+            zip(
+                df.symbol.tolist(),
+                df.algo_run_id.astype(int).tolist(),
+                df.gain_percentage.astype(float).tolist(),
+                df.gain_value.astype(float).tolist(),
+            )
+        )
+        if not records:
+            return
 
+        pool = config.db_conn_pool
         async with pool.acquire() as con:
+            try:
+                await _bulk_insert(
+                    con,
+                    "gain_loss",
+                    ["symbol", "algo_run_id", "gain_percentage", "gain_value"],
+                    "(symbol, algo_run_id)",
+                    records,
+                )
+                return
+            except Exception as e:
+                tlog(
+                    f"[ERROR] bulk insert of {len(records)} gain_loss rows resulted in exception {e}, retrying row by row"
+                )
+
             for _, row in df.iterrows():
                 try:
                     async with con.transaction():
@@ -48,9 +77,51 @@ class GainLoss:
 class TradeAnalysis:
     @classmethod
     async def save(cls, df: DataFrame):
-        pool = config.db_conn_pool
+        """Bulk insert trade_analysis rows, falling back to row-by-row
+        inserts (skipping failed rows) if the bulk insert fails"""
+        records = list(
+            zip(
+                df.symbol.tolist(),
+                df.algo_run_id.astype(int).tolist(),
+                df.gain_percentage.astype(float).tolist(),
+                df.gain_value.astype(float).tolist(),
+                [
+                    None
+                    if r_units is None or math.isnan(r_units)
+                    else r_units
+                    for r_units in df.r_units.tolist()
+                ],
+                [t.to_pydatetime() for t in df.start_time],
+                [t.to_pydatetime() for t in df.end_time],
+            )
+        )
+        if not records:
+            return
 
+        pool = config.db_conn_pool
         async with pool.acquire() as con:
+            try:
+                await _bulk_insert(
+                    con,
+                    "trade_analysis",
+                    [
+                        "symbol",
+                        "algo_run_id",
+                        "gain_percentage",
+                        "gain_value",
+                        "r_units",
+                        "start_tstamp",
+                        "end_tstamp",
+                    ],
+                    "(symbol, algo_run_id, start_tstamp)",
+                    records,
+                )
+                return
+            except Exception as e:
+                tlog(
+                    f"[ERROR] bulk insert of {len(records)} trade_analysis rows resulted in exception {e}, retrying row by row"
+                )
+
             for _, row in df.iterrows():
                 try:
                     async with con.transaction():
@@ -84,3 +155,32 @@ class TradeAnalysis:
             """
 
         return await fetch_as_dataframe(q, env, start_date)
+
+
+async def _bulk_insert(
+    con: Connection,
+    table: str,
+    columns: List[str],
+    unique_key: str,
+    records: List[Tuple],
+) -> None:
+    """COPY records to a staging table, and insert them w/ a single
+    statement. Rows that already exist (by unique_key) are skipped"""
+    async with con.transaction():
+        await con.execute(
+            f"""
+                CREATE TEMPORARY TABLE {table}_staging
+                (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP
+            """
+        )
+        await con.copy_records_to_table(
+            f"{table}_staging", records=records, columns=columns
+        )
+        await con.execute(
+            f"""
+                INSERT INTO {table} ({", ".join(columns)})
+                SELECT {", ".join(columns)}
+                FROM {table}_staging
+                ON CONFLICT {unique_key} DO NOTHING
+            """
+        )
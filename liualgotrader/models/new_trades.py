@@ -5,7 +5,7 @@ from typing import Dict, List, Tuple
 
 from asyncpg.pool import Pool
 
-from liualgotrader.common import config
+from liualgotrader.common import config, trade_journal
 from liualgotrader.common.tlog import tlog
 
 
@@ -36,6 +36,22 @@ class NewTrade:
         self.operation = operation
         self.trade_id = None
 
+    def record(
+        self, client_buy_time: str, stop_price=None, target_price=None
+    ) -> Tuple:
+        """new_trades row, values ordered as `trade_journal.COLUMNS`"""
+        return (
+            self.algo_run_id,
+            self.symbol,
+            self.operation,
+            self.qty,
+            self.price,
+            json.dumps(self.indicators if self.indicators else {}),
+            client_buy_time,
+            stop_price,
+            target_price,
+        )
+
     async def save(
         self,
         pool: Pool,
@@ -43,6 +59,13 @@ class NewTrade:
         stop_price=None,
         target_price=None,
     ):
+        if trade_journal.journal:
+            # written in the background, w/o a trade_id
+            trade_journal.journal.add(
+                self.record(client_buy_time, stop_price, target_price)
+            )
+            return
+
         async with pool.acquire() as con:
             async with con.transaction():
                 self.trade_id = await con.fetchval(
@@ -51,15 +74,7 @@ class NewTrade:
                         VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
                         RETURNING trade_id
                     """,
-                    self.algo_run_id,
-                    self.symbol,
-                    self.operation,
-                    self.qty,
-                    self.price,
-                    json.dumps(self.indicators if self.indicators else {}),
-                    client_buy_time,
-                    stop_price,
-                    target_price,
+                    *self.record(client_buy_time, stop_price, target_price),
                 )
 
     @classmethod
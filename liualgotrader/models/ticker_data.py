@@ -1,10 +1,12 @@
 import json
+import math
 from dataclasses import dataclass
 from datetime import date, datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 from asyncpg.exceptions import TooManyConnectionsError
 from asyncpg.pool import Pool
+from pandas import DataFrame as df
 
 from liualgotrader.common import config
 from liualgotrader.common.tlog import tlog
@@ -109,6 +111,46 @@ class StockOhlc:
                 )
                 return val > 0
 
+    @classmethod
+    async def get_existing(
+        cls, symbols: List[str], days: List[date], pool: Pool = None
+    ) -> Set[Tuple[str, date]]:
+        """(symbol, day) pairs of `symbols` and `days` in stock_ohlc"""
+        if not pool:
+            pool = config.db_conn_pool
+
+        async with pool.acquire() as con:
+            rows = await con.fetch(
+                """
+                    SELECT symbol, symbol_date
+                    FROM stock_ohlc
+                    WHERE symbol = ANY($1::text[]) AND
+                        symbol_date = ANY($2::date[])
+                """,
+                symbols,
+                days,
+            )
+            return {(row[0], row[1]) for row in rows}
+
+    @classmethod
+    async def get_latest_dates(
+        cls, symbols: List[str], pool: Pool = None
+    ) -> Dict[str, date]:
+        if not pool:
+            pool = config.db_conn_pool
+
+        async with pool.acquire() as con:
+            rows = await con.fetch(
+                """
+                    SELECT symbol, MAX(symbol_date)
+                    FROM stock_ohlc
+                    WHERE symbol = ANY($1::text[])
+                    GROUP BY symbol
+                """,
+                symbols,
+            )
+            return {row[0]: row[1] for row in rows}
+
     @classmethod
     async def get_latest_date(cls, symbol: str, pool: Pool = None) -> date:
         if not pool:
@@ -162,6 +204,120 @@ class StockOhlc:
 
                 return rc
 
+    @classmethod
+    def from_dataframe(
+        cls, symbol: str, bars: df, indicators: df = None
+    ) -> List["StockOhlc"]:
+        """Daily bars of a symbol, w/ optional indicator columns per day
+        (NaN values are stored as null)"""
+        columns = (
+            [
+                [None if math.isnan(v) else v for v in indicators[c].tolist()]
+                for c in indicators.columns
+            ]
+            if indicators is not None
+            else []
+        )
+        names = list(indicators.columns) if indicators is not None else []
+        return [
+            StockOhlc(
+                symbol=symbol,
+                symbol_date=symbol_date,
+                open=_open,
+                high=high,
+                low=low,
+                close=close,
+                volume=int(volume),
+                indicators=dict(zip(names, values)),
+            )
+            for symbol_date, _open, high, low, close, volume, *values in zip(
+                bars.index.date,
+                bars["open"].tolist(),
+                bars["high"].tolist(),
+                bars["low"].tolist(),
+                bars["close"].tolist(),
+                bars["volume"].tolist(),
+                *columns,
+            )
+        ]
+
+    @classmethod
+    async def save_batch(
+        cls,
+        bars: Iterable["StockOhlc"],
+        pool: Pool = None,
+        overwrite: bool = True,
+    ) -> int:
+        """Upsert daily bars in bulk: COPY to a staging table, and merge
+        w/ a single INSERT .. ON CONFLICT (the last of duplicate bars wins).
+        W/o `overwrite`, bars already saved are kept as they are.
+        Returns number of bars saved"""
+        records = [
+            (
+                bar.symbol,
+                bar.symbol_date,
+                bar.open,
+                bar.high,
+                bar.low,
+                bar.close,
+                bar.volume,
+                json.dumps(bar.indicators),
+            )
+            for bar in bars
+        ]
+        if not records:
+            return 0
+
+        if not pool:
+            pool = config.db_conn_pool
+
+        async with pool.acquire() as con:
+            async with con.transaction():
+                await con.execute(
+                    """
+                        CREATE TEMPORARY TABLE stock_ohlc_staging (
+                            seq serial, symbol text, symbol_date date, open float, high float,
+                            low float, close float, volume int, indicators JSONB
+                        ) ON COMMIT DROP
+                    """
+                )
+                await con.copy_records_to_table(
+                    "stock_ohlc_staging",
+                    records=records,
+                    columns=[
+                        "symbol",
+                        "symbol_date",
+                        "open",
+                        "high",
+                        "low",
+                        "close",
+                        "volume",
+                        "indicators",
+                    ],
+                )
+                await con.execute(
+                    """
+                        INSERT INTO stock_ohlc (symbol, symbol_date, open, high, low, close, volume, indicators)
+                        SELECT DISTINCT ON (symbol, symbol_date)
+                            symbol, symbol_date, open, high, low, close, volume, indicators
+                        FROM stock_ohlc_staging
+                        ORDER BY symbol, symbol_date, seq DESC
+                        ON CONFLICT (symbol, symbol_date)
+                    """
+                    + (
+                        """
+                        DO UPDATE
+                            SET open=EXCLUDED.open, high=EXCLUDED.high, low=EXCLUDED.low,
+                                close=EXCLUDED.close, volume=EXCLUDED.volume,
+                                indicators=EXCLUDED.indicators, modify_tstamp='now()'
+                        """
+                        if overwrite
+                        else "DO NOTHING"
+                    )
+                )
+
+        return len(records)
+
     async def save(
         self,
         pool: Pool = None,
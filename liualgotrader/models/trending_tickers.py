@@ -1,4 +1,4 @@
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from asyncpg.pool import Pool
 
@@ -11,41 +11,76 @@ class TrendingTickers:
         self.trending_id: int = 0
 
     async def save(self, symbols: List[str], pool: Pool = None) -> int:
+        trending_ids = await TrendingTickers.save_batch(
+            [(self.batch_id, symbol, None) for symbol in symbols], pool
+        )
+        if trending_ids:
+            self.trending_id = trending_ids[-1]
+
+        return self.trending_id
+
+    @classmethod
+    async def save_batch(
+        cls,
+        rows: List[Tuple[str, str, Optional[datetime]]],
+        pool: Pool = None,
+    ) -> List[int]:
+        """Insert (batch_id, symbol, timestamp) rows w/ a single statement,
+        return their trending_ids in order. A None timestamp is the
+        current time"""
+        if not rows:
+            return []
+
         if not pool:
             pool = config.db_conn_pool
 
+        batch_ids, symbols, timestamps = zip(*rows)
         async with pool.acquire() as con:
-            async with con.transaction():
-                for symbol in symbols:
-                    self.trending_id = await con.fetchval(
-                        """
-                            INSERT INTO trending_tickers (batch_id, symbol)
-                            VALUES ($1, $2)
-                            RETURNING trending_id
-                        """,
-                        self.batch_id,
-                        symbol,
-                    )
+            records = await con.fetch(
+                """
+                    INSERT INTO trending_tickers (batch_id, symbol, create_tstamp)
+                    SELECT r.batch_id, r.symbol, COALESCE(r.tstamp, current_timestamp)
+                    FROM unnest($1::text[], $2::text[], $3::timestamp[])
+                        WITH ORDINALITY AS r(batch_id, symbol, tstamp, n)
+                    ORDER BY r.n
+                    RETURNING trending_id
+                """,
+                batch_ids,
+                symbols,
+                timestamps,
+            )
 
-        return self.trending_id
+        return sorted(record[0] for record in records)
 
     @classmethod
     async def load(cls, batch_id, pool: Pool = None) -> List[Tuple[str, datetime]]:
+        rows = (await cls.load_batches([batch_id], pool)).get(batch_id)
+        if rows:
+            return rows
+        else:
+            raise Exception("no data")
+
+    @classmethod
+    async def load_batches(
+        cls, batch_ids: List[str], pool: Pool = None
+    ) -> Dict[str, List[Tuple[str, datetime]]]:
+        """symbols & timestamps of many batches in a single query"""
         if not pool:
             pool = config.db_conn_pool
 
         async with pool.acquire() as con:
-            async with con.transaction():
-                rows = await con.fetch(
-                    """
-                        SELECT symbol, create_tstamp
-                        FROM trending_tickers 
-                        WHERE batch_id=$1
-                    """,
-                    batch_id,
-                )
-
-                if rows:
-                    return [(row[0], row[1]) for row in rows]
-                else:
-                    raise Exception("no data")
+            rows = await con.fetch(
+                """
+                    SELECT batch_id, symbol, create_tstamp
+                    FROM trending_tickers
+                    WHERE batch_id = ANY($1::text[])
+                    ORDER BY trending_id
+                """,
+                batch_ids,
+            )
+
+        rc: Dict[str, List[Tuple[str, datetime]]] = {}
+        for row in rows:
+            rc.setdefault(row[0], []).append((row[1], row[2]))
+
+        return rc
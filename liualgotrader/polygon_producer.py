@@ -4,12 +4,11 @@ Get Market data from Polygon and pump to consumers
 import asyncio
 import json
 import os
-import random
 import sys
 import traceback
 from datetime import datetime, timedelta
 from multiprocessing import Queue
-from queue import Empty, Full
+from queue import Empty
 from typing import Dict, List
 
 import alpaca_trade_api as tradeapi
@@ -17,15 +16,19 @@ from alpaca_trade_api.stream2 import StreamConn, polygon
 from pytz import timezone
 from pytz.tzinfo import DstTzInfo
 
-from liualgotrader.common import config
+from liualgotrader.common import config, tracing
 from liualgotrader.common.database import create_db_connection
+from liualgotrader.common.queue_reader import AsyncQueueReader
+from liualgotrader.common.sharding import SymbolSharder
 from liualgotrader.common.tlog import tlog
+from liualgotrader.common.transport import Transport, get_transport
 from liualgotrader.models.trending_tickers import TrendingTickers
 
 last_msg_tstamp: datetime = datetime.now()
 symbols: List[str]
 data_channels: List = []
 queue_id_hash: Dict[str, int]
+sharder: SymbolSharder
 symbol_strategy: Dict = {}
 
 
@@ -40,9 +43,13 @@ async def scanner_input(
     global symbol_strategy
     global symbols
 
+    reader = AsyncQueueReader(scanner_queue, maxsize=16)
+    reader.start()
     while True:
         try:
-            symbols_details = scanner_queue.get(timeout=1)
+            symbols_details = (
+                await reader.get_batch(max_items=1, timeout=30)
+            )[0]
             if symbols_details:
                 symbols_details = json.loads(symbols_details)
                 new_symbols: List = []
@@ -57,12 +64,12 @@ async def scanner_input(
                             f"{OP}.{symbol_details['symbol']}"
                             for OP in config.WS_DATA_CHANNELS
                         ]
-                        consumer_queue_index = random.SystemRandom().randint(
-                            0, num_consumer_processes - 1
-                        )
-                        queue_id_hash[
+                        consumer_queue_index = sharder.assign(
                             symbol_details["symbol"]
-                        ] = consumer_queue_index
+                        )
+                        tlog(
+                            f"{symbol_details['symbol']} assigned to consumer {consumer_queue_index}"
+                        )
 
                 if len(new_symbols):
                     symbols += new_symbols
@@ -89,7 +96,7 @@ async def scanner_input(
                     await asyncio.sleep(1)
 
         except Empty:
-            await asyncio.sleep(30)
+            continue
         except asyncio.CancelledError:
             tlog("scanner_input() task task cancelled ")
             break
@@ -104,12 +111,13 @@ async def scanner_input(
             traceback.print_exception(*exc_info)
             del exc_info
 
+    await reader.stop()
     tlog("scanner_input() task completed")
 
 
 async def trade_run(
     ws: StreamConn,
-    queues: List[Queue],
+    transport: Transport,
 ) -> None:
 
     tlog("trade_run() starting using Alpaca trading  ")
@@ -120,10 +128,10 @@ async def trade_run(
         try:
             # tlog(f"producer TRADE UPDATE event: {data.__dict__}")
             symbol = data.__dict__["_raw"]["order"]["symbol"]
-            if qid := queue_id_hash.get(symbol, None):
+            if (qid := queue_id_hash.get(symbol, None)) is not None:
                 data.__dict__["_raw"]["EV"] = "trade_update"
                 data.__dict__["_raw"]["symbol"] = symbol
-                queues[qid].put(json.dumps(data.__dict__["_raw"]))
+                transport.send(qid, data.__dict__["_raw"], urgent=True)
 
         except Exception as e:
             tlog(
@@ -137,7 +145,7 @@ async def trade_run(
 
 async def run(
     data_ws: StreamConn,
-    queues: List[Queue],
+    transport: Transport,
 ) -> None:
     global data_channels
     global queue_id_hash
@@ -159,20 +167,13 @@ async def run(
             elif (event_symbol := data.__dict__["_raw"]["symbol"]) in queue_id_hash:  # type: ignore
                 data.__dict__["_raw"]["EV"] = "T"
                 queue_id = queue_id_hash[event_symbol]
-                queues[queue_id].put(
-                    json.dumps(data.__dict__["_raw"]), timeout=1
-                )
-        except Full as f:
-            tlog(
-                f"[EXCEPTION] handle_trade_event():queue {queue_id} is FULL:{f}, sleep for 2 seconds and re-try."
-            )
-            await asyncio.sleep(2)
-            await handle_trade_event(conn, channel, data)
+                sharder.record(event_symbol)
+                transport.send(queue_id, data.__dict__["_raw"])
         except Exception as e:
             tlog(
                 f"Exception in handle_trade_event(): exception of type {type(e).__name__} with args {e.args}"
             )
-            print(queue_id, len(queues))
+            print(queue_id, len(transport.queues))
             traceback.print_exc()
 
     @data_ws.on(r"Q$")
@@ -187,22 +188,14 @@ async def run(
             elif (event_symbol := data.__dict__["_raw"]["symbol"]) in queue_id_hash:  # type: ignore
                 data.__dict__["_raw"]["EV"] = "Q"
                 queue_id = queue_id_hash[event_symbol]
-                queues[queue_id].put(
-                    json.dumps(data.__dict__["_raw"]), timeout=1
-                )
-
-        except Full as f:
-            tlog(
-                f"[EXCEPTION] handle_quote_event():queue {queue_id} is FULL:{f}, sleeping for 2 seconds and re-trying."
-            )
-            await asyncio.sleep(2)
-            await handle_quote_event(conn, channel, data)
+                sharder.record(event_symbol)
+                transport.send(queue_id, data.__dict__["_raw"])
 
         except Exception as e:
             tlog(
                 f"Exception in handle_quote_event(): exception of type {type(e).__name__} with args {e.args}"
             )
-            print(queue_id, len(queues))
+            print(queue_id, len(transport.queues))
             traceback.print_exc()
 
     @data_ws.on(r"A$")
@@ -226,20 +219,13 @@ async def run(
                         event_symbol
                     ]
                 queue_id = queue_id_hash[event_symbol]
-                queues[queue_id].put(
-                    json.dumps(data.__dict__["_raw"]), timeout=1
-                )
-        except Full as f:
-            tlog(
-                f"[EXCEPTION] handle_second_bar(): queue {queue_id} is FULL:{f}, sleeping for 2 seconds and re-trying."
-            )
-            await asyncio.sleep(2)
-            await handle_second_bar(conn, channel, data)
+                sharder.record(event_symbol)
+                transport.send(queue_id, data.__dict__["_raw"])
         except Exception as e:
             tlog(
                 f"Exception in handle_second_bar(): exception of type {type(e).__name__} with args {e.args}"
             )
-            print(queue_id, len(queues))
+            print(queue_id, len(transport.queues))
             traceback.print_exc()
 
     @data_ws.on(r"AM$")
@@ -260,16 +246,8 @@ async def run(
                         event_symbol
                     ]
                 queue_id = queue_id_hash[event_symbol]
-                queues[queue_id].put(
-                    json.dumps(data.__dict__["_raw"]), timeout=1
-                )
-
-        except Full as f:
-            tlog(
-                f"[EXCEPTION] handle_minute_bar(): queue {queue_id} is FULL:{f}, sleeping for 2 seconds and re-trying."
-            )
-            await asyncio.sleep(2)
-            await handle_minute_bar(conn, channel, data)
+                sharder.record(event_symbol)
+                transport.send(queue_id, data.__dict__["_raw"])
 
         except Exception as e:
             tlog(
@@ -310,11 +288,42 @@ async def run(
         )
         traceback.print_exc()
     finally:
-        for q in queues:
-            q.close()
+        transport.close()
         tlog("" "main Polygon producer task completed ")
 
 
+async def rebalance_task(transport: Transport) -> None:
+    """Periodically move symbols from loaded consumers to idle ones.
+
+    The receiving consumer is notified first so it holds the symbol's
+    events until the current consumer hands over the symbol's state.
+    """
+    tlog(
+        f"rebalance_task() starting w/ {config.shard_rebalance_interval} seconds interval"
+    )
+    try:
+        while True:
+            await asyncio.sleep(config.shard_rebalance_interval)
+            sharder.update()
+            tlog(f"consumer loads (msgs/sec) {sharder.loads()}")
+            for symbol, source, target in sharder.rebalance(
+                config.shard_rebalance_tolerance
+            ):
+                tlog(f"moving {symbol} from consumer {source} to {target}")
+                transport.send(
+                    target,
+                    {"EV": "migrate_in", "symbol": symbol, "from": source},
+                    urgent=True,
+                )
+                transport.send(
+                    source,
+                    {"EV": "migrate_out", "symbol": symbol, "to": target},
+                    urgent=True,
+                )
+    except asyncio.CancelledError:
+        tlog("rebalance_task() cancelled")
+
+
 async def teardown_task(
     tz: DstTzInfo, ws: List[StreamConn], tasks: List[asyncio.Task]
 ) -> None:
@@ -382,6 +391,13 @@ async def producer_async_main(
 ):
     await create_db_connection(str(config.dsn))
 
+    transport = get_transport(queues)
+    tlog(f"producer_async_main(): using {transport.name} transport")
+    transport_task = asyncio.create_task(
+        transport.run(),
+        name="transport_task",
+    )
+
     data_ws = tradeapi.StreamConn(
         base_url=config.prod_base_url,
         key_id=config.prod_api_key_id,
@@ -392,7 +408,7 @@ async def producer_async_main(
     main_task = asyncio.create_task(
         run(
             data_ws=data_ws,
-            queues=queues,
+            transport=transport,
         ),
         name="main_task",
     )
@@ -417,7 +433,7 @@ async def producer_async_main(
     )
 
     trade_updates_task = asyncio.create_task(
-        trade_run(ws=trade_ws, queues=queues),
+        trade_run(ws=trade_ws, transport=transport),
         name="trade_updates_task",
     )
 
@@ -425,18 +441,28 @@ async def producer_async_main(
         scanner_input(scanner_queue, data_ws, num_consumer_processes),
         name="scanner_input",
     )
+    tasks = [main_task, scanner_input_task, transport_task]
+    if tracer := tracing.start_tracing("producer"):
+        tasks.append(asyncio.create_task(tracer.run(), name="trace_task"))
+    if config.shard_rebalance_interval > 0 and len(queues) > 1:
+        tasks.insert(
+            0,
+            asyncio.create_task(
+                rebalance_task(transport),
+                name="rebalance_task",
+            ),
+        )
     tear_down = asyncio.create_task(
         teardown_task(
             timezone("America/New_York"),
             [data_ws, trade_ws],
-            [main_task, scanner_input_task],
+            tasks,
         )
     )
 
     await asyncio.gather(
-        main_task,
+        *tasks,
         trade_updates_task,
-        scanner_input_task,
         tear_down,
         return_exceptions=True,
     )
@@ -448,7 +474,7 @@ def polygon_producer_main(
     unique_id: str,
     queues: List[Queue],
     current_symbols: List[str],
-    current_queue_id_hash: Dict[str, int],
+    current_sharder: SymbolSharder,
     market_close: datetime,
     conf_dict: Dict,
     scanner_queue: Queue,
@@ -479,9 +505,11 @@ def polygon_producer_main(
         )
         global symbols
         global queue_id_hash
+        global sharder
 
         symbols = current_symbols
-        queue_id_hash = current_queue_id_hash
+        sharder = current_sharder
+        queue_id_hash = sharder.assignments
         if not asyncio.get_event_loop().is_closed():
             asyncio.get_event_loop().close()
         asyncio.run(
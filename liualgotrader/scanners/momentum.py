@@ -188,49 +188,64 @@ class Momentum(Scanner):
         tlog(f"loaded {len(symbols)} from Finnhub")
         return symbols
 
-    async def add_stock_data_for_date(self, symbol: str, when: date) -> None:
-        _minute_data = get_historical_daily_from_polygon_by_range(
-            self.data_api, [symbol], when, when + timedelta(days=1)
+    async def add_stock_data(
+        self, symbols: List[str], days: List[date]
+    ) -> None:
+        """Load daily bars of `symbols` missing from the database
+        concurrently, and save in bulk. Days w/o a bar, of symbols loaded
+        successfully, are saved as empty bars (so not loaded again)"""
+        existing = await StockOhlc.get_existing(symbols, days)
+        missing = {
+            symbol: [day for day in days if (symbol, day) not in existing]
+            for symbol in symbols
+        }
+        missing = {symbol: d for symbol, d in missing.items() if d}
+        if not missing:
+            return
+
+        _minute_data = await asyncio.get_event_loop().run_in_executor(
+            None,
+            get_historical_daily_from_polygon_by_range,
+            self.data_api,
+            list(missing),
+            min(min(d) for d in missing.values()),
+            max(max(d) for d in missing.values()) + timedelta(days=1),
         )
 
-        await asyncio.sleep(0)
-        if _minute_data[symbol].empty:
-            daily_bar = StockOhlc(
-                symbol=symbol,
-                symbol_date=when,
-                open=0.0,
-                high=0.0,
-                low=0.0,
-                close=0.0,
-                volume=0,
-                indicators={},
+        daily_bars: List[StockOhlc] = []
+        empty_bars: List[StockOhlc] = []
+        for symbol, symbol_days in missing.items():
+            # failed loads are left missing, to be re-tried
+            if symbol not in _minute_data:
+                continue
+
+            daily_bars += StockOhlc.from_dataframe(
+                symbol, _minute_data[symbol]
             )
-            await daily_bar.save()
-        else:
-            for index, row in _minute_data[symbol].iterrows():
-                daily_bar = StockOhlc(
+            loaded = set(_minute_data[symbol].index.date)
+            empty_bars += [
+                StockOhlc(
                     symbol=symbol,
-                    symbol_date=index,
-                    open=row["open"],
-                    high=row["high"],
-                    low=row["low"],
-                    close=row["close"],
-                    volume=int(row["volume"]),
+                    symbol_date=day,
+                    open=0.0,
+                    high=0.0,
+                    low=0.0,
+                    close=0.0,
+                    volume=0,
                     indicators={},
                 )
-                await daily_bar.save()
-                print(f"saved data for {symbol} @ {index}")
-
-    async def fetch_symbol_details(
-        self, symbol: str, back_time: datetime, session: requests.Session = None
-    ):
-        if not await StockOhlc.check_stock_date_exists(symbol, back_time):
-            await self.add_stock_data_for_date(symbol, back_time)
+                for day in symbol_days
+                if day not in loaded
+            ]
+
+        saved = await StockOhlc.save_batch(daily_bars)
+        saved += await StockOhlc.save_batch(empty_bars, overwrite=False)
+        tlog(
+            f"saved {saved} daily bars for {len(_minute_data)}/{len(missing)} symbols"
+        )
 
-        if not await StockOhlc.check_stock_date_exists(
-            symbol, back_time - timedelta(days=1)
-        ):
-            await self.add_stock_data_for_date(symbol, back_time - timedelta(days=1))
+    async def add_stock_data_for_date(self, symbol: str, when: date) -> None:
+        await self.add_stock_data([symbol], [when])
 
     async def load_from_db(self, back_time: date) -> List[str]:
         pool = config.db_conn_pool
@@ -287,13 +302,14 @@ class Momentum(Scanner):
                 tlog(
                     f"{self.name} scanner => loading {len(trade_able_symbols)} symbols from Polygon and building cache. this may take a while."
                 )
-                tasks = [
-                    asyncio.get_event_loop().create_task(
-                        self.fetch_symbol_details(symbol, back_time, None)
-                    )
-                    for symbol in trade_able_symbols
-                ]
-                await asyncio.gather(*tasks)
+                day = (
+                    back_time.date()
+                    if isinstance(back_time, datetime)
+                    else back_time
+                )
+                await self.add_stock_data(
+                    trade_able_symbols, [day - timedelta(days=1), day]
+                )
 
                 rows = await self.load_from_db(back_time)
 
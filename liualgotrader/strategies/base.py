@@ -2,13 +2,16 @@
 import importlib
 from datetime import datetime
 from enum import Enum
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import alpaca_trade_api as tradeapi
+import numpy as np
 from pandas import DataFrame as df
 
 from liualgotrader.common import config
+from liualgotrader.common.bar_store import BarStore
 from liualgotrader.common.tlog import tlog
+from liualgotrader.fincalcs.incremental import IndicatorSet
 from liualgotrader.models.algo_run import AlgoRun
 
 
@@ -85,6 +88,47 @@ class Strategy:
             else False
         )
 
+    def incremental_indicators(self) -> IndicatorSet:
+        """Override to declare streaming indicators, see
+        `liualgotrader.fincalcs.incremental`. Called once per symbol."""
+        return IndicatorSet({})
+
+    def indicators(self, symbol: str, size: int = None) -> IndicatorSet:
+        """Streaming indicators of `symbol`, attached to its minute history
+        and brought up to date with its first `size` bars (all by default,
+        pass `len(minute_history)` so back-testing does not peek ahead)"""
+        # trading_data imports this module, import market_data lazily
+        from liualgotrader.common import market_data
+
+        bars = market_data.minute_history[symbol]
+        indicators = bars.indicators.get(self.name)
+        if indicators is None:
+            indicators = self.incremental_indicators()
+            bars.indicators[self.name] = indicators
+        indicators.sync(bars, size)
+        return indicators
+
+    def vectorized_indicators(self, bars: BarStore) -> Dict[str, np.ndarray]:
+        """Override to compute indicators over all of a symbol's bars at
+        once when back-testing, as arrays aligned w/ the bars' rows. The
+        value of a row may only depend on the bars up to it. Called once
+        per symbol, before the replay."""
+        return {}
+
+    def signals(
+        self, symbol: str, size: int
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """The `vectorized_indicators()` of `symbol` up to (and including)
+        its `size`-th bar, pass `len(minute_history)`. None when not
+        back-testing, or if the strategy has none"""
+        from liualgotrader.common import market_data
+
+        bars = market_data.minute_history.get(symbol)
+        signals = bars.signals.get(self.name) if bars is not None else None
+        if not signals:
+            return None
+        return {name: values[:size] for name, values in signals.items()}
+
     async def buy_callback(self, symbol: str, price: float, qty: int) -> None:
         pass
 
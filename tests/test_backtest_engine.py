@@ -0,0 +1,130 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from liualgotrader.backtest_engine import BacktestEngine
+from liualgotrader.common import config, market_data, trading_data
+from liualgotrader.common.bar_store import BarStore
+from liualgotrader.models.new_trades import NewTrade
+from liualgotrader.strategies.base import Strategy, StrategyType
+
+start = pd.Timestamp("2021-01-04 09:30", tz="America/New_York")
+
+
+class RecordingStrategy:
+    name = "recording"
+    type = StrategyType.DAY_TRADE
+    algo_run = SimpleNamespace(run_id=1)
+    vectorized_indicators = Strategy.vectorized_indicators
+    signals = Strategy.signals
+
+    def __init__(self):
+        self.calls: list = []
+
+    async def run(
+        self, symbol, shortable, position, history, now, *args, **kwargs
+    ):
+        self.calls.append((symbol, now, len(history), position))
+        if symbol == "A" and not position:
+            trading_data.buy_indicators[symbol] = {}
+            trading_data.stop_prices[symbol] = 0.0
+            trading_data.target_prices[symbol] = 0.0
+            return True, {"side": "buy", "qty": "10"}
+        return False, {}
+
+    async def buy_callback(self, symbol, price, qty):
+        pass
+
+
+def bars_at(minutes) -> BarStore:
+    bars = BarStore()
+    for minute in minutes:
+        bars.append(
+            start + pd.Timedelta(minutes=minute), [float(minute + 1)] * 7
+        )
+    return bars
+
+
+@pytest.mark.asyncio
+async def test_engine_replays_symbols_in_time_order(monkeypatch):
+    saved = []
+
+    async def save(self, pool, client_time, *args):
+        saved.append((self.symbol, self.operation, self.qty, client_time))
+
+    monkeypatch.setattr(NewTrade, "save", save)
+    monkeypatch.setattr(config, "db_conn_pool", None, raising=False)
+    monkeypatch.setattr(trading_data, "positions", {})
+    monkeypatch.setattr(trading_data, "last_used_strategy", {})
+    strategy = RecordingStrategy()
+    monkeypatch.setattr(trading_data, "strategies", [strategy])
+
+    engine = BacktestEngine(100000.0, start + pd.Timedelta(minutes=4))
+    engine.add_symbol("A", bars_at([-1, 0, 2, 3, 4]), start)
+    engine.add_symbol("B", bars_at([1, 2]), start)
+
+    await engine.run(until=start + pd.Timedelta(minutes=1))
+    assert [(s, size) for s, _, size, _ in strategy.calls] == [  # nosec
+        ("A", 2),
+        ("B", 1),
+    ]
+
+    messages = await engine.run()
+    assert not messages  # nosec
+    assert [  # nosec
+        (s, int((now - start).total_seconds() // 60), position)
+        for s, now, _, position in strategy.calls
+    ] == [
+        ("A", 0, 0),
+        ("B", 1, 0),
+        ("A", 2, 10),
+        ("B", 2, 0),
+        ("A", 3, 10),
+    ]
+
+    await engine.liquidate()
+    assert [trade[:3] for trade in saved] == [  # nosec
+        ("A", "buy", 10),
+        ("A", "sell", 10),
+    ]
+    assert trading_data.positions["A"] == 0  # nosec
+
+
+class VectorizedStrategy(RecordingStrategy):
+    name = "vectorized"
+
+    def vectorized_indicators(self, bars):
+        return {"total": bars.column("close").cumsum()}
+
+    async def run(
+        self, symbol, shortable, position, history, now, *args, **kwargs
+    ):
+        self.calls.append(self.signals(symbol, len(history))["total"].copy())
+        return False, {}
+
+
+@pytest.mark.asyncio
+async def test_engine_exposes_vectorized_indicators(monkeypatch):
+    strategy = VectorizedStrategy()
+    monkeypatch.setattr(trading_data, "positions", {})
+    monkeypatch.setattr(trading_data, "strategies", [strategy])
+    bars = bars_at([-1, 0, 1, 2])
+    monkeypatch.setattr(market_data, "minute_history", {"A": bars})
+
+    engine = BacktestEngine(100000.0, start + pd.Timedelta(minutes=3))
+    engine.add_symbol("A", bars, start)
+    assert strategy.signals("A", len(bars))["total"].tolist() == [  # nosec
+        0.0,
+        1.0,
+        3.0,
+        6.0,
+    ]
+
+    await engine.run()
+    assert [total.tolist() for total in strategy.calls] == [  # nosec
+        [0.0, 1.0],
+        [0.0, 1.0, 3.0],
+        [0.0, 1.0, 3.0, 6.0],
+    ]
+    assert RecordingStrategy().signals("A", len(bars)) is None  # nosec
@@ -0,0 +1,114 @@
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pandas as pd
+from alpaca_trade_api.polygon.entity import Aggsv2
+
+from liualgotrader.common import bar_cache
+from liualgotrader.common.bar_cache import (BarCache, merge_intervals,
+                                            subtract_intervals)
+
+
+class FakePolygon:
+    """Five 1-min bars a week day, recording the requested ranges"""
+
+    def __init__(self):
+        self.requests = []
+
+    def historic_agg_v2(self, symbol, multiplier, timespan, _from, to, **kw):
+        self.requests.append(
+            (date.fromisoformat(_from), date.fromisoformat(to))
+        )
+        results = []
+        for day in pd.date_range(_from, to):
+            if day.weekday() >= 5:
+                continue
+            for minute in range(5):
+                t = day.tz_localize("America/New_York") + pd.Timedelta(
+                    hours=9, minutes=30 + minute
+                )
+                price = 100.0 + day.day + minute
+                results.append(
+                    dict(
+                        o=price,
+                        h=price + 1,
+                        l=price - 1,
+                        c=price,
+                        v=1000 + minute,
+                        vw=price,
+                        t=t.value // 1_000_000,
+                    )
+                )
+        return Aggsv2({"results": results})
+
+
+def test_intervals():
+    d = lambda day: date(2021, 1, day)  # noqa: E731
+    assert merge_intervals(  # nosec
+        [(d(5), d(6)), (d(1), d(2)), (d(3), d(3)), (d(10), d(12))]
+    ) == [(d(1), d(3)), (d(5), d(6)), (d(10), d(12))]
+    assert subtract_intervals(  # nosec
+        (d(1), d(20)), [(d(3), d(4)), (d(10), d(25))]
+    ) == [(d(1), d(2)), (d(5), d(9))]
+    assert subtract_intervals((d(5), d(6)), [(d(1), d(10))]) == []  # nosec
+
+
+def test_cached_days(tmp_path):
+    polygon = FakePolygon()
+    api = SimpleNamespace(polygon=polygon)
+    cache = BarCache(str(tmp_path))
+
+    first = cache.get(api, "AAPL", "minute", "2021-01-25", "2021-02-05")
+    assert len(first) == 10 * 5  # nosec
+    assert polygon.requests == [(date(2021, 1, 25), date(2021, 2, 5))]  # nosec
+
+    # served from disk
+    again = cache.get(api, "AAPL", "minute", "2021-01-25", "2021-02-05")
+    assert len(polygon.requests) == 1  # nosec
+    pd.testing.assert_frame_equal(first, again)
+
+    # only the missing days are requested
+    wider = cache.get(
+        api, "AAPL", "minute", "2021-01-20", "2021-02-10 09:35:00-05:00"
+    )
+    assert polygon.requests[1:] == [  # nosec
+        (date(2021, 1, 20), date(2021, 1, 24)),
+        (date(2021, 2, 6), date(2021, 2, 10)),
+    ]
+    assert len(wider) == 16 * 5  # nosec
+    assert wider.index.is_monotonic_increasing  # nosec
+    assert str(wider.index.tz) == "America/New_York"  # nosec
+    assert cache.coverage("AAPL", "minute") == [  # nosec
+        (date(2021, 1, 20), date(2021, 2, 10))
+    ]
+
+
+def test_today_not_cached(tmp_path):
+    polygon = FakePolygon()
+    api = SimpleNamespace(polygon=polygon)
+    cache = BarCache(str(tmp_path))
+    today = pd.Timestamp.now(tz="America/New_York").date()
+    start = today - timedelta(days=10)
+
+    for _ in range(2):
+        bars = cache.get(api, "AAPL", "minute", start, today)
+    assert polygon.requests[1:] == [(today, today)]  # nosec
+    expected = polygon.historic_agg_v2(
+        "AAPL", 1, "minute", str(start), str(today)
+    ).df
+    pd.testing.assert_frame_equal(bars, expected, check_dtype=False)
+
+
+def test_get_bars(tmp_path, monkeypatch):
+    polygon = FakePolygon()
+    api = SimpleNamespace(polygon=polygon)
+
+    monkeypatch.setattr(bar_cache.config, "bar_cache_dir", "")
+    bar_cache.get_bars(api, "AAPL", "minute", "2021-01-04", "2021-01-05")
+    bar_cache.get_bars(api, "AAPL", "minute", "2021-01-04", "2021-01-05")
+    assert len(polygon.requests) == 2  # nosec
+
+    monkeypatch.setattr(bar_cache.config, "bar_cache_dir", str(tmp_path))
+    bar_cache.get_bars(api, "AAPL", "minute", "2021-01-04", "2021-01-05")
+    bar_cache.get_bars(api, "AAPL", "minute", "2021-01-04", "2021-01-05")
+    assert len(polygon.requests) == 3  # nosec
@@ -0,0 +1,82 @@
+import pickle
+
+import hypothesis.strategies as st
+import numpy as np
+import pandas as pd
+from hypothesis import given, settings
+
+from liualgotrader.common.bar_store import BAR_COLUMNS, BarCursor, BarStore
+
+start = pd.Timestamp("2021-01-04 09:30", tz="America/New_York")
+
+
+@settings(deadline=None)
+@given(
+    st.lists(
+        st.tuples(
+            st.integers(min_value=0, max_value=100),
+            st.floats(min_value=1.0, max_value=100.0),
+        ),
+        max_size=60,
+    )
+)
+def test_upsert_matches_loc(updates):
+    bars = BarStore(capacity=4)
+    expected = pd.DataFrame(columns=BAR_COLUMNS, dtype="float64")
+    for minute, price in updates:
+        ts = start + pd.Timedelta(minutes=minute)
+        bars.upsert(ts, [price] * len(BAR_COLUMNS))
+        expected.loc[ts] = [price] * len(BAR_COLUMNS)
+
+    expected = expected.sort_index()
+    assert len(bars) == len(expected)  # nosec
+    assert (bars.values == expected.to_numpy()).all()  # nosec
+    assert list(bars.index) == list(expected.index)  # nosec
+
+
+def test_views_share_memory():
+    bars = BarStore()
+    for i in range(5):
+        bars.append(start + pd.Timedelta(minutes=i), [float(i)] * 7)
+
+    view = bars.df
+    assert np.shares_memory(view.to_numpy(), bars.values)  # nosec
+    bars.update([42.0] * 7)
+    assert view.close.iloc[-1] == 42.0  # nosec
+
+    assert len(bars.window(3)) == 3  # nosec
+    assert bars.get(start + pd.Timedelta(minutes=1))["open"] == 1.0  # nosec
+    assert bars.get(start + pd.Timedelta(minutes=10)) is None  # nosec
+    assert bars.nearest(start + pd.Timedelta(seconds=80)) == 1  # nosec
+    assert bars["close"].iloc[0] == 0.0  # nosec
+
+
+def test_from_dataframe_and_pickle():
+    index = pd.date_range(start, periods=10, freq="1min")
+    data = pd.DataFrame(
+        np.random.rand(10, len(BAR_COLUMNS)), index=index, columns=BAR_COLUMNS
+    )
+    bars = pickle.loads(pickle.dumps(BarStore.from_dataframe(data)))
+    pd.testing.assert_frame_equal(bars.df, data, check_freq=False)
+
+
+def test_cursor_hides_future_bars():
+    bars = BarStore()
+    for i in range(5):
+        bars.append(start + pd.Timedelta(minutes=i), [float(i)] * 7)
+
+    history = BarCursor(bars, 2)
+    assert len(history) == 2  # nosec
+    assert history.column("close").tolist() == [0.0, 1.0]  # nosec
+    view = history.df
+    assert history["close"].iloc[-1] == 1.0  # nosec
+    assert history.df is view  # nosec
+
+    history.advance()
+    assert history.df is not view  # nosec
+    assert history.close.iloc[-1] == 2.0  # nosec
+    assert history.index[-1] == start + pd.Timedelta(minutes=2)  # nosec
+    assert np.shares_memory(history.values, bars.values)  # nosec
+
+    history.seek(10)
+    assert len(history) == 5  # nosec
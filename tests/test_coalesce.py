@@ -0,0 +1,73 @@
+import hypothesis.strategies as st
+from hypothesis import given
+
+from liualgotrader.common.coalesce import coalesce
+
+prices = st.floats(min_value=1.0, max_value=100.0)
+
+
+@st.composite
+def second_bars(draw):
+    low = draw(prices)
+    high = low + draw(st.floats(min_value=0.0, max_value=10.0))
+    return {
+        "EV": "A",
+        "symbol": draw(st.sampled_from(["AAPL", "TSLA"])),
+        "open": low,
+        "high": high,
+        "low": low,
+        "close": high,
+        "volume": draw(st.integers(min_value=0, max_value=1000)),
+        "start": draw(st.integers(min_value=0, max_value=180)) * 1000,
+    }
+
+
+events = st.lists(
+    st.one_of(
+        second_bars(),
+        st.builds(
+            dict,
+            EV=st.just("trade_update"),
+            symbol=st.sampled_from(["AAPL", "TSLA"]),
+        ),
+    ),
+    max_size=50,
+)
+
+
+@given(events)
+def test_coalesce(backlog):
+    result = coalesce(backlog)
+
+    assert [e for e in result if e["EV"] != "A"] == [  # nosec
+        e for e in backlog if e["EV"] != "A"
+    ]
+
+    bars = [e for e in backlog if e["EV"] == "A"]
+    merged = [e for e in result if e["EV"] == "A"]
+    keys = {(e["symbol"], e["start"] // 60000) for e in bars}
+    assert len(merged) == len(keys)  # nosec
+
+    for bar in merged:
+        key = (bar["symbol"], bar["start"] // 60000)
+        group = [e for e in bars if (e["symbol"], e["start"] // 60000) == key]
+        assert bar["open"] == group[0]["open"]  # nosec
+        assert bar["close"] == group[-1]["close"]  # nosec
+        assert bar["high"] == max(e["high"] for e in group)  # nosec
+        assert bar["low"] == min(e["low"] for e in group)  # nosec
+        assert bar["volume"] == sum(e["volume"] for e in group)  # nosec
+
+
+def test_control_events_are_barriers():
+    bar = {
+        "EV": "A",
+        "symbol": "AAPL",
+        "open": 1.0,
+        "high": 1.0,
+        "low": 1.0,
+        "close": 1.0,
+        "volume": 1,
+        "start": 0,
+    }
+    backlog = [bar, {"EV": "migrate_out", "symbol": "AAPL", "to": 1}, bar]
+    assert coalesce(backlog) == backlog  # nosec
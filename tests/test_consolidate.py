@@ -3,8 +3,11 @@ from datetime import timedelta
 import pytest
 from hypothesis import example, given, settings
 from hypothesis.strategies import text
+from pandas import DataFrame, Timestamp
+from pandas.testing import assert_frame_equal
 
-from liualgotrader.analytics.consolidate import trades
+from liualgotrader.analytics.consolidate import (TradesConsolidator,
+                                                 consolidate, trades)
 
 
 @settings(deadline=None, max_examples=5)  # type: ignore
@@ -19,3 +22,54 @@ async def test_trades(batch_id: str) -> None:
 @pytest.mark.devtest
 async def test_trades_specific_batch() -> None:
     await trades("89177ae2-a459-4614-a2bc-474f1e0b7c89")
+
+
+def _trades_data() -> DataFrame:
+    return DataFrame(
+        {
+            "symbol": ["AAPL", "AAPL", "AAPL", "AAPL", "AAPL", "MSFT"],
+            "algo_run_id": [1, 1, 1, 1, 1, 1],
+            "operation": ["buy", "sell", "sell", "buy", "sell", "buy"],
+            "qty": [10, 5, 5, 4, 2, 1],
+            "price": [10.0, 12.0, 14.0, 20.0, 21.0, 100.0],
+            "stop_price": [9.0, None, None, None, None, 99.0],
+            "client_time": [
+                Timestamp("2021-01-04 10:00:00"),
+                Timestamp("2021-01-04 10:05:00"),
+                Timestamp("2021-01-04 10:10:00"),
+                Timestamp("2021-01-04 11:00:00"),
+                Timestamp("2021-01-04 11:05:00"),
+                Timestamp("2021-01-04 12:00:00"),
+            ],
+        }
+    )
+
+
+def test_consolidate() -> None:
+    gain_loss, trade_analysis = consolidate(_trades_data())
+
+    assert gain_loss.symbol.tolist() == ["AAPL", "MSFT"]  # nosec
+    assert gain_loss.gain_value.tolist() == [-8.0, -100.0]  # nosec
+    assert gain_loss.gain_percentage.tolist() == [-8.0, -100.0]  # nosec
+
+    assert trade_analysis.status.tolist() == ["close", "open", "open"]  # nosec
+    closed = trade_analysis.iloc[0]
+    assert closed.gain_value == 30.0  # nosec
+    assert closed.gain_percentage == 30.0  # nosec
+    assert closed.r_units == 4.0  # nosec
+    assert closed.start_time == Timestamp("2021-01-04 10:00:00")  # nosec
+    assert closed.end_time == Timestamp("2021-01-04 10:10:00")  # nosec
+    assert trade_analysis.iloc[1].qty == 2.0  # nosec
+
+
+def test_consolidate_chunks() -> None:
+    trades_data = _trades_data()
+    expected = consolidate(trades_data)
+
+    # the first AAPL trade opens in one chunk, and closes in the next
+    for split in range(1, len(trades_data)):
+        consolidator = TradesConsolidator()
+        consolidator.add(trades_data.iloc[:split])
+        consolidator.add(trades_data.iloc[split:])
+        for result, expected_result in zip(consolidator.results(), expected):
+            assert_frame_equal(result, expected_result)
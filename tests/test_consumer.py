@@ -0,0 +1,140 @@
+import asyncio
+from queue import Queue
+from types import SimpleNamespace
+
+import pytest
+from alpaca_trade_api.entity import Order
+
+from liualgotrader import consumer
+from liualgotrader.common import config, trading_data
+from liualgotrader.models.new_trades import NewTrade
+
+
+class FakeGateway:
+    """Submissions return when the test resolves them, saved trades are
+    recorded"""
+
+    def __init__(self):
+        self.submissions: list = []
+        self.saved: list = []
+
+    def submit_order(self, **kwargs) -> asyncio.Future:
+        self.submissions.append(asyncio.get_running_loop().create_future())
+        return self.submissions[-1]
+
+    def on_trade_update(self, data) -> None:
+        pass
+
+
+class RecordingStrategy:
+    name = "recording"
+    algo_run = SimpleNamespace(run_id=1)
+
+    def __init__(self):
+        self.fills: list = []
+
+    async def buy_callback(self, symbol, price, qty):
+        self.fills.append((symbol, price, qty))
+
+
+def update(event: str, order_id: str, filled_qty: int) -> dict:
+    return {
+        "EV": "trade_update",
+        "symbol": "AAPL",
+        "event": event,
+        "order": {
+            "id": order_id,
+            "symbol": "AAPL",
+            "side": "buy",
+            "qty": "10",
+            "filled_qty": str(filled_qty),
+            "filled_avg_price": "1.5",
+            "updated_at": "2021-01-04T09:31:00-05:00",
+            "filled_at": "2021-01-04T09:31:00-05:00",
+        },
+    }
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    gateway = FakeGateway()
+
+    async def save(self, pool, client_time, *args):
+        gateway.saved.append((self.symbol, self.operation, self.qty))
+
+    monkeypatch.setattr(NewTrade, "save", save)
+    monkeypatch.setattr(config, "db_conn_pool", None, raising=False)
+    for name in trading_data.symbol_state:
+        monkeypatch.setattr(trading_data, name, {})
+    trading_data.stop_prices["AAPL"] = trading_data.target_prices["AAPL"] = 0.0
+    monkeypatch.setattr(consumer, "order_gateway", gateway)
+    monkeypatch.setattr(consumer, "submitting", {})
+    monkeypatch.setattr(consumer, "deferred_handoffs", {})
+    return gateway
+
+
+@pytest.mark.asyncio
+async def test_trade_update_before_submission_returns(gateway):
+    strategy = RecordingStrategy()
+    tracking = consumer.submit_order(strategy, "AAPL", 10, "buy", "market")
+
+    # an order canceled earlier was confirmed, and the new order partially
+    # filled, before the broker's response arrived
+    await consumer.handle_trade_update(update("canceled", "0", 0))
+    await consumer.handle_trade_update(update("partial_fill", "1", 4))
+    assert not trading_data.positions.get("AAPL")  # nosec
+    assert not gateway.saved  # nosec
+
+    gateway.submissions[0].set_result(
+        Order(dict(update("new", "1", 0)["order"], status="new"))
+    )
+    await tracking
+    assert trading_data.positions["AAPL"] == 4  # nosec
+    assert gateway.saved == [("AAPL", "buy", 4)]  # nosec
+    order, side = trading_data.open_orders["AAPL"]
+    assert (order.id, order.filled_qty, side) == ("1", "4", "buy")  # nosec
+    assert not consumer.submitting  # nosec
+
+    await consumer.handle_trade_update(update("fill", "1", 10))
+    assert trading_data.positions["AAPL"] == 10  # nosec
+    assert gateway.saved[-1] == ("AAPL", "buy", 6)  # nosec
+    assert strategy.fills == [("AAPL", 1.5, 4), ("AAPL", 1.5, 6)]  # nosec
+    assert "AAPL" not in trading_data.open_orders  # nosec
+
+
+@pytest.mark.asyncio
+async def test_order_concluded_before_submission_returns(gateway):
+    strategy = RecordingStrategy()
+    tracking = consumer.submit_order(strategy, "AAPL", 10, "buy", "market")
+    await consumer.handle_trade_update(update("fill", "1", 10))
+
+    gateway.submissions[0].set_result(
+        Order(dict(update("new", "1", 0)["order"], status="new"))
+    )
+    await tracking
+    assert trading_data.positions["AAPL"] == 10  # nosec
+    assert gateway.saved == [("AAPL", "buy", 10)]  # nosec
+    assert "AAPL" not in trading_data.open_orders  # nosec
+    assert not consumer.submitting  # nosec
+
+
+@pytest.mark.asyncio
+async def test_hand_off_waits_for_submission(gateway):
+    strategy = RecordingStrategy()
+    handoff_queues = [Queue(), Queue()]
+    tracking = consumer.submit_order(strategy, "AAPL", 10, "buy", "market")
+    await consumer.handle_control_msg(
+        {"EV": "migrate_out", "symbol": "AAPL", "to": 1}, handoff_queues
+    )
+    assert handoff_queues[1].empty()  # nosec
+
+    gateway.submissions[0].set_result(
+        Order(dict(update("new", "1", 0)["order"], status="new"))
+    )
+    await tracking
+    state = handoff_queues[1].get_nowait()
+    assert state["trading_data"]["open_orders"][0]["id"] == "1"  # nosec
+    assert "AAPL" not in trading_data.open_orders  # nosec
+
+    consumer.import_symbol_state(state)
+    assert trading_data.open_orders["AAPL"][0].id == "1"  # nosec
@@ -1,2 +1,83 @@
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from liualgotrader.common.database import (_to_dataframe, fetch_statement,
+                                           stream_statement)
+
+
 def test_db_connectivity() -> bool:
     return True
+
+
+def test_to_dataframe() -> None:
+    df = _to_dataframe(
+        ["trade_id", "algo_run_id", "price", "symbol", "tstamp"],
+        ["int4", "int4", "numeric", "text", "timestamp"],
+        [
+            (1, 10, Decimal("1.25"), "AAPL", datetime(2021, 1, 4, 10)),
+            (2, None, None, "MSFT", None),
+        ],
+    )
+
+    assert df.trade_id.dtype == np.int64  # nosec
+    assert df.algo_run_id.dtype == np.float64  # nosec
+    assert df.price.tolist()[0] == 1.25  # nosec
+    assert np.isnan(df.price[1])  # nosec
+    assert df.symbol.tolist() == ["AAPL", "MSFT"]  # nosec
+    assert df.tstamp[0] == datetime(2021, 1, 4, 10)  # nosec
+    assert df.tstamp.isna()[1]  # nosec
+
+
+class FakeStatement:
+    """Prepared statement returning `rows` through a cursor"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.fetches = []
+
+    def get_attributes(self):
+        return [
+            SimpleNamespace(name=name, type=SimpleNamespace(name=type_name))
+            for name, type_name in (("trade_id", "int4"), ("symbol", "text"))
+        ]
+
+    async def cursor(self, *args):
+        rows = iter(self.rows)
+        statement = self
+
+        class Cursor:
+            async def fetch(self, n):
+                statement.fetches.append(n)
+                return [row for _, row in zip(range(n), rows)]
+
+        return Cursor()
+
+
+@pytest.mark.asyncio
+async def test_stream_statement() -> None:
+    rows = [(i, f"S{i}") for i in range(5)]
+    stmt = FakeStatement(rows)
+    chunks = [df async for df in stream_statement(stmt, chunk_size=2)]
+    assert [df.trade_id.tolist() for df in chunks] == [  # nosec
+        [0, 1],
+        [2, 3],
+        [4],
+    ]
+    assert stmt.fetches == [2, 2, 2]  # nosec
+
+    df = await fetch_statement(FakeStatement(rows), chunk_size=5)
+    assert df.symbol.tolist() == [symbol for _, symbol in rows]  # nosec
+    assert df.trade_id.dtype == np.int64  # nosec
+
+    # a result of a multiple of chunk_size ends w/ an empty fetch
+    stmt = FakeStatement(rows[:4])
+    assert len(await fetch_statement(stmt, chunk_size=2)) == 4  # nosec
+    assert stmt.fetches == [2, 2, 2]  # nosec
+
+    empty = [df async for df in stream_statement(FakeStatement([]))]
+    assert len(empty) == 1 and empty[0].empty  # nosec
+    assert list(empty[0].columns) == ["trade_id", "symbol"]  # nosec
@@ -0,0 +1,115 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+import requests
+
+from liualgotrader.common import market_data
+from liualgotrader.common.history_loader import HistoryLoader, retry_after
+
+LATENCY = 0.1
+
+
+def rate_limit_error(seconds: str) -> requests.exceptions.HTTPError:
+    response = requests.Response()
+    response.status_code = 429
+    response.headers["Retry-After"] = seconds
+    return requests.exceptions.HTTPError(response=response)
+
+
+def test_concurrent_load():
+    symbols = [f"S{i}" for i in range(16)]
+    in_flight, peak = [0], [0]
+    lock = threading.Lock()
+
+    def _load(symbol):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(LATENCY)
+        with lock:
+            in_flight[0] -= 1
+        return None if symbol == "S3" else [symbol]
+
+    loader = HistoryLoader(max_workers=8)
+    start = time.monotonic()
+    results = loader.load(symbols, _load)
+    assert time.monotonic() - start < 4 * LATENCY  # nosec
+    assert peak[0] == 8  # nosec
+    assert list(results) == [s for s in symbols if s != "S3"]  # nosec
+    assert not loader.failed  # nosec
+
+
+def test_rate_limit():
+    calls = []
+
+    def _load(symbol):
+        calls.append((symbol, time.monotonic()))
+        if len(calls) == 1:
+            raise rate_limit_error("0.3")
+        return [symbol]
+
+    loader = HistoryLoader(max_workers=2, backoff=0.01)
+    start = time.monotonic()
+    results = loader.load(["A", "B", "C"], _load)
+    assert list(results) == ["A", "B", "C"]  # nosec
+
+    # requests following the rate-limit response wait for the pause
+    assert len(calls) == 4  # nosec
+    assert all(t - calls[0][1] >= 0.29 for _, t in calls[2:])  # nosec
+    assert time.monotonic() - start >= 0.3  # nosec
+
+
+def test_failures():
+    def _load(symbol):
+        if symbol == "BAD":
+            raise requests.exceptions.ConnectionError("refused")
+        return [symbol]
+
+    loader = HistoryLoader(max_workers=2, retries=2, backoff=0.01)
+    assert list(loader.load(["BAD", "GOOD"], _load)) == ["GOOD"]  # nosec
+    assert isinstance(  # nosec
+        loader.failed["BAD"], requests.exceptions.ConnectionError
+    )
+
+    assert retry_after(rate_limit_error("2")) == 2  # nosec
+    assert retry_after(ValueError()) is None  # nosec
+
+
+def test_max_tickers(monkeypatch):
+    def historic_agg_v2(symbol, *args, **kwargs):
+        if symbol in ("B", "D"):
+            raise requests.exceptions.ConnectionError("refused")
+        return SimpleNamespace(df=pd.DataFrame({"close": [1.0]}))
+
+    api = SimpleNamespace(
+        polygon=SimpleNamespace(historic_agg_v2=historic_agg_v2)
+    )
+    monkeypatch.setattr(
+        market_data, "_loader", lambda api: HistoryLoader(2, retries=0)
+    )
+    symbols = ["A", "B", "C", "D", "E", "F"]
+    minute_history = market_data.get_historical_data_from_polygon(
+        api, symbols, max_tickers=3
+    )
+
+    # failing symbols are replaced by the next ones, order is kept
+    assert list(minute_history) == ["A", "C", "E"]  # nosec
+    assert symbols == ["A", "C", "E"]  # nosec
+
+
+def test_loader_per_session(monkeypatch):
+    monkeypatch.setattr(market_data, "_loaders", {})
+    session = requests.Session()
+    api = SimpleNamespace(polygon=SimpleNamespace(_session=session))
+    loader = market_data._loader(api)
+    adapter = session.get_adapter("https://api.polygon.io")
+
+    # the session's connection pool is mounted once, not on every load
+    assert market_data._loader(api) is loader  # nosec
+    assert session.get_adapter("https://api.polygon.io") is adapter  # nosec
+    assert adapter._pool_maxsize == loader.max_workers  # nosec
+
+    other = SimpleNamespace(polygon=SimpleNamespace(_session=None))
+    assert market_data._loader(other) is not loader  # nosec
@@ -0,0 +1,168 @@
+import math
+
+import hypothesis.strategies as st
+import numpy as np
+import pandas as pd
+from hypothesis import given, settings
+
+from liualgotrader.common.bar_store import BarStore
+from liualgotrader.fincalcs.incremental import (ATR, EMA, MACD, RSI, VWAP,
+                                                IndicatorSet, RollingMax,
+                                                RollingMin)
+
+prices = st.lists(
+    st.floats(min_value=1.0, max_value=1000.0), min_size=1, max_size=120
+)
+
+
+def _bars(closes):
+    return [
+        {"open": c, "high": c + 1.0, "low": c - 1.0, "close": c, "volume": 10}
+        for c in closes
+    ]
+
+
+def _feed(indicator, bars, start=0):
+    for i, bar in enumerate(bars):
+        indicator.update(start + i * 60_000_000_000, bar)
+    return indicator
+
+
+@settings(deadline=None)
+@given(prices, st.integers(min_value=1, max_value=30))
+def test_ema(closes, period):
+    ema = _feed(EMA(period, keep=len(closes)), _bars(closes))
+    expected = pd.Series(closes).ewm(span=period, adjust=False).mean()
+    assert np.allclose(list(ema.values), expected)  # nosec
+
+
+@settings(deadline=None)
+@given(prices)
+def test_macd(closes):
+    macd = _feed(MACD(keep=len(closes)), _bars(closes))
+    series = pd.Series(closes)
+    line = (
+        series.ewm(span=12, adjust=False).mean()
+        - series.ewm(span=26, adjust=False).mean()
+    )
+    signal = line.ewm(span=9, adjust=False).mean()
+    assert np.allclose(macd.macd, line)  # nosec
+    assert np.allclose(macd.signal, signal)  # nosec
+    assert np.allclose(macd.hist, line - signal)  # nosec
+
+
+@settings(deadline=None)
+@given(prices, st.integers(min_value=1, max_value=30))
+def test_rolling_extrema(closes, period):
+    bars = _bars(closes)
+    high = _feed(RollingMax(period, keep=len(closes)), bars)
+    low = _feed(RollingMin(period, keep=len(closes)), bars)
+    frame = pd.DataFrame(bars)
+    assert np.allclose(  # nosec
+        list(high.values), frame.high.rolling(period, min_periods=1).max()
+    )
+    assert np.allclose(  # nosec
+        list(low.values), frame.low.rolling(period, min_periods=1).min()
+    )
+
+
+def test_rsi():
+    closes = [44.0, 44.5, 43.5, 44.5, 45.0, 44.0, 45.5, 46.0]
+    rsi = _feed(RSI(3, keep=len(closes)), _bars(closes))
+    assert all(math.isnan(v) for v in list(rsi.values)[:3])  # nosec
+
+    gains, losses = [0.5, 0.0, 1.0], [0.0, 1.0, 0.0]
+    avg_gain, avg_loss = sum(gains) / 3, sum(losses) / 3
+    expected = [100 - 100 / (1 + avg_gain / avg_loss)]
+    for prev, close in zip(closes[3:], closes[4:]):
+        change = close - prev
+        avg_gain = (avg_gain * 2 + max(change, 0)) / 3
+        avg_loss = (avg_loss * 2 + max(-change, 0)) / 3
+        expected.append(100 - 100 / (1 + avg_gain / avg_loss))
+    assert np.allclose(list(rsi.values)[3:], expected)  # nosec
+
+
+def test_atr():
+    bars = _bars([10.0, 12.0, 11.0, 15.0])
+    atr = _feed(ATR(2), bars)
+    # true ranges: 2, 3, 2, 5
+    assert math.isnan(atr[0])  # nosec
+    assert np.allclose(list(atr.values)[1:], [2.5, 2.25, 3.625])  # nosec
+
+
+def test_vwap_anchor():
+    index = pd.date_range(
+        "2020-10-01 09:28", periods=4, freq="1min", tz="America/New_York"
+    ).append(
+        pd.date_range(
+            "2020-10-02 09:30", periods=1, freq="1min", tz="America/New_York"
+        )
+    )
+    vwap = VWAP()
+    for ts, close, volume in zip(
+        index.asi8, [1.0, 1.0, 2.0, 4.0, 8.0], [5, 5, 1, 3, 2]
+    ):
+        vwap.update(
+            ts,
+            {"high": close, "low": close, "close": close, "volume": volume},
+        )
+
+    values = list(vwap.values)
+    assert math.isnan(values[0]) and math.isnan(values[1])  # nosec
+    assert values[2:] == [2.0, (2.0 + 12.0) / 4, 8.0]  # nosec
+
+
+@settings(deadline=None)
+@given(prices, st.data())
+def test_revisions(closes, data):
+    """revising the current bar ends up as if only the final bar was seen"""
+    bars = _bars(closes)
+    expected = _feed(MACD(keep=len(bars)), bars)
+
+    macd = MACD(keep=len(bars))
+    for i, bar in enumerate(bars):
+        revisions = _bars(data.draw(prices))[:3]
+        macd.update(i, revisions[0])
+        for revision in revisions[1:] + [bar]:
+            macd.update(i, revision, new_bar=False)
+    assert np.allclose(list(macd.values), list(expected.values))  # nosec
+
+
+def test_indicator_set():
+    closes = np.arange(1.0, 101.0)
+    index = pd.date_range(
+        "2020-10-01 09:00", periods=100, freq="1min", tz="America/New_York"
+    )
+    frame = pd.DataFrame(
+        {"close": closes, "high": closes, "low": closes, "volume": 1.0},
+        index=index,
+    )
+    bars = BarStore.from_dataframe(frame.iloc[:50])
+    indicators = IndicatorSet({"ema": EMA(10, keep=100)})
+    for i in range(50, 100):
+        indicators.sync(bars)
+        bars.update(frame.iloc[i - 1].to_numpy() * 2)
+        indicators.sync(bars)
+        bars.update(frame.iloc[i - 1].to_numpy())
+        bars.append(index[i], frame.iloc[i].to_numpy())
+    indicators.sync(bars)
+
+    expected = frame.close.ewm(span=10, adjust=False).mean()
+    assert np.allclose(list(indicators["ema"].values), expected)  # nosec
+
+    # back-testing windows, rewinding replays from the first bar
+    assert np.isclose(  # nosec
+        indicators.sync(bars, 20)["ema"].value, expected.iloc[19]
+    )
+
+    hours = IndicatorSet(
+        {"ema": EMA(10, keep=100)},
+        hours=(pd.Timestamp("9:30").time(), pd.Timestamp("16:00").time()),
+    )
+    hours.sync(bars)
+    assert np.allclose(  # nosec
+        list(hours["ema"].values),
+        frame.close.between_time("9:30", "16:00")
+        .ewm(span=10, adjust=False)
+        .mean(),
+    )
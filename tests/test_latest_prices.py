@@ -0,0 +1,31 @@
+from liualgotrader.common import market_data
+
+
+def test_latest_stock_prices(monkeypatch):
+    requested = []
+
+    def snapshot_prices(symbols):
+        requested.append(symbols)
+        return {"AAPL": 130.0, "MSFT": 220.0}
+
+    monkeypatch.setattr(market_data, "_snapshot_prices", snapshot_prices)
+    monkeypatch.setattr(
+        market_data, "latest_stock_price", lambda data_api, symbol: 10.0
+    )
+    monkeypatch.setattr(market_data, "latest_prices", {})
+    monkeypatch.setattr(market_data.config, "price_ttl", 60.0)
+
+    assert market_data.latest_stock_prices(  # nosec
+        None, ["AAPL", "MSFT", "XYZ"]
+    ) == {"AAPL": 130.0, "MSFT": 220.0, "XYZ": 10.0}
+    assert requested == [["AAPL", "MSFT", "XYZ"]]  # nosec
+
+    # served from cache, w/in the TTL
+    assert market_data.latest_stock_prices(None, ["MSFT"]) == {  # nosec
+        "MSFT": 220.0
+    }
+    assert len(requested) == 1  # nosec
+
+    monkeypatch.setattr(market_data.config, "price_ttl", 0.0)
+    market_data.latest_stock_prices(None, ["MSFT"])
+    assert requested[-1] == ["MSFT"]  # nosec
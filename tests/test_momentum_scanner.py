@@ -0,0 +1,82 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from liualgotrader.models.ticker_data import StockOhlc
+from liualgotrader.scanners import momentum
+from liualgotrader.scanners.momentum import Momentum
+
+days = [date(2021, 1, 4), date(2021, 1, 5)]
+
+
+def daily(*dates) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "open": 1.0,
+            "high": 2.0,
+            "low": 0.5,
+            "close": 1.5,
+            "volume": 100.0,
+        },
+        index=pd.DatetimeIndex(
+            [pd.Timestamp(d) for d in dates], tz="America/New_York"
+        ),
+    )
+
+
+@pytest.mark.asyncio
+async def test_add_stock_data(monkeypatch):
+    requested = []
+    saved = []
+
+    async def get_existing(symbols, days):
+        return {("AAPL", days[0]), ("AAPL", days[1]), ("MSFT", days[0])}
+
+    def load(api, symbols, start_date, end_date):
+        requested.append((symbols, start_date, end_date))
+        # TSLA failed to load, AMZN has no bar on the 5th
+        return {"MSFT": daily(*days), "AMZN": daily(days[0])}
+
+    async def save_batch(bars, pool=None, overwrite=True):
+        saved.append(
+            (
+                sorted((b.symbol, b.symbol_date, b.volume) for b in bars),
+                overwrite,
+            )
+        )
+        return len(saved[-1][0])
+
+    monkeypatch.setattr(StockOhlc, "get_existing", get_existing)
+    monkeypatch.setattr(StockOhlc, "save_batch", save_batch)
+    monkeypatch.setattr(
+        momentum, "get_historical_daily_from_polygon_by_range", load
+    )
+    scanner = Momentum(
+        provider="polygon",
+        recurrence=None,
+        target_strategy_name=None,
+        data_api=None,
+        max_share_price=100.0,
+        min_share_price=1.0,
+        min_last_dv=0.0,
+        today_change_percent=1.0,
+        min_volume=0.0,
+        from_market_open=0.0,
+    )
+    await scanner.add_stock_data(["AAPL", "MSFT", "TSLA", "AMZN"], days)
+
+    assert requested == [  # nosec
+        (["MSFT", "TSLA", "AMZN"], days[0], date(2021, 1, 6))
+    ]
+    assert saved == [  # nosec
+        (
+            [
+                ("AMZN", days[0], 100),
+                ("MSFT", days[0], 100),
+                ("MSFT", days[1], 100),
+            ],
+            True,
+        ),
+        ([("AMZN", days[1], 0)], False),
+    ]
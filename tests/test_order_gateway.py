@@ -0,0 +1,139 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import alpaca_trade_api as tradeapi
+import pytest
+
+from liualgotrader.common.order_gateway import OrderGateway
+
+LATENCY = 0.2
+
+
+class MockBroker(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    orders: dict = {}
+    requests: list = []
+    connections: set = set()
+
+    def _reply(self, status: int, body=None) -> None:
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _record(self) -> None:
+        self.requests.append((self.command, self.path))
+        self.connections.add(self.client_address)
+        time.sleep(LATENCY)
+
+    def do_POST(self):
+        self._record()
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        order = dict(body, id=str(uuid.uuid4()), status="new")
+        self.orders[order["id"]] = order
+        self._reply(200, order)
+
+    def do_GET(self):
+        self._record()
+        self._reply(200, self.orders[self.path.split("/")[-1]])
+
+    def do_DELETE(self):
+        self._record()
+        self.orders[self.path.split("/")[-1]]["status"] = "canceled"
+        self._reply(204)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def broker():
+    MockBroker.orders, MockBroker.requests = {}, []
+    MockBroker.connections = set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockBroker)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield tradeapi.REST(
+        key_id="key",
+        secret_key="secret",
+        base_url=f"http://127.0.0.1:{server.server_address[1]}",
+    )
+    server.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_submissions(broker):
+    gateway = OrderGateway(broker, max_workers=4)
+    start = time.monotonic()
+    orders = await asyncio.gather(
+        *(
+            gateway.submit_order(symbol, 10, "buy", "market")
+            for symbol in ("AAPL", "MSFT", "TSLA", "AMZN")
+        )
+    )
+    assert time.monotonic() - start < 2 * LATENCY  # nosec
+    assert [o.symbol for o in orders] == [  # nosec
+        "AAPL",
+        "MSFT",
+        "TSLA",
+        "AMZN",
+    ]
+
+    # keep-alive: following requests re-use the pooled connections
+    for order in orders:
+        assert (await gateway.get_order(order.id)).status == "new"  # nosec
+    assert len(MockBroker.connections) <= 4  # nosec
+    gateway.close()
+
+
+@pytest.mark.asyncio
+async def test_duplicate_requests(broker):
+    gateway = OrderGateway(broker)
+    first = gateway.submit_order("AAPL", 10, "buy", "limit", limit_price=1.5)
+    second = gateway.submit_order("AAPL", 10, "buy", "limit", limit_price=1.5)
+    assert first is second and gateway.pending("AAPL")  # nosec
+
+    # a different order for the symbol is not deduplicated into the first
+    with pytest.raises(ValueError):
+        gateway.submit_order("AAPL", 10, "sell", "market")
+
+    order = await first
+    assert not gateway.pending("AAPL")  # nosec
+    assert float(order.limit_price) == 1.5  # nosec
+
+    await asyncio.gather(
+        gateway.cancel_order(order.id), gateway.cancel_order(order.id)
+    )
+    assert [method for method, _ in MockBroker.requests] == [  # nosec
+        "POST",
+        "DELETE",
+    ]
+    gateway.close()
+
+
+@pytest.mark.asyncio
+async def test_order_status(broker):
+    gateway = OrderGateway(broker)
+    status = gateway.order_status("1")
+    gateway.on_trade_update({"event": "partial_fill", "order": {"id": "1"}})
+    assert not status.done()  # nosec
+
+    gateway.on_trade_update({"event": "fill", "order": {"id": "1"}})
+    assert await asyncio.wait_for(status, 1) == "fill"  # nosec
+
+    gateway.forget("1")
+
+    # updates of orders nobody waits for are not kept
+    gateway.on_trade_update(
+        {"event": "fill", "order": {"id": "2", "symbol": "MSFT"}}
+    )
+    assert not gateway.order_status("2").done()  # nosec
+    gateway.forget("2")
+    assert not gateway._status  # nosec
+    gateway.close()
@@ -0,0 +1,58 @@
+import asyncio
+from datetime import date, datetime
+
+import asyncpg
+import pytz
+
+from liualgotrader.analytics.queries import (QUERIES, AnalyticsSession,
+                                             timestamp_param)
+
+
+def test_timestamp_param() -> None:
+    assert timestamp_param(date(2021, 1, 4)) == datetime(2021, 1, 4)  # nosec
+    assert timestamp_param(  # nosec
+        pytz.timezone("America/New_York").localize(datetime(2021, 1, 4, 9, 30))
+    ) == datetime(2021, 1, 4, 9, 30)
+
+
+def test_queries_are_parameterized() -> None:
+    for name, query in QUERIES.items():
+        assert "{" not in query and "'" not in query, name  # nosec
+        assert "$1" in query, name  # nosec
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+    def terminate(self) -> None:
+        self.closed = True
+
+
+def test_session_event_loop(monkeypatch) -> None:
+    connections = []
+
+    async def connect(dsn):
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    monkeypatch.setattr(asyncpg, "connect", connect)
+    session = AnalyticsSession("postgresql://")
+
+    # re-runs on the session's loop keep its connection
+    for _ in range(2):
+        session.event_loop().run_until_complete(session._acquire())
+    assert len(connections) == 1  # nosec
+
+    # another loop gets its own connection, the previous one is dropped
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(session._acquire())
+    finally:
+        loop.close()
+    assert len(connections) == 2 and connections[0].closed  # nosec
+    assert session.con is connections[1]  # nosec
+    session.loop.close()  # type: ignore
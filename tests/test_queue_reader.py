@@ -0,0 +1,76 @@
+import asyncio
+import multiprocessing as mp
+from queue import Empty
+
+import pytest
+
+from liualgotrader.common.queue_reader import AsyncQueueReader
+from liualgotrader.common.ring_buffer import RingBuffer
+
+
+@pytest.mark.asyncio
+async def test_get_batch():
+    rb = RingBuffer(capacity=64, slot_size=16)
+    reader = AsyncQueueReader(rb, poll_timeout=0.01)
+    reader.start()
+    try:
+        for i in range(10):
+            rb.put(str(i))
+
+        received = []
+        while len(received) < 10:
+            received += await reader.get_batch(max_items=4, timeout=1)
+        assert received == [str(i) for i in range(10)]  # nosec
+
+        with pytest.raises(Empty):
+            await reader.get_batch(timeout=0.05)
+    finally:
+        await reader.stop()
+        rb.close()
+        rb.unlink()
+
+
+@pytest.mark.asyncio
+async def test_loop_not_blocked():
+    q: mp.Queue = mp.Queue()
+    reader = AsyncQueueReader(q, poll_timeout=0.01)
+    reader.start()
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    task = asyncio.create_task(ticker())
+    try:
+        with pytest.raises(Empty):
+            await reader.get_batch(timeout=0.2)
+        assert ticks > 5  # nosec
+
+        q.put("payload")
+        assert await reader.get_batch(timeout=1) == ["payload"]  # nosec
+    finally:
+        task.cancel()
+        await reader.stop()
+
+
+@pytest.mark.asyncio
+async def test_back_pressure():
+    q: mp.Queue = mp.Queue()
+    reader = AsyncQueueReader(q, maxsize=2, poll_timeout=0.01)
+    reader.start()
+    try:
+        for i in range(5):
+            q.put(i)
+        await asyncio.sleep(0.2)
+        assert reader.items.qsize() == 2  # nosec
+        assert reader.drain() == 2  # nosec
+
+        received = []
+        while len(received) < 3:
+            received += await reader.get_batch(timeout=1)
+        assert received[-1] == 4  # nosec
+    finally:
+        await reader.stop()
@@ -0,0 +1,80 @@
+import pickle
+from queue import Empty, Full
+
+import hypothesis.strategies as st
+import pytest
+from hypothesis import given, settings
+
+from liualgotrader.common.ring_buffer import OverflowPolicy, RingBuffer
+
+
+@settings(deadline=None, max_examples=50)
+@given(
+    st.lists(
+        st.one_of(st.binary(max_size=64), st.text(max_size=16)), max_size=40
+    )
+)
+def test_fifo(messages):
+    rb = RingBuffer(capacity=64, slot_size=64)
+    try:
+        for m in messages:
+            rb.put(m)
+        assert rb.qsize() == len(messages)  # nosec
+        assert [rb.get_nowait() for _ in messages] == messages  # nosec
+        assert rb.empty()  # nosec
+    finally:
+        rb.close()
+        rb.unlink()
+
+
+def test_block_policy():
+    rb = RingBuffer(capacity=2, slot_size=8)
+    try:
+        rb.put(b"1")
+        rb.put(b"2")
+        with pytest.raises(Full):
+            rb.put(b"3", timeout=0.01)
+        assert rb.get() == b"1"  # nosec
+        rb.put(b"3")
+        assert rb.stats() == {  # nosec
+            "occupancy": 2,
+            "capacity": 2,
+            "dropped": 0,
+        }
+        with pytest.raises(ValueError):
+            rb.put(b"too large for slot")
+    finally:
+        rb.close()
+        rb.unlink()
+
+
+def test_drop_oldest_policy():
+    rb = RingBuffer(capacity=4, slot_size=8, policy=OverflowPolicy.DROP_OLDEST)
+    try:
+        for i in range(10):
+            rb.put(str(i))
+        assert [rb.get_nowait() for _ in range(4)] == [  # nosec
+            "6",
+            "7",
+            "8",
+            "9",
+        ]
+        assert rb.dropped == 6  # nosec
+        with pytest.raises(Empty):
+            rb.get(timeout=0.01)
+    finally:
+        rb.close()
+        rb.unlink()
+
+
+def test_attach():
+    rb = RingBuffer(capacity=4, slot_size=128)
+    try:
+        attached = pickle.loads(pickle.dumps(rb))  # nosec
+        rb.put({"EV": "trade_update"})
+        assert attached.get_nowait() == {"EV": "trade_update"}  # nosec
+        assert rb.empty()  # nosec
+        attached.close()
+    finally:
+        rb.close()
+        rb.unlink()
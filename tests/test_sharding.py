@@ -0,0 +1,64 @@
+import hypothesis.strategies as st
+from hypothesis import given, settings
+
+from liualgotrader.common.sharding import SymbolSharder
+
+symbols = st.lists(
+    st.text(alphabet="ABCDEFGHIJKLMNOPQRSTUVWXYZ", min_size=1, max_size=5),
+    unique=True,
+    max_size=50,
+)
+
+
+@settings(deadline=None)
+@given(symbols, st.integers(min_value=1, max_value=8))
+def test_assign(tickers, num_shards):
+    sharder = SymbolSharder(num_shards)
+    assigned = [sharder.assign(t, weight=1.0) for t in tickers]
+    assert all(0 <= s < num_shards for s in assigned)  # nosec
+    assert [sharder.assign(t) for t in tickers] == assigned  # nosec
+
+    loads = sharder.loads()
+    assert max(loads) - min(loads) <= 1.0  # nosec
+
+
+@settings(deadline=None)
+@given(symbols)
+def test_hash_policy_is_stable(tickers):
+    a = SymbolSharder(4, policy="hash")
+    b = SymbolSharder(4, policy="hash")
+    assert [a.assign(t) for t in tickers] == [  # nosec
+        b.assign(t) for t in reversed(tickers)
+    ][::-1]
+
+
+@settings(deadline=None)
+@given(
+    st.lists(st.integers(min_value=0, max_value=1000), min_size=2, max_size=40)
+)
+def test_rebalance(counts):
+    sharder = SymbolSharder(3)
+    for i, count in enumerate(counts):
+        sharder.assign(f"S{i}", weight=1.0)
+        sharder.record(f"S{i}", count)
+    sharder.update(now=sharder._last_update + 1.0)
+
+    before = max(sharder.loads())
+    moves = sharder.rebalance(tolerance=0.0, max_moves=len(counts))
+    assert max(sharder.loads()) <= before  # nosec
+    for symbol, source, target in moves:
+        assert source != target  # nosec
+    final = {symbol: target for symbol, _, target in moves}
+    for symbol, target in final.items():
+        assert sharder.assignments[symbol] == target  # nosec
+
+
+def test_rates():
+    sharder = SymbolSharder(2, half_life=1.0)
+    sharder.assign("AAPL")
+    sharder.record("AAPL", 10)
+    sharder.update(now=sharder._last_update + 1.0)
+    assert sharder.rates["AAPL"] == 10.0  # nosec
+
+    sharder.update(now=sharder._last_update + 1.0)
+    assert sharder.rates["AAPL"] == 5.0  # nosec
@@ -0,0 +1,78 @@
+import multiprocessing as mp
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from liualgotrader.common.shared_history import SharedHistory
+
+
+def minute_bars(start: str, periods: int) -> pd.DataFrame:
+    index = pd.date_range(
+        start, periods=periods, freq="1min", tz="America/New_York"
+    )
+    close = np.arange(periods, dtype="float64") + 100.0
+    return pd.DataFrame(
+        {
+            "open": close,
+            "high": close + 1,
+            "low": close - 1,
+            "close": close,
+            "volume": np.full(periods, 1000.0),
+            "vwap": 0.0,
+            "average": 0.0,
+        },
+        index=index,
+    )
+
+
+def sum_close(shared: SharedHistory, symbol: str, results: mp.Queue):
+    bars = shared.attach([symbol])[symbol]
+    results.put((len(bars), float(bars["close"].sum())))
+
+
+def test_attach():
+    history = {
+        "AAPL": minute_bars("2021-01-04 09:30", 390),
+        "MSFT": minute_bars("2021-01-04 09:30", 10),
+        "EMPTY": minute_bars("2021-01-04 09:30", 0),
+    }
+    shared = SharedHistory.publish(history)
+    try:
+        consumer = pickle.loads(pickle.dumps(shared))
+        bars = consumer.attach(["AAPL", "EMPTY", "TSLA"])
+        assert list(bars) == ["AAPL", "EMPTY"]  # nosec
+        pd.testing.assert_frame_equal(
+            bars["AAPL"].df, history["AAPL"], check_freq=False
+        )
+        assert not bars["AAPL"].values.flags.writeable  # nosec
+
+        # writes copy the bars to private memory, the segment is unchanged
+        bars["AAPL"].update([1.0] * 7)
+        ts = history["AAPL"].index[-1] + pd.Timedelta(minutes=1)
+        bars["EMPTY"].append(ts, [2.0] * 7)
+        assert bars["AAPL"].values.flags.writeable  # nosec
+        assert bars["AAPL"]["close"][-1] == 1.0  # nosec
+        again = shared.attach(["AAPL"])["AAPL"]
+        assert again["close"][-1] == history["AAPL"]["close"][-1]  # nosec
+    finally:
+        shared.close()
+        shared.unlink()
+
+
+def test_spawned_consumer():
+    history = {"AAPL": minute_bars("2021-01-04 09:30", 390)}
+    shared = SharedHistory.publish(history)
+    try:
+        ctx = mp.get_context("spawn")
+        results = ctx.Queue()
+        p = ctx.Process(target=sum_close, args=(shared, "AAPL", results))
+        p.start()
+        assert results.get(timeout=30) == (  # nosec
+            390,
+            history["AAPL"]["close"].sum(),
+        )
+        p.join()
+    finally:
+        shared.close()
+        shared.unlink()
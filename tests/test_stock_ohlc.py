@@ -0,0 +1,45 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from liualgotrader.models.ticker_data import StockOhlc
+
+
+def test_from_dataframe():
+    index = pd.date_range("2021-01-04", periods=3, tz="America/New_York")
+    bars = pd.DataFrame(
+        {
+            "open": [1.0, 2.0, 3.0],
+            "high": [1.5, 2.5, 3.5],
+            "low": [0.5, 1.5, 2.5],
+            "close": [1.2, 2.2, 3.2],
+            "volume": [100.0, 200.0, 300.0],
+        },
+        index=index,
+    )
+    indicators = pd.DataFrame(
+        {"mama": [np.nan, 2.0, 3.0], "fama": [np.nan, np.nan, 3.1]},
+        index=index,
+    )
+
+    daily_bars = StockOhlc.from_dataframe("AAPL", bars, indicators)
+    assert [b.symbol_date for b in daily_bars] == [  # nosec
+        date(2021, 1, 4),
+        date(2021, 1, 5),
+        date(2021, 1, 6),
+    ]
+    assert daily_bars[1] == StockOhlc(  # nosec
+        symbol="AAPL",
+        symbol_date=date(2021, 1, 5),
+        open=2.0,
+        high=2.5,
+        low=1.5,
+        close=2.2,
+        volume=200,
+        indicators={"mama": 2.0, "fama": None},
+    )
+    assert isinstance(daily_bars[0].volume, int)  # nosec
+    assert daily_bars[0].indicators == {"mama": None, "fama": None}  # nosec
+
+    assert StockOhlc.from_dataframe("AAPL", bars)[2].indicators == {}  # nosec
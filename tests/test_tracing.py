@@ -0,0 +1,95 @@
+import json
+import math
+import time
+
+import hypothesis.strategies as st
+from hypothesis import given, settings
+
+from liualgotrader.common import tracing
+from liualgotrader.common.tracing import LatencyHistogram, Tracer
+from liualgotrader.common.transport import encode_batch, enqueue_time
+
+
+@settings(deadline=None)
+@given(
+    st.lists(
+        st.integers(min_value=0, max_value=60_000_000),
+        min_size=1,
+        max_size=500,
+    ),
+    st.sampled_from([50, 90, 99, 99.9]),
+)
+def test_percentiles(values, percent):
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+
+    assert histogram.count == len(values)  # nosec
+    assert histogram.min == min(values)  # nosec
+    assert histogram.max == max(values)  # nosec
+
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    expected = sorted(values)[rank - 1]
+    error = 1 / 2 ** (histogram.precision_bits - 1)
+    assert (  # nosec
+        expected <= histogram.percentile(percent) <= expected * (1 + error)
+    )
+
+
+@settings(deadline=None)
+@given(
+    st.lists(st.integers(min_value=0, max_value=10**7), max_size=100),
+    st.lists(st.integers(min_value=0, max_value=10**7), max_size=100),
+)
+def test_merge(first, second):
+    a, b, both = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for value in first:
+        a.record(value)
+        both.record(value)
+    for value in second:
+        b.record(value)
+        both.record(value)
+
+    a.merge(b)
+    assert a.buckets == both.buckets  # nosec
+    assert (a.count, a.min, a.max) == (both.count, both.min, both.max)  # nosec
+
+
+def test_export(tmp_path):
+    path = tmp_path / "latency.jsonl"
+    tracer = Tracer("consumer-0", str(path))
+    for ms in range(1, 101):
+        tracer.record("strategy", ms * 1_000_000, "momentum_long")
+    tracer.record("queue", 5_000_000)
+    tracer.export()
+    tracer.export()
+
+    rows = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(rows) == 2 and not tracer.histograms  # nosec
+    strategy = next(row for row in rows if row["stage"] == "strategy")
+    assert strategy["process"] == "consumer-0"  # nosec
+    assert strategy["strategy"] == "momentum_long"  # nosec
+    assert strategy["count"] == 100  # nosec
+    assert 50 <= strategy["p50_ms"] <= 51  # nosec
+    assert strategy["max_ms"] == 100  # nosec
+
+
+def test_event_age():
+    tracing.tracer = Tracer("producer", "/dev/null")
+    try:
+        now_ms = time.time_ns() // 1_000_000
+        tracing.record_event_age("feed", {"EV": "A", "start": now_ms - 2000})
+        tracing.record_event_age(
+            "feed", {"EV": "trade_update", "timestamp": "2020-10-01T10:00:00Z"}
+        )
+        histogram = tracing.tracer.histograms[("feed", "")]
+        assert histogram.count == 1  # nosec
+        assert 2_000_000 <= histogram.max < 3_000_000  # nosec
+    finally:
+        tracing.tracer = None
+
+
+def test_enqueue_time():
+    before = time.time_ns()
+    assert before <= enqueue_time(encode_batch([])) <= time.time_ns()  # nosec
+    assert enqueue_time('{"EV": "A"}') is None  # nosec
@@ -0,0 +1,109 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from liualgotrader.common import trade_journal
+from liualgotrader.common.trade_journal import COLUMNS, TradeJournal
+from liualgotrader.models.new_trades import NewTrade
+
+
+class FakePool:
+    """Records COPY calls, failing while `down`"""
+
+    def __init__(self):
+        self.copies = []
+        self.down = False
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    async def copy_records_to_table(self, table, records, columns):
+        if self.down:
+            raise ConnectionRefusedError("database is down")
+        assert table == "new_trades" and columns == COLUMNS  # nosec
+        self.copies.append(list(records))
+
+
+def trade(qty: int) -> tuple:
+    return NewTrade(1, "AAPL", "buy", qty, 10.5, {"rsi": 70}).record(
+        "2021-01-04 10:00:00", 9.5, 12.0
+    )
+
+
+@pytest.mark.asyncio
+async def test_batches():
+    pool = FakePool()
+    journal = TradeJournal(pool, flush_interval=0.05, max_batch=3).start()
+    for qty in range(1, 4):
+        journal.add(trade(qty))
+    await asyncio.sleep(0)
+    assert [len(c) for c in pool.copies] == [3]  # nosec
+
+    # timer flush
+    journal.add(trade(4))
+    await asyncio.sleep(0.1)
+    assert [len(c) for c in pool.copies] == [3, 1]  # nosec
+    assert pool.copies[1][0][3] == 4  # nosec
+
+    journal.add(trade(5))
+    await journal.close()
+    assert journal.saved == 5 and not journal.pending  # nosec
+
+
+@pytest.mark.asyncio
+async def test_save_through_journal():
+    pool = FakePool()
+    trade_journal.journal = TradeJournal(pool, max_batch=10)
+    try:
+        db_trade = NewTrade(1, "AAPL", "sell", 10, 11.0, None)
+        await db_trade.save(pool, "2021-01-04 10:00:00")
+        assert not pool.copies  # nosec
+        await trade_journal.stop_journal()
+        assert pool.copies == [  # nosec
+            [
+                (
+                    1,
+                    "AAPL",
+                    "sell",
+                    10,
+                    11.0,
+                    "{}",
+                    "2021-01-04 10:00:00",
+                    None,
+                    None,
+                )
+            ]
+        ]
+    finally:
+        trade_journal.journal = None
+
+
+@pytest.mark.asyncio
+async def test_wal_recovery(tmp_path):
+    wal = str(tmp_path / "journal.wal")
+    pool = FakePool()
+    journal = TradeJournal(pool, max_batch=100, wal_path=wal)
+    journal.add(trade(1))
+    journal.add(trade(2))
+    assert await journal.flush() == 2  # nosec
+
+    # database goes down, then the process crashes
+    pool.down = True
+    journal.add(trade(3))
+    assert await journal.flush() == 0  # nosec
+    journal.add(trade(4))
+    journal._wal.close()
+
+    pool.down = False
+    recovered = TradeJournal(pool, max_batch=100, wal_path=wal)
+    assert [row[3] for _, row in recovered.pending] == [3, 4]  # nosec
+    await recovered.close()
+    assert [[row[3] for row in c] for c in pool.copies] == [  # nosec
+        [1, 2],
+        [3, 4],
+    ]
+
+    # all acknowledged, nothing to recover
+    assert not TradeJournal(pool, wal_path=wal).pending  # nosec
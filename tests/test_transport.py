@@ -0,0 +1,126 @@
+import json
+from queue import Full
+
+import hypothesis.strategies as st
+from hypothesis import given, settings
+
+from liualgotrader.common.transport import (BinaryTransport, decode,
+                                            decode_batch, encode_batch)
+
+symbols = st.text(
+    alphabet=st.characters(whitelist_categories=("Lu",)),
+    min_size=1,
+    max_size=5,
+)
+prices = st.floats(min_value=0.01, max_value=10000.0)
+sizes = st.integers(min_value=0, max_value=2**31)
+timestamps = st.integers(min_value=1_500_000_000_000, max_value=2**62)
+
+trades = st.fixed_dictionaries(
+    {
+        "EV": st.just("T"),
+        "symbol": symbols,
+        "exchange": st.integers(min_value=0, max_value=255),
+        "price": prices,
+        "size": sizes,
+        "timestamp": timestamps,
+        "conditions": st.lists(
+            st.integers(min_value=0, max_value=255), max_size=4
+        ),
+    }
+)
+quotes = st.fixed_dictionaries(
+    {
+        "EV": st.just("Q"),
+        "symbol": symbols,
+        "askexchange": st.integers(min_value=0, max_value=255),
+        "askprice": prices,
+        "asksize": sizes,
+        "bidexchange": st.integers(min_value=0, max_value=255),
+        "bidprice": prices,
+        "bidsize": sizes,
+        "condition": st.integers(min_value=0, max_value=255),
+        "timestamp": timestamps,
+    }
+)
+aggs = st.fixed_dictionaries(
+    {
+        "EV": st.sampled_from(["A", "AM"]),
+        "symbol": symbols,
+        "open": prices,
+        "high": prices,
+        "low": prices,
+        "close": prices,
+        "volume": sizes,
+        "totalvolume": sizes,
+        "vwap": prices,
+        "average": prices,
+        "start": timestamps,
+        "end": timestamps,
+    },
+    optional={"symbol_strategy": st.text(max_size=20)},
+)
+trade_updates = st.fixed_dictionaries(
+    {
+        "EV": st.just("trade_update"),
+        "symbol": symbols,
+        "event": st.sampled_from(["fill", "partial_fill", "canceled"]),
+        "order": st.dictionaries(st.text(max_size=10), st.text(max_size=10)),
+    }
+)
+
+
+@settings(deadline=None, max_examples=200)
+@given(st.lists(st.one_of(trades, quotes, aggs, trade_updates), max_size=50))
+def test_binary_roundtrip(events):
+    events_out, enqueue_ns = decode_batch(encode_batch(events))
+    assert events_out == events  # nosec
+    assert enqueue_ns > 0  # nosec
+
+
+@settings(deadline=None, max_examples=50)
+@given(st.one_of(trades, quotes, aggs, trade_updates))
+def test_json_fallback(event):
+    assert decode(json.dumps(event)) == [event]  # nosec
+    assert decode(encode_batch([event])) == [event]  # nosec
+
+
+class FullQueue:
+    def __init__(self):
+        self.full = True
+        self.payloads: list = []
+
+    def put(self, payload, block=True, timeout=None):
+        if self.full:
+            raise Full
+        self.payloads.append(payload)
+
+
+def test_binary_never_drops_trade_updates():
+    queue = FullQueue()
+    transport = BinaryTransport([queue], max_batch=100, max_pending=2)
+    update = {"EV": "trade_update", "symbol": "A", "event": "fill"}
+    trades = [
+        {
+            "EV": "T",
+            "symbol": "A",
+            "exchange": 0,
+            "price": 1.0,
+            "size": i,
+            "timestamp": i,
+            "conditions": [],
+        }
+        for i in range(4)
+    ]
+    transport.send(0, trades[0])
+    transport.send(0, update, urgent=True)
+    for trade in trades[1:]:
+        transport.send(0, trade)
+    transport.flush()
+    assert transport.dropped == 2  # nosec
+
+    queue.full = False
+    transport.flush()
+    assert [  # nosec
+        event for payload in queue.payloads for event in decode(payload)
+    ] == [update] + trades[2:]
@@ -0,0 +1,69 @@
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import pytest
+
+from liualgotrader.models.trending_tickers import TrendingTickers
+
+
+class FakePool:
+    """Records fetch() calls, and returns `rows`"""
+
+    def __init__(self, rows=None):
+        self.fetches = []
+        self.rows = rows or []
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    async def fetch(self, query, *args):
+        self.fetches.append((query, args))
+        return self.rows
+
+
+@pytest.mark.asyncio
+async def test_save_batch():
+    # RETURNING order isn't guaranteed, ids are returned in insert order
+    pool = FakePool([(12,), (10,), (11,)])
+    t = datetime(2021, 1, 4, 9, 30)
+    ids = await TrendingTickers.save_batch(
+        [("b1", "AAPL", t), ("b1", "MSFT", None), ("b2", "TSLA", t)], pool
+    )
+    assert ids == [10, 11, 12]  # nosec
+
+    [(query, args)] = pool.fetches
+    assert "unnest($1::text[], $2::text[], $3::timestamp[])" in query  # nosec
+    assert [list(a) for a in args] == [  # nosec
+        ["b1", "b1", "b2"],
+        ["AAPL", "MSFT", "TSLA"],
+        [t, None, t],
+    ]
+
+    assert await TrendingTickers.save_batch([], pool) == []  # nosec
+    assert len(pool.fetches) == 1  # nosec
+
+
+@pytest.mark.asyncio
+async def test_save():
+    pool = FakePool([(7,), (6,)])
+    trending = TrendingTickers("b1")
+    assert await trending.save(["AAPL", "MSFT"], pool) == 7  # nosec
+    assert list(pool.fetches[0][1][2]) == [None, None]  # nosec
+
+
+@pytest.mark.asyncio
+async def test_load_batches():
+    t1, t2 = datetime(2021, 1, 4, 9, 30), datetime(2021, 1, 4, 9, 31)
+    pool = FakePool(
+        [("b1", "AAPL", t1), ("b2", "TSLA", t1), ("b1", "MSFT", t2)]
+    )
+    assert await TrendingTickers.load_batches(["b1", "b2"], pool) == {  # nosec
+        "b1": [("AAPL", t1), ("MSFT", t2)],
+        "b2": [("TSLA", t1)],
+    }
+    assert pool.fetches[0][1] == (["b1", "b2"],)  # nosec
+
+    assert await TrendingTickers.load("b2", pool) == [("TSLA", t1)]  # nosec
+    with pytest.raises(Exception, match="no data"):
+        await TrendingTickers.load("b3", FakePool())
@@ -0,0 +1,57 @@
+import hypothesis.strategies as st
+import numpy as np
+import pandas as pd
+from hypothesis import given, settings
+
+from liualgotrader.common import config
+from liualgotrader.fincalcs.vwap import add_daily_vwap
+
+
+def _minute_data(volumes):
+    index = pd.date_range(
+        "2020-10-01 09:00",
+        periods=len(volumes),
+        freq="1min",
+        tz="America/New_York",
+    )
+    close = np.linspace(10.0, 20.0, len(volumes))
+    return pd.DataFrame(
+        {
+            "open": close,
+            "high": close + 1.0,
+            "low": close - 1.0,
+            "close": close,
+            "volume": np.array(volumes, dtype=float),
+        },
+        index=index,
+    )
+
+
+volumes = st.lists(
+    st.integers(min_value=1, max_value=10000), min_size=2, max_size=60
+)
+
+
+@settings(deadline=None)
+@given(volumes, st.data())
+def test_add_daily_vwap(volumes, data):
+    minute_data = _minute_data(volumes)
+    start = data.draw(st.integers(min_value=0, max_value=len(volumes) - 1))
+    # Hypothesis tests can't use the function-scoped monkeypatch fixture
+    unset = object()
+    market_open = getattr(config, "market_open", unset)
+    config.market_open = minute_data.index[start].to_pydatetime()
+    try:
+        assert add_daily_vwap(minute_data)  # nosec
+    finally:
+        if market_open is unset:
+            del config.market_open
+        else:
+            config.market_open = market_open
+    typical = (minute_data.close + minute_data.high + minute_data.low) / 3
+    expected = (typical * minute_data.volume)[start:].cumsum() / (
+        minute_data.volume[start:].cumsum()
+    )
+    assert minute_data.average[:start].isna().all()  # nosec
+    assert np.allclose(minute_data.average[start:], expected)  # nosec
+    assert np.allclose(minute_data.vwap, typical)  # nosec